@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
+import logging
+import requests
+from ..services.local_mirror import local_mirror
+from ..services import metrics
+from ..core.config import settings
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 转发给上游的请求头和返回给客户端的响应头
+FORWARD_REQUEST_HEADERS = ("authorization", "range", "if-none-match", "if-range", "accept", "accept-encoding", "user-agent")
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade",
+                      "proxy-authenticate", "proxy-authorization", "server", "date"}
+
+_upstream = requests.Session()
+
+
+class MirrorFileResponse(FileResponse):
+    """使用更大的读块提高大文件的发送吞吐量"""
+    chunk_size = 1024 * 1024
+
+
+async def _proxy_upstream(request: Request) -> Response:
+    """本地未命中时将请求原样转发到上游仓库，重定向交由客户端处理"""
+    metrics.CACHE_REQUESTS.labels("mirror", "miss").inc()
+    upstream = (settings.MIRROR_UPSTREAM or settings.HF_ENDPOINT).rstrip("/")
+    url = f"{upstream}{request.url.path}"
+    if request.url.query:
+        url = f"{url}?{request.url.query}"
+    headers = {k: v for k, v in request.headers.items() if k.lower() in FORWARD_REQUEST_HEADERS}
+    try:
+        response = await run_in_threadpool(
+            _upstream.request, request.method, url, headers=headers, stream=True, allow_redirects=False, timeout=60)
+    except requests.RequestException as e:
+        logger.error(f"Mirror upstream request failed for {url}: {str(e)}")
+        return JSONResponse({"error": f"Upstream unavailable: {str(e)}"}, status_code=502)
+
+    response_headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+    if request.method == "HEAD":
+        response.close()
+        return Response(status_code=response.status_code, headers=response_headers)
+
+    def body():
+        try:
+            # 保持上游的内容编码，不在此解压
+            yield from response.raw.stream(1024 * 1024, decode_content=False)
+        finally:
+            response.close()
+
+    return StreamingResponse(iterate_in_threadpool(body()), status_code=response.status_code, headers=response_headers)
+
+
+@router.get("/api/models/{repo_id:path}/revision/{revision}")
+async def mirror_model_info_revision(repo_id: str, revision: str, request: Request, blobs: bool = False):
+    """指定版本的模型信息"""
+    repo = await run_in_threadpool(local_mirror.find, repo_id, revision)
+    if repo is None:
+        return await _proxy_upstream(request)
+    metrics.CACHE_REQUESTS.labels("mirror", "hit").inc()
+    return JSONResponse(repo.model_info(blobs, repo_id))
+
+
+@router.get("/api/models/{repo_id:path}/tree/{revision}/{path:path}")
+@router.get("/api/models/{repo_id:path}/tree/{revision}")
+async def mirror_tree(repo_id: str, revision: str, request: Request, path: str = "", recursive: bool = False):
+    """文件列表，本地目录一次返回全部条目，不分页"""
+    repo = await run_in_threadpool(local_mirror.find, repo_id, revision)
+    if repo is None:
+        return await _proxy_upstream(request)
+    metrics.CACHE_REQUESTS.labels("mirror", "hit").inc()
+    return JSONResponse(repo.tree(path, recursive))
+
+
+@router.get("/api/models/{repo_id:path}")
+async def mirror_model_info(repo_id: str, request: Request, blobs: bool = False):
+    """默认版本的模型信息"""
+    repo = await run_in_threadpool(local_mirror.find, repo_id)
+    if repo is None:
+        return await _proxy_upstream(request)
+    metrics.CACHE_REQUESTS.labels("mirror", "hit").inc()
+    return JSONResponse(repo.model_info(blobs, repo_id))
+
+
+@router.api_route("/{repo_id:path}/resolve/{revision}/{path:path}", methods=["GET", "HEAD"])
+async def mirror_resolve(repo_id: str, revision: str, path: str, request: Request):
+    """下载单个文件，支持Range请求和ETag"""
+    found = await run_in_threadpool(local_mirror.resolve_file, repo_id, revision, path)
+    if found is None:
+        return await _proxy_upstream(request)
+    metrics.CACHE_REQUESTS.labels("mirror", "hit").inc()
+    repo, file_path = found
+    etag = f'"{repo.etag(path)}"'
+    headers = {
+        "ETag": etag,
+        "X-Repo-Commit": repo.sha,
+        "X-Linked-Size": str(repo.files[path].st_size),
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return MirrorFileResponse(file_path, headers=headers, filename=None)
@@ -1,16 +1,40 @@
 from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import iterate_in_threadpool
 from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse, quote
+import json
 import logging
+import re
 from ..models.schemas import (
     SizeCheckRequest, 
+    SizeBatchRequest,
+    SizeBatchResponse,
     DownloadTaskRequest, 
     TaskIdRequest,
     ArchiveRequest,
+    RestoreRequest,
     SizeResponse,
-    TaskStatus
+    TaskStatus,
+    TaskTimeline,
+    HeaderInspectRequest,
+    HeaderIndexResponse,
+    ArchiveIndexResponse,
+    InventoryModel,
+    InventoryResponse
 )
 from ..services.task_manager import task_manager
 from ..services.model_downloader import model_downloader
+from ..services import metrics
+from ..services.tracing import tracer
+from ..services.job_runner import job_runner
+from ..services.header_inspector import header_inspector, summarize
+from ..services.size_checker import size_checker
+from ..services.local_inventory import local_inventory
+from ..services.archive_volumes import VOLUME_FORMATS
+from ..services import seekable_archive
+from ..core.config import settings
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,10 +43,22 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _download_origin(source: str, hf_mirror: Optional[str] = None) -> str:
+    """确定下载请求实际访问的主机，用于按来源统计流量"""
+    if source == "huggingface":
+        endpoint = hf_mirror or settings.HF_ENDPOINT
+    elif source == "modelscope":
+        endpoint = settings.MODELSCOPE_ENDPOINT
+    else:
+        return source
+    return urlparse(endpoint).netloc or endpoint
+
+
 @router.post("/check-size", response_model=SizeResponse)
 async def check_size_endpoint(request: SizeCheckRequest):
     """检查模型大小的端点"""
     try:
+        # 大小检查耗时在大小检查服务中记录，这里不再重复计时
         if request.source == "huggingface":
             size_gb, message = await model_downloader.get_model_size_huggingface(request.modelId, request.authToken)
         elif request.source == "modelscope":
@@ -36,41 +72,121 @@ async def check_size_endpoint(request: SizeCheckRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _batch_summary(results: list, requested: int) -> dict:
+    return {
+        "requested": requested,
+        "unique": len(results),
+        "failed": sum(1 for r in results if r["error"]),
+        "totalBytes": sum(r["totalBytes"] for r in results),
+    }
+
+
+@router.post("/check-size/batch", response_model=SizeBatchResponse)
+def check_size_batch_endpoint(request: SizeBatchRequest):
+    """
+    批量检查模型大小的端点：条目在共享的并发额度下并行检查，重复条目只检查一次，
+    单个条目失败只体现在该条目的error中。stream为True时以NDJSON按完成顺序逐条返回，
+    最后一行为汇总
+    """
+    if len(request.entries) > settings.SIZE_CHECK_BATCH_LIMIT:
+        raise HTTPException(status_code=400,
+                            detail=f"Too many entries: {len(request.entries)} > {settings.SIZE_CHECK_BATCH_LIMIT}")
+    entries = [entry.model_dump() for entry in request.entries]
+    results = size_checker.check_batch(entries, request.authToken, request.hfMirror)
+
+    if request.stream:
+        def lines():
+            completed = []
+            for result in results:
+                completed.append(result)
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"summary": _batch_summary(completed, len(entries))}) + "\n"
+
+        return StreamingResponse(iterate_in_threadpool(lines()), media_type="application/x-ndjson")
+
+    ordered = sorted(results, key=lambda r: r["indices"][0])
+    return SizeBatchResponse(results=ordered, **_batch_summary(ordered, len(entries)))
+
+
+@router.post("/inspect-headers", response_model=HeaderIndexResponse, response_model_exclude_none=True)
+def inspect_headers_endpoint(request: HeaderInspectRequest):
+    """只读取权重文件头部，返回按数据类型和层汇总的张量索引的端点"""
+    if request.source not in ("huggingface", "modelscope"):
+        raise HTTPException(status_code=400, detail=f"Unsupported source: {request.source}")
+    if request.source == "huggingface" and not settings.HF_AVAILABLE:
+        raise HTTPException(status_code=503, detail="huggingface_hub SDK not installed")
+    try:
+        index = header_inspector.inspect(request.source, request.modelId, request.authToken,
+                                         request.revision, request.hfMirror, request.fileFilter)
+        return HeaderIndexResponse(**summarize(index, request.tensorFilter, request.includeTensors))
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regex pattern: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error in inspect_headers_endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/download/start", response_model=TaskStatus)
 async def start_download_endpoint(request: DownloadTaskRequest, background_tasks: BackgroundTasks):
     """启动下载任务的端点"""
+    if request.extractTensors and not request.tensorFilter:
+        raise HTTPException(status_code=400, detail="tensorFilter is required when extractTensors is set")
     try:
         # 创建新的下载任务
-        task_id = task_manager.create_task(request.source, request.modelId, request.savePath)
+        task_id = task_manager.create_task(request.source, request.modelId, request.savePath,
+                                           _download_origin(request.source, request.hfMirror))
         
-        if request.source == "huggingface":
+        if request.extractTensors:
+            # 启动张量级下载任务
+            job_runner.submit(
+                background_tasks,
+                task_id,
+                "tensors",
+                source=request.source,
+                model_id=request.modelId,
+                tensor_filter=request.tensorFilter,
+                save_path=request.savePath,
+                token=request.authToken,
+                hf_mirror=request.hfMirror,
+                file_filter=request.fileFilter,
+                revision=request.revision,
+                archive_after=request.archiveAfter,
+                target_drive_path=request.targetDrivePath,
+                archive_name=request.archiveName,
+                archive_format=request.archiveFormat
+            )
+        elif request.source == "huggingface":
             # 启动Hugging Face下载任务
-            background_tasks.add_task(
-                model_downloader.download_huggingface_model,
+            job_runner.submit(
+                background_tasks,
                 task_id,
-                request.modelId,
-                request.savePath,
-                request.authToken,
-                request.hfMirror,
-                request.fileFilter,
-                request.archiveAfter,
-                request.targetDrivePath,
-                request.archiveName,
-                request.archiveFormat
+                "huggingface",
+                model_id=request.modelId,
+                save_path=request.savePath,
+                token=request.authToken,
+                hf_mirror=request.hfMirror,
+                file_filter=request.fileFilter,
+                archive_after=request.archiveAfter,
+                target_drive_path=request.targetDrivePath,
+                archive_name=request.archiveName,
+                archive_format=request.archiveFormat,
+                tensor_filter=request.tensorFilter
             )
         elif request.source == "modelscope":
             # 启动ModelScope下载任务
-            background_tasks.add_task(
-                model_downloader.download_modelscope_model,
+            job_runner.submit(
+                background_tasks,
                 task_id,
-                request.modelId,
-                request.savePath,
-                request.authToken,
-                request.fileFilter,
-                request.archiveAfter,
-                request.targetDrivePath,
-                request.archiveName,
-                request.archiveFormat
+                "modelscope",
+                model_id=request.modelId,
+                save_path=request.savePath,
+                token=request.authToken,
+                file_filter=request.fileFilter,
+                archive_after=request.archiveAfter,
+                target_drive_path=request.targetDrivePath,
+                archive_name=request.archiveName,
+                archive_format=request.archiveFormat,
+                tensor_filter=request.tensorFilter
             )
         else:
             raise HTTPException(status_code=400, detail=f"Unsupported source: {request.source}")
@@ -89,6 +205,11 @@ async def start_download_endpoint(request: DownloadTaskRequest, background_tasks
 @router.post("/archive", response_model=TaskStatus)
 async def archive_and_move_endpoint(request: ArchiveRequest, background_tasks: BackgroundTasks):
     """归档和移动模型的端点"""
+    if (request.volumeSize or request.targetDrivePaths) and request.archiveFormat not in VOLUME_FORMATS:
+        raise HTTPException(status_code=400,
+                            detail=f"Split archives require one of: {', '.join(VOLUME_FORMATS)}")
+    if request.volumeSize is not None and request.volumeSize <= 0:
+        raise HTTPException(status_code=400, detail="volumeSize must be positive")
     try:
         source_folder = Path(request.sourceFolderPath)
         target_drive = Path(request.targetDrivePath)
@@ -105,13 +226,16 @@ async def archive_and_move_endpoint(request: ArchiveRequest, background_tasks: B
         )
         
         # 启动归档任务
-        background_tasks.add_task(
-            model_downloader.archive_and_move,
+        job_runner.submit(
+            background_tasks,
             task_id,
-            source_folder,
-            target_drive,
-            request.archiveName,
-            request.archiveFormat
+            "archive",
+            source_folder=str(source_folder),
+            target_drive=str(target_drive),
+            archive_name_base=request.archiveName,
+            archive_format=request.archiveFormat,
+            target_drives=request.targetDrivePaths,
+            volume_size=request.volumeSize
         )
         
         # 获取并返回任务状态
@@ -125,6 +249,122 @@ async def archive_and_move_endpoint(request: ArchiveRequest, background_tasks: B
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/restore", response_model=TaskStatus)
+async def restore_archive_endpoint(request: RestoreRequest, background_tasks: BackgroundTasks):
+    """将归档恢复为模型目录的端点"""
+    archive_path = Path(request.archivePath)
+    if not archive_path.is_file():
+        raise HTTPException(status_code=400, detail=f"Archive does not exist: {archive_path}")
+    if request.memberFilter:
+        try:
+            re.compile(request.memberFilter)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid regex pattern: {str(e)}")
+    try:
+        target_path = Path(request.targetPath or settings.DEFAULT_DOWNLOAD_PATH)
+        
+        # 创建新的恢复任务
+        task_id = task_manager.create_restore_task(archive_path, target_path)
+        
+        # 启动恢复任务
+        job_runner.submit(
+            background_tasks,
+            task_id,
+            "restore",
+            archive_path=str(archive_path),
+            target_path=str(target_path),
+            member_filter=request.memberFilter,
+            verify=request.verifyChecksums
+        )
+        
+        # 获取并返回任务状态
+        task_status = task_manager.get_task(task_id)
+        if not task_status:
+            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+            
+        return TaskStatus(**task_status)
+    except Exception as e:
+        logger.error(f"Error in restore_archive_endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _load_archive_index(archive_path: str) -> dict:
+    """读取可随机访问归档的成员索引，不存在时返回404"""
+    path = Path(archive_path)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Archive does not exist: {archive_path}")
+    try:
+        return seekable_archive.load_index(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404,
+                            detail=f"Archive has no member index (create it with {seekable_archive.SEEKABLE_FORMAT})")
+
+
+@router.get("/archives/members", response_model=ArchiveIndexResponse)
+def list_archive_members_endpoint(archivePath: str):
+    """列出可随机访问归档中的成员的端点"""
+    return ArchiveIndexResponse(**_load_archive_index(archivePath))
+
+
+def _content_disposition(filename: str) -> str:
+    """
+    附件的Content-Disposition：非ASCII文件名按RFC 5987编码为filename*，
+    同时提供ASCII的filename作为旧客户端的回退
+    """
+    fallback = "".join(c if c.isascii() and c.isprintable() and c not in '"\\' else "_" for c in filename)
+    if fallback == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+@router.get("/archives/members/extract")
+def extract_archive_member_endpoint(archivePath: str, name: str):
+    """只解压并返回归档中单个文件的端点，按索引中的sha256校验内容"""
+    entry = seekable_archive.find_member(_load_archive_index(archivePath), name)
+    if entry is None or entry["type"] != "file":
+        raise HTTPException(status_code=404, detail=f"File not found in archive: {name}")
+    headers = {
+        "Content-Length": str(entry["size"]),
+        "Content-Disposition": _content_disposition(Path(entry["name"]).name)
+    }
+    if entry.get("sha256"):
+        headers["X-Checksum-Sha256"] = entry["sha256"]
+    # 校验失败时最后一块数据不会发送，客户端按Content-Length即可发现响应不完整
+    return StreamingResponse(
+        iterate_in_threadpool(seekable_archive.iter_member_data(Path(archivePath), entry, entry.get("sha256"))),
+        media_type="application/octet-stream",
+        headers=headers
+    )
+
+
+def _inventory_response() -> InventoryResponse:
+    models = local_inventory.list_models()
+    return InventoryResponse(root=str(local_inventory.root), scannedAt=local_inventory.scanned_at,
+                             totalSize=sum(m["totalSize"] for m in models), models=models)
+
+
+@router.get("/inventory", response_model=InventoryResponse)
+def list_inventory_endpoint():
+    """列出DEFAULT_DOWNLOAD_PATH中已有模型的端点（读取内存中的清单，不遍历目录）"""
+    return _inventory_response()
+
+
+@router.post("/inventory/refresh", response_model=InventoryResponse)
+def refresh_inventory_endpoint(full: bool = False):
+    """立即检查本地模型的变化的端点，full为True时重新扫描全部目录"""
+    local_inventory.refresh(full)
+    return _inventory_response()
+
+
+@router.get("/inventory/lookup", response_model=InventoryModel)
+def lookup_inventory_endpoint(modelId: str, source: Optional[str] = None, includeFiles: bool = False):
+    """查询本地是否已有某个模型及其大小的端点"""
+    model = local_inventory.lookup(modelId, source, includeFiles)
+    if model is None:
+        raise HTTPException(status_code=404, detail=f"Model {modelId} not found locally")
+    return InventoryModel(**model)
+
+
 @router.get("/download/progress/{task_id}", response_model=TaskStatus)
 async def get_download_progress_endpoint(task_id: str):
     """获取下载进度的端点"""
@@ -148,13 +388,31 @@ async def cancel_download_endpoint(task_id: str):
     return {"status": "success", "message": f"Task {task_id} cancelled"}
 
 
+@router.get("/tasks/{task_id}/timeline", response_model=TaskTimeline)
+async def get_task_timeline_endpoint(task_id: str, format: str = "json"):
+    """获取任务各阶段时间线的端点，format=trace时导出Chrome Trace Event格式"""
+    if format == "trace":
+        trace = tracer.export_trace(task_id)
+        if trace is None:
+            raise HTTPException(status_code=404, detail=f"No timeline recorded for task {task_id}")
+        return JSONResponse(trace, headers={"Content-Disposition": f'attachment; filename="{task_id}.trace.json"'})
+    if format != "json":
+        raise HTTPException(status_code=400, detail=f"Unsupported timeline format: {format}")
+    
+    timeline = tracer.get_timeline(task_id)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail=f"No timeline recorded for task {task_id}")
+    
+    return TaskTimeline(**timeline)
+
+
 @router.get("/health")
 async def health_check():
     """健康检查端点"""
     return {
         "status": "ok",
         "services": {
-            "huggingface": "available" if model_downloader.HF_AVAILABLE else "unavailable",
-            "modelscope": "available" if model_downloader.MS_AVAILABLE else "unavailable"
+            "huggingface": "available" if settings.HF_AVAILABLE else "unavailable",
+            "modelscope": "available" if settings.MS_AVAILABLE else "unavailable"
         }
     } 
\ No newline at end of file
@@ -2,6 +2,7 @@ import os
 from typing import Any, Dict, Optional
 from pydantic import validator
 from pydantic_settings import BaseSettings
+from ..utils import sdk
 
 
 class Settings(BaseSettings):
@@ -16,30 +17,79 @@ class Settings(BaseSettings):
     # 下载设置
     DEFAULT_DOWNLOAD_PATH: str = "./models"
     
+    # 模型仓库地址（可指向镜像或本地模拟服务）
+    HF_ENDPOINT: str = "https://huggingface.co"
+    MODELSCOPE_ENDPOINT: str = "https://www.modelscope.cn"
+    
     # 环境变量设置
     HUGGINGFACE_TOKEN: Optional[str] = None
     MODELSCOPE_TOKEN: Optional[str] = None
     
+    # 任务状态存储：memory（单进程）或 sqlite（多工作进程共享）
+    TASK_BACKEND: str = "memory"
+    TASK_DB_PATH: str = "./data/tasks.db"
+    # 作业租约与心跳（仅sqlite后端）
+    TASK_LEASE_SECONDS: float = 60.0
+    TASK_HEARTBEAT_SECONDS: float = 15.0
+    TASK_POLL_INTERVAL: float = 1.0
+    TASK_MAX_ATTEMPTS: int = 3
+    TASK_WORKER_CONCURRENCY: int = 2
+    
+    # 多卷归档的默认分卷大小（字节，压缩前）
+    ARCHIVE_VOLUME_SIZE: int = 4 * 1024 ** 3
+    # 归档恢复时并行解压的线程数
+    RESTORE_CONCURRENCY: int = 4
+    
+    # 本地模型清单的变化检查间隔（秒），只比较目录修改时间，变化的模型目录才重新扫描
+    INVENTORY_REFRESH_SECONDS: float = 30.0
+    
+    # 本地镜像：以Hugging Face兼容接口提供DEFAULT_DOWNLOAD_PATH中已完成的下载，未命中时转发到上游
+    MIRROR_ENABLED: bool = False
+    MIRROR_UPSTREAM: Optional[str] = None
+    
+    # 批量大小检查：共享的并发请求数、结果缓存时间（秒）和单次请求的最大条目数
+    SIZE_CHECK_CONCURRENCY: int = 8
+    SIZE_CHECK_CACHE_TTL: float = 300.0
+    SIZE_CHECK_BATCH_LIMIT: int = 1000
+    
+    # 权重文件头部检查的并发请求数
+    HEADER_FETCH_CONCURRENCY: int = 8
+    # 张量级下载：并发获取的文件数，以及合并相邻张量Range请求允许的最大间隔（字节）
+    TENSOR_FETCH_CONCURRENCY: int = 4
+    TENSOR_COALESCE_GAP: int = 1024 * 1024
+    
+    # 按源站自适应并发：初始/最小/最大并发数，限流和临时错误的最大尝试次数、最长退避时间（秒），
+    # 以及近期延迟超过基线多少倍时降低并发
+    ORIGIN_INITIAL_CONCURRENCY: int = 4
+    ORIGIN_MIN_CONCURRENCY: int = 1
+    ORIGIN_MAX_CONCURRENCY: int = 32
+    ORIGIN_MAX_RETRIES: int = 8
+    ORIGIN_MAX_BACKOFF: float = 120.0
+    ORIGIN_LATENCY_FACTOR: float = 3.0
+    # 分页列出仓库文件时每页的条目数（ModelScope；Hugging Face由服务端决定）
+    LISTING_PAGE_SIZE: int = 1000
+    # 逐文件下载的并发线程数（同时进行的请求数还受源站自适应并发控制）
+    DOWNLOAD_CONCURRENCY: int = 8
+    
+    # 文件写入：buffered（经过页缓存）、fadvise（持久化后丢弃页缓存）、direct（O_DIRECT）
+    WRITE_MODE: str = "buffered"
+    # 写缓冲区大小、持久化点间隔（0表示只在关闭时同步）和缓冲区池保留的个数
+    WRITE_BUFFER_SIZE: int = 8 * 1024 * 1024
+    WRITE_SYNC_BYTES: int = 256 * 1024 * 1024
+    WRITE_BUFFER_POOL_SIZE: int = 8
+    
     # 可用服务配置
     HF_AVAILABLE: bool = True
     MS_AVAILABLE: bool = True
     
-    @validator("HF_AVAILABLE", pre=True)
+    # 仅探测SDK是否安装，不在启动时导入（modelscope导入耗时数秒）
+    @validator("HF_AVAILABLE", pre=True, always=True)
     def validate_hf_available(cls, v: Any) -> bool:
-        try:
-            from huggingface_hub import snapshot_download, HfApi, hf_hub_url
-            return True
-        except ImportError:
-            return False
+        return sdk.huggingface_hub_available()
     
-    @validator("MS_AVAILABLE", pre=True)
+    @validator("MS_AVAILABLE", pre=True, always=True)
     def validate_ms_available(cls, v: Any) -> bool:
-        try:
-            from modelscope.hub.snapshot_download import snapshot_download as ms_snapshot_download
-            from modelscope.hub.api import HubApi
-            return True
-        except ImportError:
-            return False
+        return sdk.modelscope_available()
     
     class Config:
         env_file = ".env"
@@ -1,8 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+import asyncio
 import logging
 from .api.routes import router as api_router
+from .api.mirror import router as mirror_router
 from .core.config import settings
+from .services import metrics
+from .services.job_runner import job_runner
+from .services.local_inventory import local_inventory
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,12 +34,25 @@ app.add_middleware(
 # 注册API路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# 注册本地镜像路由（与Hugging Face路径一致，挂载在根路径）
+if settings.MIRROR_ENABLED:
+    app.include_router(mirror_router)
+
 
 @app.on_event("startup")
 async def startup_event():
     """应用程序启动事件"""
     logger.info(f"Started {settings.PROJECT_NAME} backend server")
     
+    # 启动事件循环延迟监控
+    app.state.loop_lag_monitor = asyncio.create_task(metrics.monitor_event_loop_lag())
+    
+    # 共享任务存储下启动作业认领线程
+    job_runner.start()
+    
+    # 在后台扫描本地模型清单，之后按修改时间增量更新
+    local_inventory.start()
+    
     # 检查必要的服务可用性
     services = []
     if settings.HF_AVAILABLE:
@@ -51,6 +70,13 @@ async def startup_event():
 async def shutdown_event():
     """应用程序关闭事件"""
     logger.info(f"Shutting down {settings.PROJECT_NAME} backend server")
+    
+    job_runner.stop()
+    local_inventory.stop()
+    
+    monitor = getattr(app.state, "loop_lag_monitor", None)
+    if monitor:
+        monitor.cancel()
 
 
 @app.get("/")
@@ -64,4 +90,10 @@ async def root():
             "huggingface": settings.HF_AVAILABLE,
             "modelscope": settings.MS_AVAILABLE
         }
-    } 
\ No newline at end of file
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus格式的指标端点"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
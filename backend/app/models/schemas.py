@@ -9,6 +9,23 @@ class SizeCheckRequest(BaseModel):
     authToken: Optional[str] = None
 
 
+class SizeBatchEntry(BaseModel):
+    """批量大小检查中的单个模型"""
+    source: str
+    modelId: str
+    fileFilter: Optional[str] = None  # 文件过滤的正则表达式，只统计匹配的文件
+    revision: Optional[str] = None
+    authToken: Optional[str] = None  # 未指定时使用请求级别的authToken
+
+
+class SizeBatchRequest(BaseModel):
+    """批量大小检查请求"""
+    entries: List[SizeBatchEntry]
+    authToken: Optional[str] = None
+    hfMirror: Optional[str] = None
+    stream: bool = False  # 为True时以NDJSON逐条返回完成的结果
+
+
 class DownloadTaskRequest(BaseModel):
     """下载任务请求"""
     source: str
@@ -17,6 +34,9 @@ class DownloadTaskRequest(BaseModel):
     savePath: Optional[str] = None
     hfMirror: Optional[str] = None
     fileFilter: Optional[str] = None  # 文件过滤的正则表达式
+    tensorFilter: Optional[str] = None  # 张量名过滤的正则表达式，只下载包含匹配张量的权重文件
+    extractTensors: bool = False  # 为True时只下载匹配张量的字节并重新组装safetensors文件
+    revision: Optional[str] = None
     archiveAfter: bool = False
     targetDrivePath: Optional[str] = None
     archiveName: Optional[str] = None
@@ -34,6 +54,16 @@ class ArchiveRequest(BaseModel):
     targetDrivePath: str
     archiveName: Optional[str] = "model_archive"
     archiveFormat: Optional[str] = "zip"
+    targetDrivePaths: Optional[List[str]] = None  # 额外的目标路径，分卷轮流写入各路径
+    volumeSize: Optional[int] = None  # 分卷大小（字节），指定后生成多卷归档
+
+
+class RestoreRequest(BaseModel):
+    """归档恢复请求"""
+    archivePath: str  # 归档文件或多卷归档的 *.manifest.json 清单
+    targetPath: Optional[str] = None  # 默认恢复到DEFAULT_DOWNLOAD_PATH
+    memberFilter: Optional[str] = None  # 成员名过滤的正则表达式
+    verifyChecksums: bool = True
 
 
 class TaskStatus(BaseModel):
@@ -59,4 +89,153 @@ class TaskStatus(BaseModel):
 class SizeResponse(BaseModel):
     """大小检查响应"""
     sizeGB: float
-    message: str 
\ No newline at end of file
+    message: str
+
+
+class SizeBatchResult(BaseModel):
+    """单个模型的大小检查结果"""
+    indices: List[int]  # 该条目在请求中出现的所有位置（重复条目只检查一次）
+    source: str
+    modelId: str
+    fileFilter: Optional[str] = None
+    revision: Optional[str] = None
+    totalBytes: int = 0
+    sizeGB: float = 0.0
+    matchedFiles: int = 0
+    totalFiles: int = 0
+    error: Optional[str] = None
+    cached: bool = False
+
+
+class SizeBatchResponse(BaseModel):
+    """批量大小检查响应"""
+    results: List[SizeBatchResult]  # 按条目在请求中首次出现的顺序排列
+    requested: int
+    unique: int
+    failed: int
+    totalBytes: int
+
+
+class HeaderInspectRequest(BaseModel):
+    """权重文件头部检查请求"""
+    source: str
+    modelId: str
+    authToken: Optional[str] = None
+    revision: Optional[str] = None
+    hfMirror: Optional[str] = None
+    fileFilter: Optional[str] = None  # 文件过滤的正则表达式
+    tensorFilter: Optional[str] = None  # 张量名过滤的正则表达式
+    includeTensors: bool = False
+
+
+class WeightFileInfo(BaseModel):
+    """单个权重文件的头部检查结果"""
+    path: str
+    size: Optional[int] = None
+    format: Optional[str] = None
+    tensorCount: int = 0
+    error: Optional[str] = None
+
+
+class TensorGroup(BaseModel):
+    """按数据类型或层汇总的张量统计"""
+    tensors: int
+    bytes: int
+    parameters: int
+
+
+class TensorInfo(BaseModel):
+    """张量在权重文件中的位置信息"""
+    name: str
+    file: str
+    dtype: str
+    shape: List[int]
+    offset: int
+    length: int
+    parameters: int
+
+
+class HeaderIndexResponse(BaseModel):
+    """权重文件头部索引响应"""
+    source: str
+    modelId: str
+    revision: str
+    files: List[WeightFileInfo]
+    matchedFiles: List[str]
+    tensorCount: int
+    totalParameters: int
+    totalBytes: int
+    dtypes: Dict[str, TensorGroup]
+    layers: Dict[str, TensorGroup]
+    tensors: Optional[List[TensorInfo]] = None
+
+
+class ArchiveMember(BaseModel):
+    """可随机访问归档中的单个成员"""
+    name: str
+    type: str
+    size: int
+    offset: int
+    length: int
+    sha256: Optional[str] = None
+
+
+class ArchiveIndexResponse(BaseModel):
+    """可随机访问归档的成员列表响应"""
+    archive: str
+    format: str
+    archiveSize: int
+    members: List[ArchiveMember]
+
+
+class SpanInfo(BaseModel):
+    """任务时间线中的单个阶段或文件操作"""
+    spanId: int
+    parentId: Optional[int] = None
+    name: str
+    file: Optional[str] = None
+    startTime: float
+    endTime: Optional[float] = None
+    durationMs: float
+    bytes: int = 0
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = Field(default_factory=dict)
+
+
+class TaskTimeline(BaseModel):
+    """任务时间线响应"""
+    taskId: str
+    spans: List[SpanInfo]
+    droppedSpans: int = 0
+
+
+class InventoryFile(BaseModel):
+    """本地模型中的单个文件"""
+    path: str
+    size: int
+
+
+class InventoryModel(BaseModel):
+    """本地清单中的一个模型目录"""
+    repoId: str
+    name: str
+    path: str
+    source: Optional[str] = None
+    revision: Optional[str] = None
+    status: str  # complete、partial（按过滤条件下载）、incomplete、downloading或untracked（没有下载标记的目录）
+    totalSize: int
+    fileCount: int
+    partialFiles: int = 0
+    fileFilter: Optional[str] = None  # 下载时使用了文件过滤条件，目录只包含部分文件
+    tensorFilter: Optional[str] = None  # 下载时使用了张量过滤条件，目录只包含部分或切片后的权重
+    completedAt: Optional[float] = None
+    scannedAt: float
+    files: Optional[List[InventoryFile]] = None
+
+
+class InventoryResponse(BaseModel):
+    """本地模型清单响应"""
+    root: str
+    scannedAt: float
+    totalSize: int
+    models: List[InventoryModel]
@@ -0,0 +1,441 @@
+import io
+import os
+import re
+import bz2
+import gzip
+import json
+import lzma
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Dict, Optional, Any, List, Pattern, Callable, Tuple
+from ..core.config import settings
+from ..services.task_manager import task_manager
+from ..services.tracing import tracer
+from ..services.archive_volumes import MANIFEST_SUFFIX
+from ..services import seekable_archive
+from ..utils.file_writer import FileWriter
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 4 * 1024 * 1024
+
+
+class RestoreCancelled(Exception):
+    """任务在恢复过程中被取消"""
+
+
+class ChecksumError(Exception):
+    """校验和不匹配"""
+
+
+def safe_destination(target: Path, name: str) -> Path:
+    """
+    计算成员的解压路径，拒绝绝对路径和跳出目标目录的路径
+
+    Raises:
+        ValueError: 成员路径不安全
+    """
+    destination = (target / name).resolve()
+    if destination != target and target not in destination.parents:
+        raise ValueError(f"Unsafe member path in archive: {name}")
+    return destination
+
+
+class _Progress:
+    """线程安全的字节进度，节流写入任务管理器并检查取消状态"""
+
+    def __init__(self, task_id: str, total: int):
+        self.task_id = task_id
+        self.total = total
+        self.done = 0
+        self._lock = threading.Lock()
+        self._reported = 0.0
+
+    def add(self, nbytes: int) -> None:
+        with self._lock:
+            self.done += nbytes
+        self._report()
+
+    def set(self, done: int) -> None:
+        with self._lock:
+            self.done = done
+        self._report()
+
+    def _report(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._reported < 0.5:
+                return
+            self._reported = now
+            done = self.done
+        task = task_manager.get_task(self.task_id)
+        if task is not None and task.get("status") == "cancelled":
+            raise RestoreCancelled()
+        task_manager.update_task(self.task_id, done, max(self.total, done))
+
+
+class _HashingReader(io.RawIOBase):
+    """读取时计算sha256的文件包装"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self.raw.readinto(buffer)
+        if count:
+            self.sha256.update(memoryview(buffer)[:count])
+        return count
+
+
+class _ChainedVolumes(io.RawIOBase):
+    """
+    按顺序读取各分卷解压后的数据，作为连续的tar流
+
+    每个分卷在读取前等待其解压线程完成，解压线程抛出的异常（包括校验和不匹配）在此处重新抛出，
+    因此分卷中的数据总是在校验通过之后才会被解压到目标目录。分卷按读取进度提交：
+    包括当前分卷在内最多解压ahead个分卷，读完的临时文件立即删除，临时空间不随归档大小增长。
+    """
+
+    def __init__(self, count: int, submit: Callable[[int], "Future"], ahead: int):
+        self.count = count
+        self.submit = submit
+        self.ahead = max(ahead, 1)
+        self.futures: Dict[int, "Future"] = {}
+        self.index = 0
+        self.current = None
+        self.spooled: Optional[Path] = None
+        self.position = 0
+        self._schedule()
+
+    def _schedule(self) -> None:
+        for i in range(self.index, min(self.index + self.ahead, self.count)):
+            if i not in self.futures:
+                self.futures[i] = self.submit(i)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while True:
+            if self.current is None:
+                if self.index >= self.count:
+                    return 0
+                path, spooled = self.futures.pop(self.index).result()
+                self.current = open(path, "rb")
+                self.spooled = path if spooled else None
+            count = self.current.readinto(target)
+            if count:
+                self.position += count
+                return count
+            self._release()
+            self.index += 1
+            self._schedule()
+
+    def _release(self) -> None:
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        if self.spooled is not None:
+            self.spooled.unlink(missing_ok=True)
+            self.spooled = None
+
+    def close(self) -> None:
+        self._release()
+        super().close()
+
+
+def _open_decompressed(archive_format: str, raw) -> Any:
+    if archive_format == "gztar":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if archive_format == "bztar":
+        return bz2.BZ2File(raw, mode="rb")
+    if archive_format == "xztar":
+        return lzma.LZMAFile(raw, mode="rb")
+    return raw
+
+
+def _detect_format(raw) -> str:
+    """按文件头魔数判断压缩格式，不移动读取位置"""
+    magic = raw.peek(6)[:6]
+    if magic.startswith(b"\x1f\x8b"):
+        return "gztar"
+    if magic.startswith(b"BZh"):
+        return "bztar"
+    if magic.startswith(b"\xfd7zXZ\x00"):
+        return "xztar"
+    return "tar"
+
+
+class ArchiveRestorer:
+    """把归档恢复为模型目录的服务，按归档格式选择可并行的解压方式"""
+
+    def _write_member(self, source, destination: Path, progress: _Progress,
+                      expected_sha256: Optional[str] = None, mtime: Optional[float] = None,
+                      mode: Optional[int] = None) -> None:
+        """将成员内容写入目标文件（先写临时文件），可选校验sha256"""
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        partial = destination.with_name(destination.name + ".part")
+        digest = hashlib.sha256() if expected_sha256 else None
+        try:
+            with FileWriter(partial) as out:
+                for chunk in source:
+                    out.write(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                    progress.add(len(chunk))
+            if digest is not None and digest.hexdigest() != expected_sha256:
+                raise ChecksumError(f"Checksum mismatch for {destination.name}")
+            os.replace(partial, destination)
+        except BaseException:
+            if partial.exists():
+                partial.unlink()
+            raise
+        if mode is not None:
+            os.chmod(destination, mode & 0o777)
+        if mtime is not None:
+            os.utime(destination, (mtime, mtime))
+
+    @staticmethod
+    def _iter_fileobj(fileobj) -> Any:
+        while True:
+            chunk = fileobj.read(READ_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+    def _restore_seekable(self, task_id: str, archive_path: Path, target: Path,
+                          regex: Optional[Pattern], verify: bool) -> int:
+        """可随机访问归档：按成员并行解压"""
+        index = seekable_archive.load_index(archive_path)
+        files = [m for m in index["members"] if m["type"] == "file" and (regex is None or regex.search(m["name"]))]
+        for member in index["members"]:
+            if member["type"] == "directory" and regex is None:
+                safe_destination(target, member["name"]).mkdir(parents=True, exist_ok=True)
+        progress = _Progress(task_id, sum(m["size"] for m in files))
+
+        def extract(member: Dict[str, Any]) -> None:
+            with tracer.span(task_id, "restore_member", file=member["name"]) as span:
+                self._write_member(
+                    seekable_archive.iter_member_data(archive_path, member),
+                    safe_destination(target, member["name"]),
+                    progress,
+                    member.get("sha256") if verify else None,
+                    member.get("mtime"),
+                    member.get("mode")
+                )
+                span.add_bytes(member["size"])
+
+        with ThreadPoolExecutor(max_workers=settings.RESTORE_CONCURRENCY) as pool:
+            for future in [pool.submit(extract, m) for m in files]:
+                future.result()
+        return progress.done
+
+    def _restore_zip(self, task_id: str, archive_path: Path, target: Path, regex: Optional[Pattern]) -> int:
+        """ZIP归档：成员独立压缩，多线程各自打开归档并行解压，CRC由zipfile校验"""
+        with zipfile.ZipFile(archive_path) as zf:
+            members = [i for i in zf.infolist()
+                       if not i.is_dir() and (regex is None or regex.search(i.filename))]
+        progress = _Progress(task_id, sum(i.file_size for i in members))
+        local = threading.local()
+        handles: List[zipfile.ZipFile] = []
+
+        def extract(info: zipfile.ZipInfo) -> None:
+            zf = getattr(local, "zf", None)
+            if zf is None:
+                zf = local.zf = zipfile.ZipFile(archive_path)
+                handles.append(zf)
+            with zf.open(info) as source:
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                self._write_member(self._iter_fileobj(source), safe_destination(target, info.filename),
+                                   progress, mtime=mtime)
+
+        try:
+            with ThreadPoolExecutor(max_workers=settings.RESTORE_CONCURRENCY) as pool:
+                for future in [pool.submit(extract, i) for i in members]:
+                    future.result()
+        finally:
+            for zf in handles:
+                zf.close()
+        return progress.done
+
+    def _extract_tar_stream(self, tf: tarfile.TarFile, target: Path, regex: Optional[Pattern],
+                            progress: _Progress, position: Callable[[], int]) -> None:
+        """顺序解压流式tar中的成员，进度按position返回的已读取字节数计算"""
+        for member in tf:
+            if member.isdir():
+                if regex is None:
+                    safe_destination(target, member.name).mkdir(parents=True, exist_ok=True)
+                continue
+            if not member.isreg():
+                logger.warning(f"Skipping non-regular archive member: {member.name}")
+                continue
+            if regex is not None and not regex.search(member.name):
+                continue
+            destination = safe_destination(target, member.name)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            partial = destination.with_name(destination.name + ".part")
+            source = tf.extractfile(member)
+            try:
+                with FileWriter(partial) as out:
+                    for chunk in self._iter_fileobj(source):
+                        out.write(chunk)
+                        progress.set(position())
+                os.replace(partial, destination)
+            except BaseException:
+                if partial.exists():
+                    partial.unlink()
+                raise
+            os.chmod(destination, member.mode & 0o777)
+            os.utime(destination, (member.mtime, member.mtime))
+        progress.set(position())
+
+    def _restore_tar(self, task_id: str, archive_path: Path, target: Path, regex: Optional[Pattern]) -> int:
+        """单一压缩流的tar归档：只能顺序解压，进度按已读取的归档字节数计算"""
+        progress = _Progress(task_id, archive_path.stat().st_size)
+        with open(archive_path, "rb") as raw:
+            # tarfile的流模式只能解压单个gzip成员，分卷拼接或可随机访问格式的多成员归档需要由GzipFile解压
+            stream = _open_decompressed(_detect_format(raw), raw)
+            with tarfile.open(fileobj=stream, mode="r|") as tf:
+                self._extract_tar_stream(tf, target, regex, progress, raw.tell)
+        return progress.done
+
+    def _restore_split(self, task_id: str, manifest_path: Path, target: Path,
+                       regex: Optional[Pattern], verify: bool) -> int:
+        """
+        多卷归档：多个线程并行读取、校验并把各分卷解压到临时文件，主线程按顺序拼接后流式解压成员
+
+        每个分卷校验通过后其中的成员才会被解压，全部分卷校验通过后任务才算完成。
+        同时存在的临时文件不超过RESTORE_CONCURRENCY个分卷。
+        """
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        volumes = manifest["volumes"]
+        paths = []
+        for volume in volumes:
+            path = Path(volume["target"]) / volume["file"]
+            if not path.exists():
+                # 目标驱动器可能挂载到了其他位置，回退到清单所在目录查找
+                path = manifest_path.parent / volume["file"]
+            if not path.exists():
+                raise FileNotFoundError(f"Archive volume not found: {volume['file']}")
+            paths.append(path)
+
+        stop = threading.Event()
+        # 分卷解压到清单旁的临时目录，不出现在目标目录（模型目录）中
+        spool = Path(tempfile.mkdtemp(prefix=".restore-", dir=manifest_path.parent))
+
+        def produce(i: int) -> Tuple[Path, bool]:
+            """
+            完整读取并校验一个分卷，压缩分卷同时解压到临时文件
+
+            Returns:
+                (可供顺序读取的tar数据文件, 是否为读完后应删除的临时文件)
+            """
+            output = None if manifest["format"] == "tar" else spool / f"{i:05d}.tar"
+            with tracer.span(task_id, "restore_volume", file=volumes[i]["file"]) as span, \
+                    open(paths[i], "rb") as raw:
+                hashing = _HashingReader(raw)
+                if output is None:
+                    # 未压缩的分卷只需校验，之后直接读取原文件
+                    while hashing.read(READ_CHUNK):
+                        if stop.is_set():
+                            raise RestoreCancelled()
+                else:
+                    stream = _open_decompressed(manifest["format"], io.BufferedReader(hashing, READ_CHUNK))
+                    with FileWriter(output) as out:
+                        for chunk in self._iter_fileobj(stream):
+                            if stop.is_set():
+                                raise RestoreCancelled()
+                            out.write(chunk)
+                    # 读完解压器未消费的剩余字节，使校验覆盖整个分卷
+                    while hashing.read(READ_CHUNK):
+                        pass
+                span.add_bytes(paths[i].stat().st_size)
+            if verify and hashing.sha256.hexdigest() != volumes[i]["sha256"]:
+                if output is not None:
+                    output.unlink(missing_ok=True)
+                raise ChecksumError(f"Checksum mismatch for volume {volumes[i]['file']}")
+            return (output, True) if output is not None else (paths[i], False)
+
+        progress = _Progress(task_id, manifest.get("streamSize", 0))
+        logger.info(f"Restoring {len(volumes)} volumes from {manifest_path}")
+        try:
+            with ThreadPoolExecutor(max_workers=settings.RESTORE_CONCURRENCY) as pool:
+                chained = _ChainedVolumes(len(volumes), lambda i: pool.submit(produce, i),
+                                          settings.RESTORE_CONCURRENCY)
+                reader = io.BufferedReader(chained, READ_CHUNK)
+                try:
+                    with tarfile.open(fileobj=reader, mode="r|") as tf:
+                        self._extract_tar_stream(tf, target, regex, progress, lambda: chained.position)
+                    # tar结束标记之后的数据（最后一个分卷的填充部分）不会被tar读取，读到末尾使全部分卷都经过校验
+                    while reader.read(READ_CHUNK):
+                        pass
+                finally:
+                    chained.close()
+                    stop.set()
+        finally:
+            shutil.rmtree(spool, ignore_errors=True)
+        return progress.done
+
+    def restore(self, task_id: str, archive_path: Path, target_path: Optional[Path] = None,
+                member_filter: Optional[str] = None, verify: bool = True) -> None:
+        """
+        将归档恢复到目标目录
+
+        支持可随机访问归档（按成员并行）、多卷清单（分卷并行解压）、ZIP（按成员并行）
+        以及普通tar/tar.gz/tar.bz2/tar.xz（顺序解压）。
+
+        Args:
+            task_id: 任务ID
+            archive_path: 归档文件或 *.manifest.json 清单路径
+            target_path: 目标目录（可选，默认DEFAULT_DOWNLOAD_PATH）
+            member_filter: 成员名过滤正则表达式（可选）
+            verify: 是否校验归档中记录的校验和
+        """
+        target = Path(target_path or settings.DEFAULT_DOWNLOAD_PATH)
+        with tracer.span(task_id, "restore", archive=archive_path.name) as span:
+            try:
+                task_manager.update_task(task_id, 0, 0, "restoring")
+                os.makedirs(target, exist_ok=True)
+                target = target.resolve()
+                regex = re.compile(member_filter) if member_filter else None
+
+                if archive_path.name.endswith(MANIFEST_SUFFIX):
+                    restored = self._restore_split(task_id, archive_path, target, regex, verify)
+                elif seekable_archive.index_path_for(archive_path).exists():
+                    restored = self._restore_seekable(task_id, archive_path, target, regex, verify)
+                elif zipfile.is_zipfile(archive_path):
+                    restored = self._restore_zip(task_id, archive_path, target, regex)
+                elif tarfile.is_tarfile(archive_path):
+                    restored = self._restore_tar(task_id, archive_path, target, regex)
+                else:
+                    raise ValueError(f"Unsupported archive: {archive_path.name}")
+
+                span.add_bytes(restored)
+                task_manager.update_task(task_id, restored, restored, "completed")
+                logger.info(f"Restore completed: {archive_path} -> {target}")
+
+            except RestoreCancelled:
+                logger.info(f"Restore cancelled for task {task_id}")
+            except Exception as e:
+                logger.error(f"Error restoring archive {archive_path}: {str(e)}")
+                span.error = str(e)
+                task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
+
+
+# 全局归档恢复器实例
+archive_restorer = ArchiveRestorer()
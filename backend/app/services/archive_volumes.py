@@ -0,0 +1,252 @@
+import os
+import io
+import bz2
+import gzip
+import lzma
+import json
+import bisect
+import hashlib
+import tarfile
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Any, List, Tuple, Union, Callable, Iterator
+from ..utils.file_writer import FileWriter
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 支持分卷的归档格式及其扩展名；压缩格式的每个分卷独立压缩，按顺序拼接后仍是有效的压缩流
+VOLUME_FORMATS = {
+    "tar": ".tar",
+    "gztar": ".tar.gz",
+    "bztar": ".tar.bz2",
+    "xztar": ".tar.xz",
+}
+MANIFEST_SUFFIX = ".manifest.json"
+READ_CHUNK = 4 * 1024 * 1024
+
+# 流中的一段：(流内偏移, 长度, 内容)，内容为字节或 (源文件路径, 文件内偏移)
+Segment = Tuple[int, int, Union[bytes, Tuple[str, int]]]
+
+
+def iter_tar_members(source_folder: Path) -> Iterator[Tuple[str, tarfile.TarInfo, bytes]]:
+    """
+    按归档顺序遍历source_folder中的条目（与make_archive相同，以文件夹名为根）
+
+    Args:
+        source_folder: 源文件夹
+
+    Yields:
+        (源路径, TarInfo, tar头部字节) 元组
+    """
+    helper = tarfile.TarFile(fileobj=io.BytesIO(), mode="w", format=tarfile.PAX_FORMAT)
+    base = source_folder.parent
+    for root, dirs, files in os.walk(source_folder):
+        dirs.sort()
+        entries = [root] + [os.path.join(root, name) for name in sorted(files)]
+        for path in entries:
+            tarinfo = helper.gettarinfo(path, os.path.relpath(path, base))
+            if tarinfo is None:
+                # 套接字等无法归档的文件
+                continue
+            yield path, tarinfo, tarinfo.tobuf(helper.format, helper.encoding, helper.errors)
+
+
+def tar_padding(size: int) -> bytes:
+    """成员数据之后补齐到块大小的填充"""
+    return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+
+def tar_end_blocks(offset: int) -> bytes:
+    """归档结束块，并与tarfile一样补齐到记录大小"""
+    end = offset + 2 * tarfile.BLOCKSIZE
+    end += -end % tarfile.RECORDSIZE
+    return b"\0" * (end - offset)
+
+
+def plan_tar_stream(source_folder: Path) -> Tuple[List[Segment], int]:
+    """
+    预先计算source_folder打包为tar后的完整字节布局
+
+    布局确定后，任意分卷的内容都可以独立生成，因此多个分卷可以并行写入。
+
+    Args:
+        source_folder: 源文件夹
+
+    Returns:
+        (段列表, tar流总字节数)
+    """
+    segments: List[Segment] = []
+    offset = 0
+
+    def add(length: int, content: Union[bytes, Tuple[str, int]]) -> None:
+        nonlocal offset
+        if length > 0:
+            segments.append((offset, length, content))
+            offset += length
+
+    for path, tarinfo, header in iter_tar_members(source_folder):
+        add(len(header), header)
+        if tarinfo.isreg():
+            add(tarinfo.size, (path, 0))
+            padding = tar_padding(tarinfo.size)
+            add(len(padding), padding)
+    end_blocks = tar_end_blocks(offset)
+    add(len(end_blocks), end_blocks)
+    return segments, offset
+
+
+def iter_stream_range(segments: List[Segment], start: int, end: int) -> Iterator[bytes]:
+    """
+    生成tar流中[start, end)区间的字节
+
+    Args:
+        segments: plan_tar_stream返回的段列表
+        start: 起始偏移
+        end: 结束偏移（不包含）
+    """
+    offsets = [segment[0] for segment in segments]
+    index = max(bisect.bisect_right(offsets, start) - 1, 0)
+    position = start
+    while position < end and index < len(segments):
+        seg_offset, seg_length, content = segments[index]
+        low = max(position, seg_offset)
+        high = min(end, seg_offset + seg_length)
+        if low < high:
+            if isinstance(content, bytes):
+                yield content[low - seg_offset:high - seg_offset]
+            else:
+                path, file_offset = content
+                with open(path, "rb") as f:
+                    f.seek(file_offset + low - seg_offset)
+                    remaining = high - low
+                    while remaining > 0:
+                        chunk = f.read(min(READ_CHUNK, remaining))
+                        if not chunk:
+                            raise IOError(f"File changed while archiving: {path}")
+                        remaining -= len(chunk)
+                        yield chunk
+            position = high
+        index += 1
+
+
+class _HashingWriter(io.RawIOBase):
+    """写入时计算sha256和字节数的文件包装"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+
+def _open_compressor(archive_format: str, raw) -> Any:
+    if archive_format == "gztar":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+    if archive_format == "bztar":
+        return bz2.BZ2File(raw, mode="wb")
+    if archive_format == "xztar":
+        return lzma.LZMAFile(raw, mode="wb")
+    return None
+
+
+def write_split_archive(source_folder: Path, targets: List[Path], archive_name: str, archive_format: str,
+                        volume_size: int, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    将文件夹写为多卷tar归档，分卷按轮转方式分布在多个目标路径上，每个目标路径一个写线程
+
+    压缩格式下volume_size按压缩前的字节数计算。所有分卷按顺序拼接即为完整的归档文件。
+
+    Args:
+        source_folder: 源文件夹
+        targets: 目标路径列表
+        archive_name: 归档基础名称
+        archive_format: 归档格式（tar、gztar、bztar、xztar）
+        volume_size: 分卷大小（字节，压缩前）
+        on_progress: 进度回调，参数为 (已处理字节数, 总字节数)
+
+    Returns:
+        清单字典，同时写入每个目标路径下的 {archive_name}.manifest.json
+    """
+    if archive_format not in VOLUME_FORMATS:
+        raise ValueError(f"Split archives are not supported for format: {archive_format}")
+    if volume_size <= 0:
+        raise ValueError("Volume size must be positive")
+
+    segments, total = plan_tar_stream(source_folder)
+    volume_count = max((total + volume_size - 1) // volume_size, 1)
+    digits = max(3, len(str(volume_count - 1)))
+    extension = VOLUME_FORMATS[archive_format]
+    for target in targets:
+        os.makedirs(target, exist_ok=True)
+
+    lock = threading.Lock()
+    processed = 0
+
+    def advance(nbytes: int) -> None:
+        nonlocal processed
+        with lock:
+            processed += nbytes
+            current = processed
+        if on_progress:
+            on_progress(current, total)
+
+    def write_volume(index: int) -> Dict[str, Any]:
+        target = targets[index % len(targets)]
+        name = f"{archive_name}{extension}.{index:0{digits}d}"
+        start, end = index * volume_size, min((index + 1) * volume_size, total)
+        partial = target / f"{name}.part"
+        with FileWriter(partial) as f:
+            hashing = _HashingWriter(f)
+            compressor = _open_compressor(archive_format, hashing)
+            sink = compressor or hashing
+            for chunk in iter_stream_range(segments, start, end):
+                sink.write(chunk)
+                advance(len(chunk))
+            if compressor:
+                compressor.close()
+        os.replace(partial, target / name)
+        return {
+            "index": index,
+            "file": name,
+            "target": str(target),
+            "size": hashing.size,
+            "sha256": hashing.sha256.hexdigest(),
+            "rawOffset": start,
+            "rawSize": end - start,
+        }
+
+    def write_target(slot: int) -> List[Dict[str, Any]]:
+        # 每个目标路径顺序写入属于自己的分卷，不同目标路径之间并行
+        return [write_volume(index) for index in range(slot, volume_count, len(targets))]
+
+    logger.info(f"Writing {volume_count} volumes of {archive_name} across {len(targets)} targets")
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        results = list(pool.map(write_target, range(min(len(targets), volume_count))))
+    volumes = sorted((v for vols in results for v in vols), key=lambda v: v["index"])
+
+    manifest = {
+        "archiveName": archive_name,
+        "format": archive_format,
+        "source": source_folder.name,
+        "createdAt": time.time(),
+        "volumeSize": volume_size,
+        "streamSize": total,
+        "totalSize": sum(v["size"] for v in volumes),
+        "volumes": volumes,
+    }
+    for target in targets:
+        with open(target / f"{archive_name}{MANIFEST_SUFFIX}", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,449 @@
+import re
+import json
+import struct
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Any, List
+import requests
+from ..core.config import settings
+from ..services import metrics
+from ..services.origin_limiter import adaptive_limiter
+from ..services.repo_listing import iter_files, resolve_revision
+from ..utils import sdk
+from ..utils.hub import file_url, auth_headers, hub_endpoint
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 首次读取的字节数，大多数safetensors头部都在这个范围内
+INITIAL_READ = 64 * 1024
+# 允许的最大头部大小，防止异常文件导致过量读取
+MAX_HEADER_SIZE = 256 * 1024 * 1024
+
+WEIGHT_SUFFIXES = (".safetensors", ".gguf")
+
+# safetensors数据类型的单元素字节数
+SAFETENSORS_DTYPE_SIZES = {
+    "BOOL": 1, "U8": 1, "I8": 1, "F8_E4M3": 1, "F8_E5M2": 1, "F8_E8M0": 1,
+    "U16": 2, "I16": 2, "F16": 2, "BF16": 2,
+    "U32": 4, "I32": 4, "F32": 4,
+    "U64": 8, "I64": 8, "F64": 8,
+}
+
+# GGML张量类型：类型编号 -> (名称, 每块元素数, 每块字节数)
+GGML_TYPES = {
+    0: ("F32", 1, 4), 1: ("F16", 1, 2), 2: ("Q4_0", 32, 18), 3: ("Q4_1", 32, 20),
+    6: ("Q5_0", 32, 22), 7: ("Q5_1", 32, 24), 8: ("Q8_0", 32, 34), 9: ("Q8_1", 32, 36),
+    10: ("Q2_K", 256, 84), 11: ("Q3_K", 256, 110), 12: ("Q4_K", 256, 144), 13: ("Q5_K", 256, 176),
+    14: ("Q6_K", 256, 210), 15: ("Q8_K", 256, 292), 16: ("IQ2_XXS", 256, 66), 17: ("IQ2_XS", 256, 74),
+    18: ("IQ3_XXS", 256, 98), 19: ("IQ1_S", 256, 50), 20: ("IQ4_NL", 32, 18), 21: ("IQ3_S", 256, 110),
+    22: ("IQ2_S", 256, 82), 23: ("IQ4_XS", 256, 136), 24: ("I8", 1, 1), 25: ("I16", 1, 2),
+    26: ("I32", 1, 4), 27: ("I64", 1, 8), 28: ("F64", 1, 8), 29: ("IQ1_M", 256, 56),
+    30: ("BF16", 1, 2), 34: ("TQ1_0", 256, 54), 35: ("TQ2_0", 256, 66),
+}
+
+# GGUF元数据值类型的定长格式
+GGUF_SCALAR_FORMATS = {
+    0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d",
+}
+GGUF_STRING, GGUF_ARRAY = 8, 9
+
+_LAYER_PATTERN = re.compile(r"(?:^|\.)(?:layers|layer|h|blocks|block|blk)\.(\d+)(?:\.|$)")
+
+
+def layer_of(tensor_name: str) -> str:
+    """
+    将张量名归类到层，例如 model.layers.3.mlp.weight -> layers.3；非层张量按模块名归类
+
+    Args:
+        tensor_name: 张量名
+
+    Returns:
+        层或模块名称
+    """
+    match = _LAYER_PATTERN.search(tensor_name)
+    if match:
+        return f"layers.{int(match.group(1))}"
+    for suffix in (".weight", ".bias", ".scale"):
+        if tensor_name.endswith(suffix):
+            return tensor_name[:-len(suffix)]
+    return tensor_name
+
+
+class RemoteFile:
+    """通过HTTP Range请求按需读取远程文件的片段"""
+
+    def __init__(self, session: requests.Session, url: str, headers: Dict[str, str]):
+        self.session = session
+        self.url = url
+        self.headers = headers
+
+    def read(self, start: int, length: int) -> bytes:
+        """
+        读取[start, start+length)区间，文件末尾不足时返回较短的数据
+
+        Raises:
+            requests.HTTPError: 请求失败
+        """
+        if length <= 0:
+            return b""
+        headers = dict(self.headers)
+        headers["Range"] = f"bytes={start}-{start + length - 1}"
+        with adaptive_limiter.request(self.session, "GET", self.url, headers=headers, stream=True,
+                                      timeout=60) as response:
+            if response.status_code == 416:
+                return b""
+            response.raise_for_status()
+            if response.status_code == 206:
+                return response.raw.read(length, decode_content=True)
+            # 服务器忽略了Range，跳过前面的字节后只读取需要的部分
+            data = bytearray()
+            skipped = 0
+            for chunk in response.iter_content(chunk_size=256 * 1024):
+                if skipped < start:
+                    take = min(len(chunk), start - skipped)
+                    skipped += take
+                    chunk = chunk[take:]
+                data.extend(chunk)
+                if len(data) >= length:
+                    break
+            return bytes(data[:length])
+
+
+class _GrowingBuffer:
+    """按需向后扩展读取的缓冲区，用于解析长度未知的GGUF头部"""
+
+    def __init__(self, remote: RemoteFile, initial: bytes):
+        self.remote = remote
+        self.data = bytearray(initial)
+        self.pos = 0
+
+    def _ensure(self, n: int) -> None:
+        needed = self.pos + n
+        while len(self.data) < needed:
+            if len(self.data) >= MAX_HEADER_SIZE:
+                raise ValueError("GGUF header exceeds size limit")
+            chunk = self.remote.read(len(self.data), max(needed - len(self.data), len(self.data)))
+            if not chunk:
+                raise ValueError("Unexpected end of file while reading GGUF header")
+            self.data.extend(chunk)
+
+    def unpack(self, fmt: str) -> Any:
+        size = struct.calcsize(fmt)
+        self._ensure(size)
+        value = struct.unpack_from(fmt, self.data, self.pos)[0]
+        self.pos += size
+        return value
+
+    def string(self) -> str:
+        length = self.unpack("<Q")
+        self._ensure(length)
+        value = bytes(self.data[self.pos:self.pos + length]).decode("utf-8", errors="replace")
+        self.pos += length
+        return value
+
+    def skip(self, n: int) -> None:
+        self._ensure(n)
+        self.pos += n
+
+
+def parse_safetensors_header(remote: RemoteFile, path: str) -> List[Dict[str, Any]]:
+    """
+    读取并解析safetensors头部
+
+    Args:
+        remote: 远程文件
+        path: 仓库内文件路径
+
+    Returns:
+        张量信息列表，offset为文件内绝对偏移
+    """
+    head = remote.read(0, INITIAL_READ)
+    if len(head) < 8:
+        raise ValueError("File too small to be safetensors")
+    header_size = struct.unpack("<Q", head[:8])[0]
+    if header_size > MAX_HEADER_SIZE:
+        raise ValueError(f"Invalid safetensors header size: {header_size}")
+    if len(head) < 8 + header_size:
+        head += remote.read(len(head), 8 + header_size - len(head))
+    header = json.loads(head[8:8 + header_size])
+    data_start = 8 + header_size
+
+    tensors = []
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        begin, end = info["data_offsets"]
+        parameters = 1
+        for dim in info.get("shape", []):
+            parameters *= dim
+        tensors.append({
+            "name": name,
+            "file": path,
+            "dtype": info["dtype"],
+            "shape": info.get("shape", []),
+            "offset": data_start + begin,
+            "length": end - begin,
+            "parameters": parameters,
+        })
+    return tensors
+
+
+def _skip_gguf_value(buffer: _GrowingBuffer, value_type: int) -> Any:
+    if value_type in GGUF_SCALAR_FORMATS:
+        return buffer.unpack(GGUF_SCALAR_FORMATS[value_type])
+    if value_type == GGUF_STRING:
+        return buffer.string()
+    if value_type == GGUF_ARRAY:
+        item_type = buffer.unpack("<I")
+        count = buffer.unpack("<Q")
+        if item_type in GGUF_SCALAR_FORMATS:
+            # 定长数组直接跳过，不逐个解析
+            buffer.skip(count * struct.calcsize(GGUF_SCALAR_FORMATS[item_type]))
+        else:
+            for _ in range(count):
+                _skip_gguf_value(buffer, item_type)
+        return None
+    raise ValueError(f"Unknown GGUF value type: {value_type}")
+
+
+def parse_gguf_header(remote: RemoteFile, path: str, file_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    读取并解析GGUF头部（元数据和张量信息）
+
+    Args:
+        remote: 远程文件
+        path: 仓库内文件路径
+        file_size: 文件大小（可选，用于推算未知类型张量的长度）
+
+    Returns:
+        张量信息列表，offset为文件内绝对偏移
+    """
+    buffer = _GrowingBuffer(remote, remote.read(0, INITIAL_READ))
+    buffer._ensure(4)
+    if bytes(buffer.data[:4]) != b"GGUF":
+        raise ValueError("Not a GGUF file")
+    buffer.pos = 4
+    version = buffer.unpack("<I")
+    count_format = "<I" if version == 1 else "<Q"
+    tensor_count = buffer.unpack(count_format)
+    kv_count = buffer.unpack(count_format)
+
+    alignment = 32
+    for _ in range(kv_count):
+        key = buffer.string()
+        value = _skip_gguf_value(buffer, buffer.unpack("<I"))
+        if key == "general.alignment" and isinstance(value, int):
+            alignment = value
+
+    raw_tensors = []
+    for _ in range(tensor_count):
+        name = buffer.string()
+        n_dims = buffer.unpack("<I")
+        shape = [buffer.unpack(count_format) for _ in range(n_dims)]
+        ggml_type = buffer.unpack("<I")
+        offset = buffer.unpack("<Q")
+        raw_tensors.append((name, shape, ggml_type, offset))
+    data_start = (buffer.pos + alignment - 1) // alignment * alignment
+
+    tensors = []
+    ordered_offsets = sorted(t[3] for t in raw_tensors)
+    for name, shape, ggml_type, offset in raw_tensors:
+        parameters = 1
+        for dim in shape:
+            parameters *= dim
+        type_name, block_elems, block_bytes = GGML_TYPES.get(ggml_type, (f"TYPE_{ggml_type}", None, None))
+        if block_elems:
+            length = parameters // block_elems * block_bytes
+        else:
+            # 未知类型：以下一个张量的偏移（或文件末尾）推算长度
+            following = [o for o in ordered_offsets if o > offset]
+            end = following[0] if following else ((file_size - data_start) if file_size else offset)
+            length = end - offset
+        tensors.append({
+            "name": name,
+            "file": path,
+            "dtype": type_name,
+            # GGUF按从内到外的顺序存储维度，转换为常见的从外到内顺序
+            "shape": list(reversed(shape)),
+            "offset": data_start + offset,
+            "length": length,
+            "parameters": parameters,
+        })
+    return tensors
+
+
+def summarize(index: Dict[str, Any], tensor_filter: Optional[str] = None,
+              include_tensors: bool = False) -> Dict[str, Any]:
+    """
+    按数据类型和层汇总张量索引
+
+    Args:
+        index: inspect返回的张量索引
+        tensor_filter: 张量名正则表达式（可选）
+        include_tensors: 是否在结果中包含张量列表
+
+    Returns:
+        汇总结果
+    """
+    tensors = index["tensors"]
+    if tensor_filter:
+        regex = re.compile(tensor_filter)
+        tensors = [t for t in tensors if regex.search(t["name"])]
+
+    dtypes: Dict[str, Dict[str, int]] = {}
+    layers: Dict[str, Dict[str, int]] = {}
+    matched_files: Dict[str, int] = {}
+    for tensor in tensors:
+        for group, key in ((dtypes, tensor["dtype"]), (layers, layer_of(tensor["name"]))):
+            entry = group.setdefault(key, {"tensors": 0, "bytes": 0, "parameters": 0})
+            entry["tensors"] += 1
+            entry["bytes"] += tensor["length"]
+            entry["parameters"] += tensor["parameters"]
+        matched_files[tensor["file"]] = matched_files.get(tensor["file"], 0) + tensor["length"]
+
+    result = {
+        "source": index["source"],
+        "modelId": index["modelId"],
+        "revision": index["revision"],
+        "files": index["files"],
+        "matchedFiles": sorted(matched_files),
+        "tensorCount": len(tensors),
+        "totalParameters": sum(t["parameters"] for t in tensors),
+        "totalBytes": sum(t["length"] for t in tensors),
+        "dtypes": dtypes,
+        "layers": layers,
+    }
+    if include_tensors:
+        result["tensors"] = tensors
+    return result
+
+
+class HeaderInspector:
+    """远程权重文件头部检查服务，只通过Range请求读取头部，不下载权重数据"""
+
+    def __init__(self, cache_size: int = 128):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.HEADER_FETCH_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def list_files(self, source: str, model_id: str, revision: Optional[str] = None, token: Optional[str] = None,
+                   endpoint: Optional[str] = None) -> Tuple[str, List[Tuple[str, Optional[int]]]]:
+        """
+        列出仓库中的全部文件
+
+        Args:
+            source: 模型来源
+            model_id: 模型ID
+            revision: 版本（可选）
+            token: 认证令牌（可选）
+            endpoint: 仓库地址（可选）
+
+        Returns:
+            (解析后的版本, [(路径, 大小)]) 元组
+        """
+        if source == "huggingface":
+            hf = sdk.load_huggingface_hub()
+            base = hub_endpoint(source, endpoint)
+            info = adaptive_limiter.call(base, hf.HfApi(endpoint=base).model_info,
+                                         model_id, revision=revision, files_metadata=True, token=token)
+            files = [(s.rfilename, s.size) for s in (info.siblings or [])]
+            return info.sha or revision or "main", files
+        if source == "modelscope":
+            # 通过HTTP接口分页列出，使用MODELSCOPE_ENDPOINT，不依赖modelscope SDK
+            resolved = resolve_revision(source, model_id, revision, token, endpoint)
+            return resolved, list(iter_files(source, model_id, resolved, token, endpoint))
+        raise ValueError(f"Unsupported source: {source}")
+
+    def _inspect_file(self, source: str, model_id: str, revision: str, path: str, size: Optional[int],
+                      token: Optional[str], endpoint: Optional[str]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        url = file_url(source, model_id, path, revision, endpoint)
+        remote = RemoteFile(self.session, url, auth_headers(source, token))
+        file_info = {"path": path, "size": size, "format": None, "tensorCount": 0, "error": None}
+        try:
+            if path.endswith(".gguf"):
+                file_info["format"] = "gguf"
+                tensors = parse_gguf_header(remote, path, size)
+            else:
+                file_info["format"] = "safetensors"
+                tensors = parse_safetensors_header(remote, path)
+            file_info["tensorCount"] = len(tensors)
+            return file_info, tensors
+        except Exception as e:
+            logger.warning(f"Failed to inspect header of {model_id}/{path}: {str(e)}")
+            file_info["error"] = str(e)
+            return file_info, []
+
+    def inspect(self, source: str, model_id: str, token: Optional[str] = None, revision: Optional[str] = None,
+                endpoint: Optional[str] = None, file_filter: Optional[str] = None) -> Dict[str, Any]:
+        """
+        构建模型所有权重文件的张量索引，结果按解析后的版本缓存
+
+        Args:
+            source: 模型来源
+            model_id: 模型ID
+            token: 认证令牌（可选）
+            revision: 版本（可选）
+            endpoint: 仓库地址（可选）
+            file_filter: 文件过滤正则表达式（可选）
+
+        Returns:
+            包含文件列表和全部张量信息的索引
+        """
+        resolved, files = self.list_files(source, model_id, revision, token, endpoint)
+        files = [(path, size) for path, size in files if path.endswith(WEIGHT_SUFFIXES)]
+        if file_filter:
+            regex = re.compile(file_filter)
+            files = [(path, size) for path, size in files if regex.search(path)]
+
+        key = (source, model_id, resolved, file_filter or "")
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            metrics.CACHE_REQUESTS.labels("header_index", "hit").inc()
+            return cached
+        metrics.CACHE_REQUESTS.labels("header_index", "miss").inc()
+
+        logger.info(f"Inspecting {len(files)} weight file headers for {source}/{model_id}@{resolved}")
+        with ThreadPoolExecutor(max_workers=settings.HEADER_FETCH_CONCURRENCY) as pool:
+            results = list(pool.map(
+                lambda f: self._inspect_file(source, model_id, resolved, f[0], f[1], token, endpoint), files))
+
+        index = {
+            "source": source,
+            "modelId": model_id,
+            "revision": resolved,
+            "files": [file_info for file_info, _ in results],
+            "tensors": [tensor for _, tensors in results for tensor in tensors],
+        }
+        # 只缓存完整成功的结果
+        if all(file_info["error"] is None for file_info, _ in results):
+            with self._lock:
+                self._cache[key] = index
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return index
+
+    def files_for_tensors(self, source: str, model_id: str, tensor_filter: str, token: Optional[str] = None,
+                          revision: Optional[str] = None, endpoint: Optional[str] = None) -> List[str]:
+        """
+        查找包含匹配张量的权重文件，供下载时作为文件过滤条件
+
+        Returns:
+            包含至少一个匹配张量的文件路径列表
+        """
+        index = self.inspect(source, model_id, token, revision, endpoint)
+        return summarize(index, tensor_filter)["matchedFiles"]
+
+
+# 全局头部检查器实例
+header_inspector = HeaderInspector()
@@ -0,0 +1,161 @@
+import os
+import socket
+import threading
+import uuid
+import logging
+from pathlib import Path
+from typing import Dict, Any, Callable, List
+from fastapi import BackgroundTasks
+from ..core.config import settings
+from ..services.task_manager import task_manager
+from ..services.model_downloader import model_downloader
+from ..services.tensor_extractor import tensor_extractor
+from ..services.archive_restorer import archive_restorer
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _run_archive(task_id: str, source_folder: str, target_drive: str, target_drives: List[str] = None,
+                 **kwargs: Any) -> None:
+    model_downloader.archive_and_move(task_id, Path(source_folder), Path(target_drive),
+                                      target_drives=[Path(t) for t in target_drives or []], **kwargs)
+
+
+def _run_restore(task_id: str, archive_path: str, target_path: str = None, **kwargs: Any) -> None:
+    archive_restorer.restore(task_id, Path(archive_path), Path(target_path) if target_path else None, **kwargs)
+
+
+def _run_tensors(task_id: str, model_id: str, archive_after: bool = False, target_drive_path: str = None,
+                 archive_name: str = None, archive_format: str = "zip", **kwargs: Any) -> None:
+    save_path = tensor_extractor.extract(task_id, model_id=model_id, **kwargs)
+    if save_path is not None and archive_after and target_drive_path:
+        model_downloader.archive_and_move(task_id, save_path, Path(target_drive_path),
+                                          archive_name or model_id.split("/")[-1], archive_format)
+
+
+# 作业类型到执行函数的映射，参数均为可JSON序列化的关键字参数
+JOB_HANDLERS: Dict[str, Callable[..., None]] = {
+    "huggingface": model_downloader.download_huggingface_model,
+    "modelscope": model_downloader.download_modelscope_model,
+    "archive": _run_archive,
+    "tensors": _run_tensors,
+    "restore": _run_restore,
+}
+
+
+class JobRunner:
+    """
+    后台作业执行器
+
+    内存后端下作业直接交给FastAPI的BackgroundTasks在当前进程执行；
+    共享后端（sqlite）下作业写入存储，由任一工作进程的认领线程以租约方式领取并执行，
+    执行期间定期续租，工作进程崩溃后租约过期，作业会被其他进程重新认领。
+    """
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def shared(self) -> bool:
+        return task_manager.store.shared
+
+    def submit(self, background_tasks: BackgroundTasks, task_id: str, kind: str, **params: Any) -> None:
+        """
+        提交作业
+
+        Args:
+            background_tasks: 当前请求的后台任务集合
+            task_id: 任务ID
+            kind: 作业类型（huggingface、modelscope、archive、tensors、restore）
+            **params: 作业参数
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self.shared:
+            task_manager.store.enqueue_job(task_id, kind, params)
+            logger.info(f"Queued {kind} job for task {task_id}")
+        else:
+            background_tasks.add_task(self.run_job, kind, task_id, params)
+
+    def run_job(self, kind: str, task_id: str, params: Dict[str, Any]) -> None:
+        """执行作业"""
+        JOB_HANDLERS[kind](task_id, **params)
+
+    def start(self) -> None:
+        """启动作业认领线程（仅共享后端）"""
+        if not self.shared or self._threads:
+            return
+        self._stop.clear()
+        for i in range(max(settings.TASK_WORKER_CONCURRENCY, 1)):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {len(self._threads)} job workers as {self.owner}")
+
+    def stop(self) -> None:
+        """停止认领新作业，正在执行的作业在进程退出后由其他工作进程接管"""
+        self._stop.set()
+        self._threads = []
+
+    def _worker_loop(self) -> None:
+        store = task_manager.store
+        while not self._stop.is_set():
+            try:
+                claimed = store.claim_job(self.owner, settings.TASK_LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"Failed to claim job: {str(e)}")
+                claimed = None
+            if claimed is None:
+                self._stop.wait(settings.TASK_POLL_INTERVAL)
+                continue
+
+            task_id, kind, params, attempts = claimed
+            if attempts > settings.TASK_MAX_ATTEMPTS:
+                logger.error(f"Job for task {task_id} exceeded {settings.TASK_MAX_ATTEMPTS} attempts")
+                task_manager.update_task(task_id, 0, 0, "failed: worker lost the job too many times")
+                store.finish_job(task_id, self.owner, "failed")
+                continue
+            if attempts > 1:
+                logger.warning(f"Reclaimed {kind} job for task {task_id} (attempt {attempts})")
+            self._run_with_heartbeat(task_id, kind, params)
+
+    def _run_with_heartbeat(self, task_id: str, kind: str, params: Dict[str, Any]) -> None:
+        store = task_manager.store
+        done = threading.Event()
+        lost = threading.Event()
+
+        def heartbeat() -> None:
+            while not done.wait(settings.TASK_HEARTBEAT_SECONDS):
+                if not store.renew_lease(task_id, self.owner, settings.TASK_LEASE_SECONDS):
+                    # 租约已过期，作业可能已被其他工作进程认领：让本进程中的作业在下一个检查点退出
+                    logger.warning(f"Lost lease for task {task_id}, stopping the local job")
+                    task_manager.revoke(task_id)
+                    lost.set()
+                    return
+
+        beater = threading.Thread(target=heartbeat, name=f"heartbeat-{task_id}", daemon=True)
+        beater.start()
+        state = "done"
+        try:
+            logger.info(f"Running {kind} job for task {task_id}")
+            self.run_job(kind, task_id, params)
+        except Exception as e:
+            logger.error(f"Job for task {task_id} failed: {str(e)}")
+            task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
+            state = "failed"
+        finally:
+            done.set()
+            beater.join()
+            if lost.is_set():
+                # 作业状态归接管者所有，不再结束作业
+                task_manager.clear_revoked(task_id)
+            else:
+                store.finish_job(task_id, self.owner, state)
+
+
+# 全局作业执行器实例
+job_runner = JobRunner()
@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Any, List
+from ..core.config import settings
+from ..services.task_manager import task_manager
+from ..services.local_mirror import LocalRepo, HIDDEN_DIRS, PARTIAL_SUFFIXES
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 下载完成时写入模型目录的标记文件，记录来源、模型ID和版本（位于隐藏的.cache目录中）
+MARKER_PATH = Path(".cache") / "llm-packer" / "download.json"
+# 表示文件尚未下载或写入完成的后缀（.lock文件在下载结束后仍会保留，不计入）
+INCOMPLETE_SUFFIXES = (".part", ".incomplete")
+
+
+class InventoryEntry:
+    """清单中的一个模型目录"""
+
+    def __init__(self, key: str, folder: Path):
+        self.key = key
+        self.folder = folder
+        self.repo: Optional[LocalRepo] = None
+        self.marker: Optional[Dict[str, Any]] = None
+        self.partial_files = 0
+        self.total_size = 0
+        # 目录（相对路径）-> 修改时间，任一目录的修改时间变化时重新扫描该模型
+        self.dir_mtimes: Dict[str, int] = {}
+        self.scanned_at = 0.0
+
+    @property
+    def repo_id(self) -> str:
+        """模型ID：优先使用下载标记，否则使用相对于下载根目录的路径"""
+        if self.marker and self.marker.get("modelId"):
+            return self.marker["modelId"]
+        return self.key
+
+    @property
+    def source(self) -> Optional[str]:
+        return self.marker.get("source") if self.marker else None
+
+    @property
+    def filtered(self) -> bool:
+        """下载时是否使用了文件或张量过滤（目录只包含部分文件或切片后的权重）"""
+        return bool(self.marker and (self.marker.get("fileFilter") or self.marker.get("tensorFilter")))
+
+    @property
+    def revision(self) -> Optional[str]:
+        if self.marker and self.marker.get("revision"):
+            return self.marker["revision"]
+        return self.repo.sha if self.repo else None
+
+    def scan(self) -> None:
+        """遍历模型目录，记录文件大小、未完成的临时文件和各级目录的修改时间"""
+        files: Dict[str, os.stat_result] = {}
+        dir_mtimes: Dict[str, int] = {}
+        partial_files = 0
+        for root, dirs, names in os.walk(self.folder):
+            relative_root = Path(root).relative_to(self.folder)
+            try:
+                dir_mtimes[relative_root.as_posix()] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            # 隐藏目录同样需要遍历，SDK未完成的下载位于.cache中
+            hidden = bool(relative_root.parts) and relative_root.parts[0] in HIDDEN_DIRS
+            for name in names:
+                if name.endswith(PARTIAL_SUFFIXES):
+                    if name.endswith(INCOMPLETE_SUFFIXES):
+                        partial_files += 1
+                    continue
+                if hidden:
+                    continue
+                full = Path(root) / name
+                try:
+                    files[full.relative_to(self.folder).as_posix()] = full.stat()
+                except OSError:
+                    continue
+
+        marker = None
+        try:
+            with open(self.folder / MARKER_PATH, encoding="utf-8") as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        self.marker = marker
+        self.repo = LocalRepo(self.repo_id, self.folder, files)
+        self.partial_files = partial_files
+        self.total_size = sum(stat.st_size for stat in files.values())
+        self.dir_mtimes = dir_mtimes
+        self.scanned_at = time.time()
+
+    def changed(self) -> bool:
+        """通过比较目录修改时间判断是否有文件被创建、删除或重命名（只stat目录，不遍历文件）"""
+        for relative, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(self.folder / relative).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def status(self, downloading: bool) -> str:
+        """
+        完整性状态：downloading（有进行中的下载任务）、incomplete（存在未完成的临时文件或没有文件）、
+        partial（按文件或张量过滤下载，只包含仓库的一部分）、complete（由本服务完整下载）、
+        untracked（没有下载标记，例如手动复制的目录）
+        """
+        if downloading:
+            return "downloading"
+        if self.partial_files or not self.repo or not self.repo.files:
+            return "incomplete"
+        if self.filtered:
+            return "partial"
+        return "complete" if self.marker else "untracked"
+
+    def to_dict(self, downloading: bool = False, include_files: bool = False) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "repoId": self.repo_id,
+            "name": self.folder.name,
+            "path": str(self.folder),
+            "source": self.source,
+            "revision": self.revision,
+            "status": self.status(downloading),
+            "totalSize": self.total_size,
+            "fileCount": len(self.repo.files) if self.repo else 0,
+            "partialFiles": self.partial_files,
+            "fileFilter": self.marker.get("fileFilter") if self.marker else None,
+            "tensorFilter": self.marker.get("tensorFilter") if self.marker else None,
+            "completedAt": self.marker.get("completedAt") if self.marker else None,
+            "scannedAt": self.scanned_at,
+        }
+        if include_files and self.repo:
+            data["files"] = [{"path": path, "size": stat.st_size} for path, stat in sorted(self.repo.files.items())]
+        return data
+
+
+class LocalInventory:
+    """
+    DEFAULT_DOWNLOAD_PATH中已有模型的清单
+
+    启动后完整扫描一次，之后定期只检查各目录的修改时间，仅重新扫描发生变化的模型目录。
+    查询直接读取内存中的索引，不遍历目录。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.DEFAULT_DOWNLOAD_PATH)
+        self._entries: Dict[str, InventoryEntry] = {}
+        self._by_id: Dict[str, str] = {}
+        # _lock保护索引的读写；_scan_lock串行化扫描，扫描期间查询不被阻塞
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.scanned_at = 0.0
+
+    @staticmethod
+    def _has_files(folder: Path) -> bool:
+        try:
+            with os.scandir(folder) as it:
+                return any(e.is_file() and not e.name.startswith(".") for e in it)
+        except OSError:
+            return False
+
+    def _model_folders(self, top: os.DirEntry) -> List[str]:
+        """
+        顶层目录直接包含文件时即为模型目录（默认按模型名保存），
+        否则把其中包含文件的子目录视为按 组织/名称 保存的模型目录
+        """
+        if self._has_files(Path(top.path)):
+            return [top.name]
+        keys = []
+        try:
+            with os.scandir(top.path) as it:
+                for sub in it:
+                    if sub.is_dir() and sub.name not in HIDDEN_DIRS and self._has_files(Path(sub.path)):
+                        keys.append(f"{top.name}/{sub.name}")
+        except OSError:
+            pass
+        return keys
+
+    def refresh(self, full: bool = False) -> None:
+        """
+        更新清单：新出现的模型目录完整扫描，已有目录只在修改时间变化时重新扫描
+
+        Args:
+            full: 是否忽略修改时间，重新扫描全部目录
+        """
+        with self._scan_lock:
+            started = time.monotonic()
+            keys: List[str] = []
+            try:
+                with os.scandir(self.root) as it:
+                    tops = [e for e in it if e.is_dir() and e.name not in HIDDEN_DIRS]
+            except OSError:
+                tops = []
+            for top in tops:
+                keys.extend(self._model_folders(top))
+
+            rescanned = 0
+            entries: Dict[str, InventoryEntry] = {}
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or full or entry.changed():
+                    entry = entry or InventoryEntry(key, self.root / key)
+                    try:
+                        entry.scan()
+                    except OSError as e:
+                        logger.warning(f"Failed to scan {entry.folder}: {str(e)}")
+                        continue
+                    rescanned += 1
+                entries[key] = entry
+
+            with self._lock:
+                self._entries = entries
+                self._reindex()
+                self.scanned_at = time.time()
+            if rescanned:
+                logger.info(f"Inventory refreshed: {len(entries)} models, {rescanned} rescanned "
+                            f"in {time.monotonic() - started:.2f}s")
+
+    def _reindex(self) -> None:
+        self._by_id = {}
+        for key, entry in self._entries.items():
+            self._by_id[entry.repo_id] = key
+
+    def _ensure_loaded(self) -> None:
+        if not self.scanned_at:
+            self.refresh()
+
+    def refresh_folder(self, folder: Path) -> None:
+        """立即重新扫描一个模型目录（下载完成后调用），目录不在下载根目录下时忽略"""
+        try:
+            key = folder.resolve().relative_to(self.root.resolve()).as_posix()
+        except (OSError, ValueError):
+            return
+        with self._scan_lock:
+            entry = self._entries.get(key) or InventoryEntry(key, self.root / key)
+            try:
+                entry.scan()
+            except OSError as e:
+                logger.warning(f"Failed to scan {entry.folder}: {str(e)}")
+                return
+            with self._lock:
+                self._entries[key] = entry
+                self._reindex()
+
+    def record_download(self, folder: Path, source: str, model_id: str, revision: Optional[str] = None,
+                        file_filter: Optional[str] = None, tensor_filter: Optional[str] = None) -> None:
+        """
+        在模型目录中写入下载完成标记并更新清单
+
+        Args:
+            folder: 模型目录
+            source: 模型来源
+            model_id: 模型ID
+            revision: 下载的版本（可选）
+            file_filter: 下载时使用的文件过滤条件（可选，表示目录只包含部分文件）
+            tensor_filter: 下载时使用的张量过滤条件（可选，表示目录只包含部分权重文件或切片后的权重）
+        """
+        marker_path = Path(folder) / MARKER_PATH
+        try:
+            marker_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = marker_path.with_name(marker_path.name + ".tmp")
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"source": source, "modelId": model_id, "revision": revision,
+                           "fileFilter": file_filter, "tensorFilter": tensor_filter,
+                           "completedAt": time.time()}, f, indent=2)
+            os.replace(temporary, marker_path)
+        except OSError as e:
+            logger.warning(f"Failed to write download marker for {model_id}: {str(e)}")
+            return
+        self.refresh_folder(Path(folder))
+
+    def _is_downloading(self, entry: InventoryEntry, active: set) -> bool:
+        return entry.repo_id in active or any(model_id.split("/")[-1] == entry.folder.name for model_id in active)
+
+    def is_downloading(self, entry: InventoryEntry) -> bool:
+        """模型目录是否有进行中的下载任务（此时目录内容不完整）"""
+        return self._is_downloading(entry, task_manager.active_download_ids())
+
+    def find_entry(self, model_id: str, source: Optional[str] = None) -> Optional[InventoryEntry]:
+        """
+        查找模型对应的清单条目：按下载标记中的模型ID匹配，没有标记的目录要求相对路径与模型ID完全一致
+        （只按模型名匹配时不同组织的同名模型会相互冲突）
+
+        命中的目录在上次扫描后有变化时（只比较目录修改时间）先重新扫描该目录。
+
+        Args:
+            model_id: 模型ID
+            source: 模型来源（可选，只匹配记录了相同来源或未记录来源的目录）
+
+        Returns:
+            清单条目，本地没有时返回None
+        """
+        self._ensure_loaded()
+        model_id = model_id.strip("/")
+        with self._lock:
+            key = self._by_id.get(model_id)
+            entry = self._entries.get(key) if key else None
+        if entry is not None and entry.changed():
+            self.refresh_folder(entry.folder)
+            with self._lock:
+                entry = self._entries.get(key)
+        if entry is None or (source and entry.source and entry.source != source):
+            return None
+        return entry
+
+    def lookup(self, model_id: str, source: Optional[str] = None,
+               include_files: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        查找本地已有的模型
+
+        Args:
+            model_id: 模型ID
+            source: 模型来源（可选，只匹配记录了相同来源或未记录来源的目录）
+            include_files: 是否返回文件列表
+
+        Returns:
+            模型信息字典，本地没有时返回None
+        """
+        entry = self.find_entry(model_id, source)
+        if entry is None:
+            return None
+        return entry.to_dict(self.is_downloading(entry), include_files)
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """列出清单中的全部模型"""
+        self._ensure_loaded()
+        active = task_manager.active_download_ids()
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e.key)
+        return [entry.to_dict(self._is_downloading(entry, active)) for entry in entries]
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Inventory refresh failed: {str(e)}")
+            if self._stop.wait(settings.INVENTORY_REFRESH_SECONDS):
+                return
+
+    def start(self) -> None:
+        """启动后台线程：首次完整扫描，之后按INVENTORY_REFRESH_SECONDS检查变化"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="local-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# 全局本地模型清单实例
+local_inventory = LocalInventory()
@@ -0,0 +1,163 @@
+import os
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Any, List, Tuple
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 不对外提供的目录和文件（SDK元数据、未完成的下载）
+HIDDEN_DIRS = {".cache", ".git"}
+PARTIAL_SUFFIXES = (".part", ".incomplete", ".lock")
+METADATA_DIR = Path(".cache") / "huggingface" / "download"
+
+
+class LocalRepo:
+    """DEFAULT_DOWNLOAD_PATH中一个已下载完成的模型目录"""
+
+    def __init__(self, repo_id: str, folder: Path, files: Optional[Dict[str, os.stat_result]] = None):
+        self.repo_id = repo_id
+        self.folder = folder
+        # 已扫描的文件（例如来自本地清单）可直接传入，避免重复遍历
+        self.files = self._scan() if files is None else files
+        self.sha = self._resolve_sha()
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        files = {}
+        for root, dirs, names in os.walk(self.folder):
+            dirs[:] = [d for d in dirs if d not in HIDDEN_DIRS]
+            for name in names:
+                if name.endswith(PARTIAL_SUFFIXES):
+                    continue
+                full = Path(root) / name
+                try:
+                    files[full.relative_to(self.folder).as_posix()] = full.stat()
+                except OSError:
+                    continue
+        return files
+
+    def _resolve_sha(self) -> str:
+        """
+        确定本地快照的提交哈希：huggingface_hub在local_dir中记录的上游提交一致时沿用它，
+        否则根据文件列表生成一个稳定的哈希
+        """
+        commits = set()
+        metadata_root = self.folder / METADATA_DIR
+        for path in self.files:
+            try:
+                with open(metadata_root / f"{path}.metadata", encoding="utf-8") as f:
+                    commits.add(f.readline().strip())
+            except OSError:
+                commits.add(None)
+                break
+        if len(commits) == 1 and None not in commits:
+            return commits.pop()
+        digest = hashlib.sha1()
+        for path, stat in sorted(self.files.items()):
+            digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def etag(self, path: str) -> str:
+        """基于大小和修改时间的文件标识，避免为大文件计算内容哈希"""
+        stat = self.files[path]
+        return hashlib.sha1(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8")).hexdigest()
+
+    def matches(self, revision: Optional[str]) -> bool:
+        """本地快照能否代表请求的版本"""
+        return revision in (None, "", "main", "master", self.sha)
+
+    def model_info(self, blobs: bool = False, repo_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        构造与Hugging Face /api/models/{repo_id} 兼容的模型信息
+
+        Args:
+            blobs: 是否包含文件大小和标识
+            repo_id: 请求中的模型ID（可选，按模型名保存的目录默认只知道模型名）
+        """
+        repo_id = repo_id or self.repo_id
+        siblings = []
+        for path, stat in sorted(self.files.items()):
+            sibling: Dict[str, Any] = {"rfilename": path}
+            if blobs:
+                sibling["size"] = stat.st_size
+                sibling["blobId"] = self.etag(path)
+            siblings.append(sibling)
+        return {
+            "_id": self.sha,
+            "id": repo_id,
+            "modelId": repo_id,
+            "sha": self.sha,
+            "private": False,
+            "disabled": False,
+            "gated": False,
+            "tags": [],
+            "siblings": siblings,
+            "usedStorage": sum(stat.st_size for stat in self.files.values()),
+        }
+
+    def tree(self, path: str = "", recursive: bool = False) -> List[Dict[str, Any]]:
+        """构造与 /api/models/{repo_id}/tree/{revision}/{path} 兼容的文件列表"""
+        prefix = f"{path.strip('/')}/" if path.strip("/") else ""
+        entries: Dict[str, Dict[str, Any]] = {}
+        for file_path, stat in sorted(self.files.items()):
+            if not file_path.startswith(prefix):
+                continue
+            rest = file_path[len(prefix):]
+            if "/" in rest and not recursive:
+                directory = prefix + rest.split("/", 1)[0]
+                entries.setdefault(directory, {"type": "directory", "oid": self.etag(file_path), "path": directory})
+                continue
+            if recursive:
+                # 递归列表中同样包含中间目录
+                parts = rest.split("/")[:-1]
+                for i in range(1, len(parts) + 1):
+                    directory = prefix + "/".join(parts[:i])
+                    entries.setdefault(directory, {"type": "directory", "oid": self.etag(file_path), "path": directory})
+            entries[file_path] = {"type": "file", "oid": self.etag(file_path), "size": stat.st_size, "path": file_path}
+        return list(entries.values())
+
+
+class LocalMirror:
+    """把DEFAULT_DOWNLOAD_PATH中已完成的下载以Hugging Face兼容接口只读提供给其他实例"""
+
+    def find(self, repo_id: str, revision: Optional[str] = None) -> Optional[LocalRepo]:
+        """
+        查找本地已下载完成的模型，直接使用本地模型清单中已扫描的文件列表，不遍历目录
+
+        Args:
+            repo_id: 模型ID（组织/名称）
+            revision: 请求的版本（可选）
+
+        Returns:
+            本地模型，未命中、正在下载、存在未完成的文件或按过滤条件只下载了部分内容时返回None
+            （部分下载和切片后的权重不能作为上游仓库的副本提供）
+        """
+        # local_inventory依赖本模块中的LocalRepo，在使用时导入
+        from ..services.local_inventory import local_inventory
+
+        entry = local_inventory.find_entry(repo_id)
+        if entry is None or entry.status(local_inventory.is_downloading(entry)) not in ("complete", "untracked"):
+            return None
+        repo = entry.repo
+        # 下载标记中记录的版本同样可以代表本地快照
+        if repo is None or not (repo.matches(revision) or revision == entry.revision):
+            return None
+        return repo
+
+    def resolve_file(self, repo_id: str, revision: str, path: str) -> Optional[Tuple[LocalRepo, Path]]:
+        """
+        查找本地模型中的单个文件
+
+        Returns:
+            (本地模型, 文件绝对路径)，未命中时返回None
+        """
+        repo = self.find(repo_id, revision)
+        if repo is None or path not in repo.files:
+            return None
+        return repo, repo.folder / path
+
+
+# 全局本地镜像实例
+local_mirror = LocalMirror()
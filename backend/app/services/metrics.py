@@ -0,0 +1,303 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    """单个标签组合的计数器值"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    """单个标签组合的仪表值"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    """单个标签组合的直方图值"""
+
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    """指标基类，按标签值缓存子对象，热路径上只有一次字典查找"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """获取指定标签值的子对象"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def collect(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def collect(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    """仪表，可直接设置，也可以在采集时通过回调计算"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def collect(self) -> Iterable[str]:
+        if self.callback is not None:
+            try:
+                values_by_labels = self.callback()
+                # 回调结果代表完整的当前状态，清除已消失的标签组合
+                with self._lock:
+                    self._children.clear()
+                for values, value in values_by_labels.items():
+                    self.labels(*values).set(value)
+            except Exception as e:
+                logger.warning(f"Failed to collect gauge {self.name}: {str(e)}")
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Histogram(_Metric):
+    """直方图"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self, *values: str) -> "_Timer":
+        """计时上下文管理器"""
+        return _Timer(self.labels(*values))
+
+    def collect(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {cumulative}"
+
+
+class _Timer:
+    """记录代码块耗时到直方图"""
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    """指标注册表，负责以Prometheus文本格式导出"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        以Prometheus文本格式导出所有指标
+
+        Returns:
+            指标文本
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+# 传输指标
+BYTES_TRANSFERRED = registry.counter(
+    "llm_packer_bytes_transferred_total", "Bytes transferred from model hubs", ("source", "origin"))
+FILE_FETCH_SECONDS = registry.histogram(
+    "llm_packer_file_fetch_seconds", "Per-file fetch latency", ("source",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0))
+SIZE_CHECK_SECONDS = registry.histogram(
+    "llm_packer_size_check_seconds", "Model size check latency", ("source",))
+TASKS = registry.gauge(
+    "llm_packer_tasks", "Tasks currently known to this process by state", ("type", "state"))
+TASK_EVENTS = registry.counter(
+    "llm_packer_task_events_total", "Task state transitions", ("type", "status"))
+ORIGIN_CONCURRENCY = registry.gauge(
+    "llm_packer_origin_concurrency_limit", "Adaptive concurrency limit per hub origin", ("origin",))
+THROTTLED_RESPONSES = registry.counter(
+    "llm_packer_throttled_responses_total", "Throttled, failed or unreachable hub requests", ("origin", "status"))
+
+# 缓存指标
+CACHE_REQUESTS = registry.counter(
+    "llm_packer_cache_requests_total", "Cache lookups by result", ("cache", "result"))
+
+# 归档指标
+ARCHIVE_BYTES = registry.counter(
+    "llm_packer_archive_bytes_total", "Bytes written to archives", ("format",))
+ARCHIVE_SECONDS = registry.histogram(
+    "llm_packer_archive_seconds", "Archive creation duration", ("format",),
+    buckets=(1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0, 10800.0))
+
+# 运行时指标
+EVENT_LOOP_LAG_SECONDS = registry.histogram(
+    "llm_packer_event_loop_lag_seconds", "Event loop scheduling lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+
+def _thread_pool_usage() -> Dict[Tuple[str, ...], float]:
+    """读取AnyIO默认线程池（同步后台任务和同步端点使用）的占用情况，需在事件循环中调用"""
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    return {("in_use",): limiter.borrowed_tokens, ("capacity",): limiter.total_tokens}
+
+
+THREAD_POOL = registry.gauge(
+    "llm_packer_thread_pool_workers", "Worker threads of the default thread pool", ("state",),
+    callback=_thread_pool_usage)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """
+    周期性测量事件循环的调度延迟
+
+    Args:
+        interval: 采样间隔（秒）
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - expected, 0.0))
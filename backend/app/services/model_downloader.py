@@ -2,60 +2,260 @@ import os
 import re
 import shutil
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from pathlib import Path
-from typing import Dict, Optional, Tuple, Union, Any, List, Callable
+from typing import Dict, Optional, Tuple, Union, Any, List, Callable, Iterable
 import requests
+from starlette.concurrency import run_in_threadpool
 from ..core.config import settings
 from ..services.task_manager import task_manager
+from ..services import metrics
+from ..services.tracing import tracer
+from ..services.header_inspector import header_inspector, WEIGHT_SUFFIXES
+from ..services.archive_volumes import write_split_archive
+from ..services.seekable_archive import write_seekable_archive, SEEKABLE_FORMAT, SEEKABLE_EXTENSION
+from ..services.local_inventory import local_inventory
+from ..services.origin_limiter import adaptive_limiter
+from ..services.repo_listing import iter_files, resolve_revision, RepoEntry
+from ..services.size_checker import size_checker
+from ..utils import sdk
+from ..utils.file_writer import FileWriter, drop_page_cache
+from ..utils.hub import file_url, auth_headers
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# 尝试导入必要的SDK
-try:
-    from huggingface_hub import snapshot_download, HfApi, hf_hub_url
-    from huggingface_hub.utils import HfFolder
-    HF_AVAILABLE = True
-except ImportError:
-    logger.warning("huggingface_hub not installed. Hugging Face downloads will not be available.")
-    HF_AVAILABLE = False
+# 逐文件下载的读取块大小和传输中断时的最大尝试次数
+FILE_CHUNK_SIZE = 1024 * 1024
+FILE_FETCH_RETRIES = 3
+
+
+class DownloadCancelled(Exception):
+    """任务在下载过程中被取消"""
 
-try:
-    from modelscope.hub.snapshot_download import snapshot_download as ms_snapshot_download
-    from modelscope.hub.api import HubApi
-    MS_AVAILABLE = True
-except ImportError:
-    logger.warning("modelscope not installed. ModelScope downloads will not be available.")
-    MS_AVAILABLE = False
+
+# SDK在首次使用时才导入，启动时只探测是否安装
+if not sdk.huggingface_hub_available():
+    logger.warning("huggingface_hub not installed. Hugging Face downloads will not be available.")
 
 
 class ModelDownloader:
     """模型下载器服务类"""
     
+    def __init__(self):
+        # 逐文件下载共用的连接池，大小与下载并发数一致
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.DOWNLOAD_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
     @staticmethod
-    def filter_files_by_regex(files: List[str], pattern: str) -> List[str]:
+    def filter_entries_by_regex(entries: Iterable[RepoEntry], pattern: str) -> Iterable[RepoEntry]:
         """
-        根据正则表达式过滤文件
+        根据正则表达式逐项过滤分页生成的文件列表
         
         Args:
-            files: 文件列表
+            entries: (路径, 字节数) 的可迭代对象
             pattern: 正则表达式模式
             
         Returns:
-            过滤后的文件列表
+            过滤后的可迭代对象（正则表达式无效时不过滤）
         """
-        if not pattern or not files:
-            return files
-            
         try:
             regex = re.compile(pattern)
-            filtered = [f for f in files if regex.search(f)]
-            logger.info(f"Filtered files using pattern '{pattern}': {len(filtered)}/{len(files)} files match")
-            return filtered
         except re.error as e:
             logger.error(f"Invalid regex pattern '{pattern}': {str(e)}")
-            return files  # 如果正则表达式无效则返回原始列表
+            return entries
+        return (entry for entry in entries if regex.search(entry[0]))
+    
+    @staticmethod
+    def _apply_tensor_filter(task_id: str, source: str, model_id: str, entries: Iterable[RepoEntry],
+                             tensor_filter: str, token: Optional[str],
+                             endpoint: Optional[str] = None) -> Iterable[RepoEntry]:
+        """
+        根据权重文件头部的张量索引过滤文件，只保留包含匹配张量的权重文件和所有非权重文件
+        
+        Args:
+            task_id: 任务ID
+            source: 模型来源
+            model_id: 模型ID
+            entries: (路径, 字节数) 的可迭代对象
+            tensor_filter: 张量名正则表达式
+            token: 认证令牌
+            endpoint: 仓库地址（可选）
+            
+        Returns:
+            过滤后的可迭代对象
+        """
+        with tracer.span(task_id, "header_index", pattern=tensor_filter) as span:
+            matched = set(header_inspector.files_for_tensors(source, model_id, tensor_filter, token,
+                                                             endpoint=endpoint))
+            span.set_attribute("matched", len(matched))
+        logger.info(f"Filtered files using tensor pattern '{tensor_filter}': {len(matched)} weight files match")
+        return (entry for entry in entries if not entry[0].endswith(WEIGHT_SUFFIXES) or entry[0] in matched)
+    
+    @staticmethod
+    def _get_folder_size(folder: Path) -> int:
+        """
+        计算文件夹中所有文件的总字节数（包含未完成的临时文件），
+        huggingface_hub在.cache/huggingface下的元数据和锁文件不计入，只计入其中的.incomplete文件
+        
+        Args:
+            folder: 文件夹路径
+            
+        Returns:
+            总字节数
+        """
+        total = 0
+        cache_dir = os.path.join(folder, ".cache")
+        for root, _, files in os.walk(folder):
+            in_cache = root == cache_dir or root.startswith(cache_dir + os.sep)
+            for name in files:
+                if in_cache and not name.endswith(".incomplete"):
+                    continue
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        return total
+
+    def _monitor_folder_progress(self, task_id: str, folder: Path, total_size: Callable[[], int],
+                                 stop_event: threading.Event, interval: float = 1.0, existing: int = 0) -> None:
+        """
+        定期采样下载目录大小并更新任务进度
+        
+        Args:
+            task_id: 任务ID
+            folder: 下载目录
+            total_size: 返回预期总字节数的函数（边列出边下载时随列表增长）
+            stop_event: 停止信号
+            interval: 采样间隔（秒）
+            existing: 下载开始前目录中已有的字节数，计入进度但不计入传输量
+        """
+        while not stop_event.wait(interval):
+            downloaded = self._get_folder_size(folder)
+            task_manager.update_task(task_id, downloaded, max(total_size(), downloaded),
+                                     existing_size=min(existing, downloaded))
+
+    @staticmethod
+    def _check_cancelled(task_id: str) -> None:
+        task = task_manager.get_task(task_id)
+        if task is not None and task.get("status") == "cancelled":
+            raise DownloadCancelled()
+
+    @staticmethod
+    def _download_stream(entries: Iterable[RepoEntry], fetch: Callable[[str, Optional[int]], None],
+                         listing: Dict[str, int]) -> None:
+        """
+        边列出边下载：每列出一个文件就提交下载，未完成的下载最多保留并发线程数的两倍，
+        完整的文件列表不会驻留内存，第一页列出后即开始传输
+        
+        Args:
+            entries: 分页生成的 (路径, 字节数)
+            fetch: 下载单个文件的函数，参数为路径和列表中的字节数
+            listing: 已列出的文件数和字节数（files、bytes），供进度读取
+        """
+        # 同时进行的请求数还受源站自适应并发控制，线程数只是上限
+        workers = settings.DOWNLOAD_CONCURRENCY
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hub-fetch") as pool:
+            try:
+                for path, size in entries:
+                    listing["files"] += 1
+                    listing["bytes"] += size or 0
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(pool.submit(fetch, path, size))
+                for future in as_completed(pending):
+                    future.result()
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+    
+    def _fetch_modelscope_file(self, task_id: str, model_id: str, revision: str, path: str, size: Optional[int],
+                               save_path: Path, token: Optional[str], on_bytes: Callable[[int, bool], None],
+                               parent: Optional[Any] = None) -> None:
+        """
+        下载ModelScope仓库中的单个文件：大小一致的已有文件直接跳过，
+        未完成的.part文件通过Range请求续传，传输中断时从已写入的位置重试
+        
+        Args:
+            task_id: 任务ID
+            model_id: 模型ID
+            revision: 版本
+            path: 仓库内的文件路径
+            size: 列表中的字节数（可选）
+            save_path: 保存目录
+            token: 认证令牌（可选）
+            on_bytes: 进度回调，参数为新增的字节数（可能为负）和这些字节是否为本地已有
+            parent: 父span（可选）
+        """
+        target = save_path / path
+        if size is not None and target.is_file() and target.stat().st_size == size:
+            on_bytes(size, True)
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".part")
+        url = file_url("modelscope", model_id, path, revision)
+        offset = partial.stat().st_size if partial.exists() else 0
+        if size is not None and offset > size:
+            offset = 0
+        # 上次运行留下的部分计入进度，但不计入传输量；fetched为本次已计入进度的传输字节
+        resumed = offset
+        fetched = 0
+        on_bytes(resumed, True)
+        
+        with tracer.span(task_id, "file_fetch", file=path, parent=parent) as span, \
+                metrics.FILE_FETCH_SECONDS.time("modelscope"):
+            for attempt in range(1, FILE_FETCH_RETRIES + 1):
+                headers = auth_headers("modelscope", token)
+                if offset:
+                    headers["Range"] = f"bytes={offset}-"
+                try:
+                    with adaptive_limiter.request(self.session, "GET", url, headers=headers, stream=True,
+                                                  timeout=60) as response:
+                        response.raise_for_status()
+                        if offset and response.status_code != 206:
+                            # 服务器忽略了Range，从头写入
+                            on_bytes(-resumed, True)
+                            on_bytes(-fetched, False)
+                            resumed = fetched = offset = 0
+                        with FileWriter(partial, offset=offset) as out:
+                            for chunk in response.iter_content(chunk_size=FILE_CHUNK_SIZE):
+                                out.write(chunk)
+                                on_bytes(len(chunk), False)
+                                fetched += len(chunk)
+                                span.add_bytes(len(chunk))
+                            written = out.tell()
+                    break
+                except (requests.RequestException, IOError) as e:
+                    if attempt == FILE_FETCH_RETRIES:
+                        raise
+                    # 已写入.part的字节保留，下次从文件末尾续传；写入层中止时丢弃的缓冲数据已计入进度，
+                    # 按文件实际长度修正，避免重试时重复计数
+                    offset = partial.stat().st_size if partial.exists() else 0
+                    on_bytes(offset - resumed - fetched, False)
+                    fetched = offset - resumed
+                    logger.warning(f"Fetching {path} failed (attempt {attempt}), resuming at {offset}: {str(e)}")
+                    time.sleep(attempt)
+            with tracer.span(task_id, "verify", file=path):
+                if size is not None and written != size:
+                    partial.unlink(missing_ok=True)
+                    raise IOError(f"Size mismatch for {path}: expected {size} bytes, got {written}")
+            os.replace(partial, target)
+    
+    @staticmethod
+    def _fetch_model_metadata(api_url: str, headers: Dict[str, str]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """通过源站自适应并发控制读取模型元数据，返回(状态码, JSON内容)"""
+        with requests.Session() as session:
+            with adaptive_limiter.request(session, "GET", api_url, headers=headers, timeout=30) as response:
+                return response.status_code, response.json() if response.status_code == 200 else None
     
     async def get_model_size_huggingface(self, model_id: str, token: Optional[str] = None) -> Tuple[float, str]:
         """
@@ -68,7 +268,7 @@ class ModelDownloader:
         Returns:
             模型大小(GB)和描述信息的元组
         """
-        if not HF_AVAILABLE:
+        if not sdk.huggingface_hub_available():
             return 0.0, "Error: huggingface_hub SDK not installed"
         
         logger.info(f"Checking size for Hugging Face model: {model_id}")
@@ -78,17 +278,16 @@ class ModelDownloader:
         
         try:
             # 方法1: 直接从API获取大小
-            hf_api = HfApi()
-            api_url = f"https://huggingface.co/api/models/{model_id}"
+            api_url = f"{settings.HF_ENDPOINT}/api/models/{model_id}"
             headers = {}
             if token:
                 headers["Authorization"] = f"Bearer {token}"
             
             logger.info(f"Fetching model metadata from API: {api_url}")
-            response = requests.get(api_url, headers=headers)
+            started = time.monotonic()
+            status_code, data = await run_in_threadpool(self._fetch_model_metadata, api_url, headers)
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
                 logger.info(f"API response received")
                 
                 # 尝试从不同字段提取大小
@@ -101,83 +300,32 @@ class ModelDownloader:
                 elif "config" in data and data["config"] and "total_file_size" in data["config"]:
                     total_size_bytes = int(data["config"]["total_file_size"])
                 
-                # 如果从API获取到有效大小，就完成了
+                # 如果从API获取到有效大小，就完成了（方法2的耗时由大小检查服务记录）
                 if total_size_bytes > 0:
+                    metrics.SIZE_CHECK_SECONDS.labels("huggingface").observe(time.monotonic() - started)
                     total_size_gb = total_size_bytes / (1024 ** 3)
                     return total_size_gb, f"Total size of all weights: {total_size_gb:.2f} GB"
             else:
-                error_message = f"API response error: {response.status_code}"
+                error_message = f"API response error: {status_code}"
                 logger.warning(error_message)
         
         except Exception as e:
             logger.warning(f"Error in method 1: {str(e)}")
             error_message = f"Method 1 failed: {str(e)}"
         
-        # 方法2: 如果方法1失败，从文件列表获取大小
+        # 方法2: 如果方法1失败，从文件元数据获取大小，只对缺少大小的文件并发HEAD探测
         if total_size_bytes == 0:
-            try:
-                logger.info("Trying method 2: Getting file list and sizes")
-                files = []
-                
-                try:
-                    # 直接使用huggingface_hub API而不是REST API
-                    hf_api = HfApi()
-                    files = hf_api.list_repo_files(repo_id=model_id, repo_type="model", token=token)
-                    logger.info(f"Found {len(files)} files")
-                except Exception as e:
-                    logger.warning(f"Failed to list files: {str(e)}")
-                    if "401" in str(e) and token:
-                        return 0.0, "Error: Invalid authentication token"
-                    elif "401" in str(e):
-                        return 0.0, "Error: Authentication required for this model"
-                    files = []
-                
-                # 获取每个文件的大小
-                if files:
-                    # 检查缓存控制头是否表明是LFS文件
-                    sample_file = files[0] if files else None
-                    use_lfs_size = False
-                    
-                    # 准备文件请求的头信息
-                    head_headers = {}
-                    if token:
-                        head_headers["Authorization"] = f"Bearer {token}"
-                    
-                    if sample_file:
-                        try:
-                            url = hf_api.hf_hub_url(repo_id=model_id, filename=sample_file, repo_type="model")
-                            head = requests.head(url, headers=head_headers, allow_redirects=True)
-                            use_lfs_size = "x-linked-size" in head.headers
-                            logger.info(f"Using LFS size headers: {use_lfs_size}")
-                        except Exception as e:
-                            logger.warning(f"Error checking headers: {str(e)}")
-                    
-                    for file in files:
-                        try:
-                            if not file or file.endswith('/'):
-                                continue
-                                
-                            url = hf_api.hf_hub_url(repo_id=model_id, filename=file, repo_type="model")
-                            head = requests.head(url, headers=head_headers, allow_redirects=True)
-                            
-                            if use_lfs_size and "x-linked-size" in head.headers:
-                                size = int(head.headers["x-linked-size"])
-                            elif "content-length" in head.headers:
-                                size = int(head.headers["content-length"])
-                            else:
-                                size = 0
-                                
-                            if size > 0:
-                                logger.info(f"File {file}: {size} bytes")
-                                total_size_bytes += size
-                        except Exception as e:
-                            logger.warning(f"Failed to get size for file {file}: {str(e)}")
-                    
-                    logger.info(f"Total size calculated from files: {total_size_bytes} bytes")
-            except Exception as e:
-                logger.warning(f"Error in method 2: {str(e)}")
+            logger.info("Trying method 2: Getting file list and sizes")
+            result = await run_in_threadpool(size_checker.check, "huggingface", model_id, token=token)
+            if result["error"] is None:
+                total_size_bytes = result["totalBytes"]
+                logger.info(f"Total size calculated from {result['matchedFiles']} files: {total_size_bytes} bytes")
+            elif result["error"] in ("Invalid authentication token", "Authentication required for this model"):
+                return 0.0, f"Error: {result['error']}"
+            else:
+                logger.warning(f"Error in method 2: {result['error']}")
                 if not error_message:
-                    error_message = f"Method 2 failed: {str(e)}"
+                    error_message = f"Method 2 failed: {result['error']}"
         
         # 计算以GB为单位的大小
         total_size_gb = total_size_bytes / (1024 ** 3) if total_size_bytes and total_size_bytes > 0 else 0.0
@@ -201,60 +349,31 @@ class ModelDownloader:
         Returns:
             模型大小(GB)和描述信息的元组
         """
-        if not MS_AVAILABLE:
-            return 0.0, "Error: modelscope SDK not installed"
-        
         logger.info(f"Checking size for ModelScope model: {model_id}")
         
-        total_size_bytes = 0
-        error_message = None
-        
-        try:
-            # 初始化ModelScope API
-            hub_api = HubApi()
-            if token:
-                hub_api.login(token)
-            
-            # 获取模型文件列表
-            logger.info(f"Fetching model file list for: {model_id}")
-            files = hub_api.get_model_files(model_id=model_id, recursive=True)
-            
-            if not files:
-                error_message = "No files found in the repository"
-                logger.warning(error_message)
-                return 0.0, f"Error: {error_message}"
-            
-            logger.info(f"Found {len(files)} files in the repository")
-            
-            # 计算所有文件的总大小
-            for file in files:
-                if isinstance(file, dict) and "Size" in file and file["Type"] == "blob":
-                    file_size = int(file["Size"])
-                    total_size_bytes += file_size
-                    logger.debug(f"File {file.get('Path', 'unknown')}: {file_size} bytes")
-            
-            logger.info(f"Total size calculated from files: {total_size_bytes} bytes")
-            
-            # 计算以GB为单位的大小
-            total_size_gb = total_size_bytes / (1024 ** 3) if total_size_bytes > 0 else 0.0
-            
-            # 返回结果
-            if total_size_gb > 0:
-                return total_size_gb, f"Total size of all weights: {total_size_gb:.2f} GB"
-            else:
-                error_message = "Could not determine model size (sum of file sizes is 0)"
-                logger.warning(error_message)
-                return 0.0, f"Error: {error_message}"
-                
-        except Exception as e:
-            error_message = str(e)
-            logger.error(f"Error getting size for ModelScope model {model_id}: {error_message}")
+        # 分页获取模型文件列表，逐页累计大小（结果与批量检查共享缓存）
+        result = await run_in_threadpool(size_checker.check, "modelscope", model_id, token=token)
+        if result["error"] is not None:
+            logger.error(f"Error getting size for ModelScope model {model_id}: {result['error']}")
+            return 0.0, f"Error: {result['error']}"
+        if not result["totalFiles"]:
+            error_message = "No files found in the repository"
+            logger.warning(error_message)
             return 0.0, f"Error: {error_message}"
+        
+        logger.info(f"Total size calculated from {result['totalFiles']} files: {result['totalBytes']} bytes")
+        total_size_gb = result["sizeGB"]
+        if total_size_gb > 0:
+            return total_size_gb, f"Total size of all weights: {total_size_gb:.2f} GB"
+        error_message = "Could not determine model size (sum of file sizes is 0)"
+        logger.warning(error_message)
+        return 0.0, f"Error: {error_message}"
 
     def download_huggingface_model(self, task_id: str, model_id: str, save_path: Optional[str],
                                token: Optional[str], hf_mirror: Optional[str], file_filter: Optional[str] = None,
                                archive_after: bool = False, target_drive_path: Optional[str] = None,
-                               archive_name: Optional[str] = None, archive_format: Optional[str] = "zip") -> None:
+                               archive_name: Optional[str] = None, archive_format: Optional[str] = "zip",
+                               tensor_filter: Optional[str] = None) -> None:
         """
         下载Hugging Face模型
         
@@ -269,8 +388,9 @@ class ModelDownloader:
             target_drive_path: 目标驱动器路径
             archive_name: 归档名称
             archive_format: 归档格式
+            tensor_filter: 张量名过滤正则表达式，只下载包含匹配张量的权重文件
         """
-        if not HF_AVAILABLE:
+        if not sdk.huggingface_hub_available():
             task_manager.update_task(task_id, 0, 0, "failed")
             logger.error("huggingface_hub SDK not installed")
             return
@@ -288,57 +408,89 @@ class ModelDownloader:
         task_manager.update_task(task_id, 0, 100, "downloading")
         
         try:
+            hf = sdk.load_huggingface_hub()
+            
             # 设置HF API环境
-            if token:
-                HfFolder.save_token(token)
+            if token and hf.HfFolder is not None:
+                with tracer.span(task_id, "auth"):
+                    hf.HfFolder.save_token(token)
             
-            # 准备下载参数
-            download_kwargs = {
-                "repo_id": model_id,
-                "local_dir": str(save_path),
-                "local_dir_use_symlinks": False
-            }
+            endpoint = hf_mirror or settings.HF_ENDPOINT
             
-            # 添加镜像URL（如果提供）
-            if hf_mirror:
-                download_kwargs["endpoint"] = hf_mirror
+            # 先把分支解析为提交版本，分页列表和各文件的下载都固定在同一次提交上
+            with tracer.span(task_id, "metadata"):
+                revision = resolve_revision("huggingface", model_id, token=token, endpoint=endpoint)
             
-            # 添加文件过滤（如果提供）
+            # 文件列表按页生成，过滤在列出时逐项进行，不在内存中保存完整列表
+            entries = iter_files("huggingface", model_id, revision, token, endpoint)
             if file_filter:
-                hf_api = HfApi()
+                entries = self.filter_entries_by_regex(entries, file_filter)
+            if tensor_filter:
                 try:
-                    # 获取模型文件列表
-                    files = hf_api.list_repo_files(repo_id=model_id, repo_type="model", token=token)
-                    
-                    # 应用过滤器
-                    filtered_files = self.filter_files_by_regex(files, file_filter)
-                    
-                    if filtered_files:
-                        download_kwargs["allow_patterns"] = filtered_files
-                    else:
-                        logger.warning(f"No files matched the filter pattern: {file_filter}")
-                        task_manager.update_task(task_id, 0, 0, f"failed: No files matched the filter {file_filter}")
-                        return
-                        
+                    entries = self._apply_tensor_filter(task_id, "huggingface", model_id, entries,
+                                                        tensor_filter, token, endpoint)
                 except Exception as e:
-                    logger.error(f"Error applying file filter: {str(e)}")
+                    logger.error(f"Error applying tensor filter: {str(e)}")
                     # 继续而不应用过滤器
             
-            # 定义进度回调
-            def hf_progress_callback(progress):
-                downloaded = int(progress.downloaded_bytes)
-                total = int(progress.total_bytes)
-                task_manager.update_task(task_id, downloaded, total)
-            
-            # 添加进度回调
-            download_kwargs["progress_callback"] = hf_progress_callback
+            # 下载接口不提供字节级进度回调，通过监视目标目录大小来跟踪进度，预期总大小随列表逐页增加；
+            # 目录中已有的文件（此前下载的部分、未完成的临时文件）作为基线，不计入传输量和速度
+            existing = self._get_folder_size(save_path)
+            listing = {"files": 0, "bytes": 0}
+            stop_event = threading.Event()
+            monitor = threading.Thread(
+                target=self._monitor_folder_progress,
+                args=(task_id, save_path, lambda: listing["bytes"], stop_event),
+                kwargs={"existing": existing},
+                daemon=True
+            )
+            monitor.start()
             
             # 开始下载
-            logger.info(f"Starting download of {model_id} to {save_path} with params: {download_kwargs}")
-            snapshot_download(**download_kwargs)
+            logger.info(f"Starting download of {model_id}@{revision} to {save_path}")
+            with tracer.span(task_id, "transfer", endpoint=endpoint) as span:
+                def fetch(path: str, size: Optional[int]) -> None:
+                    local = save_path / path
+                    present = size is not None and local.is_file() and local.stat().st_size == size
+                    self._check_cancelled(task_id)
+                    with tracer.span(task_id, "file_fetch", file=path, parent=span) as file_span:
+                        # 单个文件的传输占用源站一个并发名额，限流时按Retry-After重试
+                        with metrics.FILE_FETCH_SECONDS.time("huggingface"):
+                            local_path = adaptive_limiter.call(
+                                endpoint, hf.hf_hub_download, timed=False, repo_id=model_id, filename=path,
+                                revision=revision, local_dir=str(save_path),
+                                endpoint=endpoint, token=token)
+                        # 按列表中的大小检查落盘的文件
+                        with tracer.span(task_id, "verify", file=path):
+                            written = os.path.getsize(local_path)
+                            if size is not None and written != size:
+                                raise IOError(f"Size mismatch for {path}: expected {size} bytes, got {written}")
+                        file_span.add_bytes(written)
+                    # SDK写入的文件不经过FileWriter，非buffered写入模式下每个文件下载完成后立即刷盘并丢弃页缓存，
+                    # 下载前已存在的文件不处理
+                    if settings.WRITE_MODE != "buffered" and not present:
+                        drop_page_cache(local_path)
+                
+                try:
+                    self._download_stream(entries, fetch, listing)
+                finally:
+                    stop_event.set()
+                    monitor.join()
+                span.set_attribute("files", listing["files"])
+                if not listing["files"]:
+                    pattern = file_filter or tensor_filter
+                    logger.warning(f"No files matched the filter pattern: {pattern}")
+                    task_manager.update_task(task_id, 0, 0, f"failed: No files matched the filter {pattern}")
+                    return
+                downloaded_size = self._get_folder_size(save_path)
+                span.add_bytes(max(downloaded_size - existing, 0))
+            total_size = listing["bytes"]
             
             # 下载完成，更新状态
-            task_manager.update_task(task_id, 100, 100, "completed")
+            task_manager.update_task(task_id, downloaded_size, max(total_size, downloaded_size), "completed",
+                                     existing_size=min(existing, downloaded_size))
+            local_inventory.record_download(save_path, "huggingface", model_id, revision,
+                                            file_filter=file_filter, tensor_filter=tensor_filter)
             logger.info(f"Download completed for {model_id}")
             
             # 如果请求了归档，执行归档
@@ -347,6 +499,8 @@ class ModelDownloader:
                                       archive_name or model_id.split("/")[-1],
                                       archive_format)
             
+        except DownloadCancelled:
+            logger.info(f"Download cancelled for task {task_id}")
         except Exception as e:
             logger.error(f"Error downloading from Hugging Face: {str(e)}")
             task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
@@ -354,7 +508,8 @@ class ModelDownloader:
     def download_modelscope_model(self, task_id: str, model_id: str, save_path: Optional[str],
                               token: Optional[str], file_filter: Optional[str] = None,
                               archive_after: bool = False, target_drive_path: Optional[str] = None,
-                              archive_name: Optional[str] = None, archive_format: Optional[str] = "zip") -> None:
+                              archive_name: Optional[str] = None, archive_format: Optional[str] = "zip",
+                              tensor_filter: Optional[str] = None) -> None:
         """
         下载ModelScope模型
         
@@ -368,12 +523,8 @@ class ModelDownloader:
             target_drive_path: 目标驱动器路径
             archive_name: 归档名称
             archive_format: 归档格式
+            tensor_filter: 张量名过滤正则表达式，只下载包含匹配张量的权重文件
         """
-        if not MS_AVAILABLE:
-            task_manager.update_task(task_id, 0, 0, "failed")
-            logger.error("modelscope SDK not installed")
-            return
-        
         # 设置保存路径
         if not save_path:
             save_path = os.path.join(settings.DEFAULT_DOWNLOAD_PATH, model_id.split("/")[-1])
@@ -387,61 +538,63 @@ class ModelDownloader:
         task_manager.update_task(task_id, 0, 100, "downloading")
         
         try:
-            # 准备下载参数
-            download_kwargs = {
-                "model_id": model_id,
-                "local_dir": str(save_path)
-            }
+            # ModelScope没有把分支解析为提交的公开接口，文件下载接口的Revision也只保证接受分支或标签，
+            # 因此固定使用master；下载期间仓库更新造成的不一致由逐文件的大小校验发现
+            revision = resolve_revision("modelscope", model_id, token=token)
             
-            # 添加令牌（如果提供）
-            if token:
-                download_kwargs["user_token"] = token
-            
-            # ModelScope不直接支持带进度回调的下载，需要自定义下载函数
-            # 这里我们使用一个简化的方法
+            # 文件列表按页生成，过滤在列出时逐项进行，只下载匹配的文件
+            entries = iter_files("modelscope", model_id, revision, token)
+            if file_filter:
+                entries = self.filter_entries_by_regex(entries, file_filter)
+            if tensor_filter:
+                try:
+                    entries = self._apply_tensor_filter(task_id, "modelscope", model_id, entries,
+                                                        tensor_filter, token)
+                except Exception as e:
+                    logger.error(f"Error applying tensor filter: {str(e)}")
+                    # 继续而不应用过滤器
             
-            # 获取模型信息以估计总大小
-            hub_api = HubApi()
-            if token:
-                hub_api.login(token)
-                
-            # 获取文件列表
-            files = hub_api.get_model_files(model_id)
-            total_size = 0
+            # 逐文件下载，按字节汇总进度，预期总大小随列表逐页增加
+            listing = {"files": 0, "bytes": 0}
+            lock = threading.Lock()
+            # existing为其中本地已有的字节（跳过的文件、续传前的部分），不计入传输量
+            progress = {"bytes": 0, "existing": 0, "reported": 0.0}
+            
+            def on_bytes(nbytes: int, existing: bool = False) -> None:
+                with lock:
+                    progress["bytes"] += nbytes
+                    if existing:
+                        progress["existing"] += nbytes
+                    now = time.monotonic()
+                    if now - progress["reported"] < 0.5:
+                        return
+                    progress["reported"] = now
+                    downloaded = progress["bytes"]
+                    existing_size = progress["existing"]
+                task_manager.update_task(task_id, downloaded, max(listing["bytes"], downloaded),
+                                         existing_size=existing_size)
             
-            # 如果需要过滤文件
-            if file_filter:
-                # 从API返回中提取文件名
-                file_names = [f["file_name"] for f in files if isinstance(f, dict) and "file_name" in f]
-                
-                # 应用过滤器
-                filtered_files = self.filter_files_by_regex(file_names, file_filter)
+            # 开始下载
+            logger.info(f"Starting download of {model_id}@{revision} to {save_path}")
+            with tracer.span(task_id, "transfer", endpoint=settings.MODELSCOPE_ENDPOINT) as span:
+                def fetch(path: str, size: Optional[int]) -> None:
+                    self._check_cancelled(task_id)
+                    self._fetch_modelscope_file(task_id, model_id, revision, path, size, save_path, token,
+                                                on_bytes, parent=span)
                 
-                # 如果没有文件匹配过滤器，失败
-                if not filtered_files:
-                    logger.warning(f"No files matched the filter pattern: {file_filter}")
-                    task_manager.update_task(task_id, 0, 0, f"failed: No files matched the filter {file_filter}")
+                self._download_stream(entries, fetch, listing)
+                span.set_attribute("files", listing["files"])
+                if not listing["files"]:
+                    pattern = file_filter or tensor_filter
+                    logger.warning(f"No files matched the filter pattern: {pattern}")
+                    task_manager.update_task(task_id, 0, 0, f"failed: No files matched the filter {pattern}")
                     return
-                
-                # 只计算过滤后文件的总大小
-                for file in files:
-                    if isinstance(file, dict) and "file_name" in file and "size" in file:
-                        if file["file_name"] in filtered_files:
-                            total_size += int(file["size"])
-            else:
-                # 计算所有文件的总大小
-                for file in files:
-                    if isinstance(file, dict) and "size" in file:
-                        total_size += int(file["size"])
-            
-            # 开始下载
-            logger.info(f"Starting download of {model_id} to {save_path} with params: {download_kwargs}")
-            
-            # 执行下载
-            ms_snapshot_download(**download_kwargs)
+            total_size = max(listing["bytes"], progress["bytes"])
             
             # 下载完成，更新状态
-            task_manager.update_task(task_id, total_size, total_size, "completed")
+            task_manager.update_task(task_id, total_size, total_size, "completed", existing_size=progress["existing"])
+            local_inventory.record_download(save_path, "modelscope", model_id, revision,
+                                            file_filter=file_filter, tensor_filter=tensor_filter)
             logger.info(f"Download completed for {model_id}")
             
             # 如果请求了归档，执行归档
@@ -450,12 +603,15 @@ class ModelDownloader:
                                       archive_name or model_id.split("/")[-1],
                                       archive_format)
             
+        except DownloadCancelled:
+            logger.info(f"Download cancelled for task {task_id}")
         except Exception as e:
             logger.error(f"Error downloading from ModelScope: {str(e)}")
             task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
 
     def archive_and_move(self, task_id: str, source_folder: Path, target_drive: Path, 
-                         archive_name_base: str, archive_format: str = "zip") -> None:
+                         archive_name_base: str, archive_format: str = "zip",
+                         target_drives: Optional[List[Path]] = None, volume_size: Optional[int] = None) -> None:
         """
         归档并移动模型文件
         
@@ -465,46 +621,110 @@ class ModelDownloader:
             target_drive: 目标驱动器路径
             archive_name_base: 归档基础名称
             archive_format: 归档格式
+            target_drives: 多个目标驱动器路径（可选），分卷轮流写入各路径
+            volume_size: 分卷大小（字节，可选），指定后生成多卷归档和清单
         """
-        try:
-            task_manager.update_task(task_id, 0, 0, "archiving")
-            
-            # 确保目标目录存在
-            os.makedirs(target_drive, exist_ok=True)
-            
-            # 创建归档名称
-            archive_path = target_drive / f"{archive_name_base}.{archive_format}"
-            
-            # 创建归档
-            logger.info(f"Creating archive: {archive_path}")
-            
-            # 使用shutil进行归档
-            if archive_format == "zip":
-                shutil.make_archive(
-                    str(archive_path).replace(".zip", ""), 
-                    "zip",
-                    root_dir=str(source_folder.parent),
-                    base_dir=source_folder.name
-                )
-            elif archive_format in ["tar", "gztar", "bztar", "xztar"]:
-                shutil.make_archive(
-                    str(archive_path).replace(f".{archive_format}", ""),
-                    archive_format,
-                    root_dir=str(source_folder.parent),
-                    base_dir=source_folder.name
-                )
-            else:
-                logger.error(f"Unsupported archive format: {archive_format}")
-                task_manager.update_task(task_id, 0, 0, f"failed: Unsupported archive format: {archive_format}")
-                return
+        targets = [target_drive] + [Path(t) for t in (target_drives or []) if Path(t) != target_drive]
+        if volume_size or len(targets) > 1:
+            self._archive_split(task_id, source_folder, targets, archive_name_base, archive_format,
+                                volume_size or settings.ARCHIVE_VOLUME_SIZE)
+            return
+        
+        with tracer.span(task_id, "archive", format=archive_format) as span:
+            try:
+                task_manager.update_task(task_id, 0, 0, "archiving")
+            
+                # 确保目标目录存在
+                os.makedirs(target_drive, exist_ok=True)
+            
+                # 创建归档名称
+                archive_path = target_drive / f"{archive_name_base}.{archive_format}"
+            
+                # 创建归档
+                logger.info(f"Creating archive: {archive_path}")
+                started = time.perf_counter()
+            
+                # 使用shutil进行归档
+                if archive_format == "zip":
+                    archive_file = shutil.make_archive(
+                        str(archive_path).replace(".zip", ""), 
+                        "zip",
+                        root_dir=str(source_folder.parent),
+                        base_dir=source_folder.name
+                    )
+                elif archive_format in ["tar", "gztar", "bztar", "xztar"]:
+                    archive_file = shutil.make_archive(
+                        str(archive_path).replace(f".{archive_format}", ""),
+                        archive_format,
+                        root_dir=str(source_folder.parent),
+                        base_dir=source_folder.name
+                    )
+                elif archive_format == SEEKABLE_FORMAT:
+                    # 每个成员独立压缩并写出成员索引，可单独提取任意文件
+                    archive_file = str(target_drive / f"{archive_name_base}{SEEKABLE_EXTENSION}")
+                    write_seekable_archive(
+                        source_folder,
+                        Path(archive_file),
+                        lambda done, total: task_manager.update_archive_progress(
+                            task_id, done / total * 100 if total else 0)
+                    )
+                else:
+                    logger.error(f"Unsupported archive format: {archive_format}")
+                    span.error = f"Unsupported archive format: {archive_format}"
+                    task_manager.update_task(task_id, 0, 0, f"failed: Unsupported archive format: {archive_format}")
+                    return
             
-            # 归档完成
-            task_manager.update_task(task_id, 100, 100, "completed")
-            logger.info(f"Archive completed: {archive_path}")
+                # 归档完成
+                metrics.ARCHIVE_SECONDS.labels(archive_format).observe(time.perf_counter() - started)
+                archive_bytes = os.path.getsize(archive_file)
+                metrics.ARCHIVE_BYTES.labels(archive_format).inc(archive_bytes)
+                span.add_bytes(archive_bytes)
+                task_manager.update_task(task_id, 100, 100, "completed")
+                logger.info(f"Archive completed: {archive_path}")
             
-        except Exception as e:
-            logger.error(f"Error creating archive: {str(e)}")
-            task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error creating archive: {str(e)}")
+                span.error = str(e)
+                task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
+
+    def _archive_split(self, task_id: str, source_folder: Path, targets: List[Path],
+                       archive_name_base: str, archive_format: str, volume_size: int) -> None:
+        """
+        生成多卷归档，分卷并行写入多个目标路径，并在每个目标路径写入清单
+        
+        Args:
+            task_id: 任务ID
+            source_folder: 源文件夹路径
+            targets: 目标路径列表
+            archive_name_base: 归档基础名称
+            archive_format: 归档格式
+            volume_size: 分卷大小（字节）
+        """
+        with tracer.span(task_id, "archive", format=archive_format, targets=len(targets),
+                         volume_size=volume_size) as span:
+            try:
+                task_manager.update_task(task_id, 0, 0, "archiving")
+                logger.info(f"Creating split archive {archive_name_base} across {len(targets)} targets")
+                started = time.perf_counter()
+                
+                def on_progress(done: int, total: int) -> None:
+                    task_manager.update_archive_progress(task_id, done / total * 100 if total else 0)
+                
+                manifest = write_split_archive(source_folder, targets, archive_name_base, archive_format,
+                                               volume_size, on_progress)
+                
+                # 归档完成
+                metrics.ARCHIVE_SECONDS.labels(archive_format).observe(time.perf_counter() - started)
+                metrics.ARCHIVE_BYTES.labels(archive_format).inc(manifest["totalSize"])
+                span.add_bytes(manifest["totalSize"])
+                span.set_attribute("volumes", len(manifest["volumes"]))
+                task_manager.update_task(task_id, 100, 100, "completed")
+                logger.info(f"Split archive completed: {len(manifest['volumes'])} volumes of {archive_name_base}")
+            
+            except Exception as e:
+                logger.error(f"Error creating split archive: {str(e)}")
+                span.error = str(e)
+                task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
 
 
 # 全局下载器实例
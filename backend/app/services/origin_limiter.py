@@ -0,0 +1,299 @@
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Any, Callable, Iterator
+from urllib.parse import urlparse
+import requests
+from ..core.config import settings
+from ..services import metrics
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 需要重试的状态码：限流和服务端临时错误
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# 表示源站主动限流的状态码，按Retry-After暂停整个源站
+THROTTLE_STATUS = (429, 503)
+# 两次降低并发之间的最短间隔（秒），同一波失败只降低一次
+DECREASE_INTERVAL = 1.0
+# 近期延迟至少比基线高出这么多秒才视为排队，避免毫秒级抖动触发降低
+LATENCY_SLACK = 0.05
+
+
+def origin_of(url: str) -> str:
+    """URL或仓库地址对应的源站（主机:端口）"""
+    return urlparse(url).netloc or url
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头（秒数或HTTP日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _response_of(error: Optional[BaseException]) -> Optional[requests.Response]:
+    """
+    SDK异常中的HTTP响应，沿异常链查找
+    （例如snapshot_download把限流错误包装为LocalEntryNotFoundError抛出）
+    """
+    while error is not None:
+        response = getattr(error, "response", None)
+        if response is not None:
+            return response
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def _is_transient(error: Optional[BaseException]) -> bool:
+    """异常链中是否有连接错误或超时"""
+    while error is not None:
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class OriginLimiter:
+    """
+    单个源站的AIMD并发控制器
+
+    请求成功且延迟正常时并发上限每个窗口加一（每次成功加1/上限）；遇到限流时上限减半并按
+    Retry-After（缺省时指数退避）暂停该源站的所有新请求；服务端错误和延迟明显升高时按比例降低上限。
+    """
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.limit = float(settings.ORIGIN_INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        # 基线延迟向更低的值立即收敛、向更高的值缓慢漂移；recent为近期延迟的指数移动平均
+        self.baseline: Optional[float] = None
+        self.recent: Optional[float] = None
+        self.failures = 0
+        self.last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.ORIGIN_CONCURRENCY.labels(self.origin).set(int(self.limit))
+
+    def _wait(self, need_slot: bool) -> None:
+        with self._cond:
+            while True:
+                delay = self.blocked_until - time.monotonic()
+                if delay <= 0 and (not need_slot or self.in_flight < int(self.limit)):
+                    break
+                self._cond.wait(timeout=delay if delay > 0 else None)
+            if need_slot:
+                self.in_flight += 1
+
+    def acquire(self) -> None:
+        """等待源站解除暂停并获得一个并发名额"""
+        self._wait(True)
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def wait_unblocked(self) -> None:
+        """只等待源站解除暂停，不占用名额（用于自行管理连接的SDK下载）"""
+        self._wait(False)
+
+    def workers(self) -> int:
+        """当前并发上限，作为SDK下载的工作线程数"""
+        return max(int(self.limit), 1)
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self.last_decrease < max(DECREASE_INTERVAL, self.baseline or 0.0):
+            return
+        self.limit = max(float(settings.ORIGIN_MIN_CONCURRENCY), self.limit * factor)
+        self.last_decrease = now
+        self._publish()
+
+    def _backoff(self, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, settings.ORIGIN_MAX_BACKOFF)
+        return min(0.5 * 2 ** (self.failures - 1), settings.ORIGIN_MAX_BACKOFF)
+
+    def on_success(self, latency: Optional[float] = None) -> None:
+        """记录一次成功的请求，latency为到收到响应头的秒数"""
+        with self._cond:
+            self.failures = 0
+            if latency is not None:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline += 0.01 * (latency - self.baseline)
+                self.recent = latency if self.recent is None else 0.8 * self.recent + 0.2 * latency
+            if (self.recent is not None and self.baseline is not None
+                    and self.recent > self.baseline * settings.ORIGIN_LATENCY_FACTOR
+                    and self.recent - self.baseline > LATENCY_SLACK):
+                # 延迟明显高于基线，说明源站或链路开始排队
+                self._decrease(0.9)
+            elif self.limit < settings.ORIGIN_MAX_CONCURRENCY:
+                self.limit = min(float(settings.ORIGIN_MAX_CONCURRENCY), self.limit + 1.0 / self.limit)
+                self._publish()
+            self._cond.notify_all()
+
+    def on_failure(self, status: Optional[int] = None, retry_after: Optional[float] = None) -> float:
+        """
+        记录一次限流或错误并暂停源站
+
+        Args:
+            status: HTTP状态码（连接错误时为None）
+            retry_after: 服务器要求的等待秒数（可选）
+
+        Returns:
+            暂停的秒数
+        """
+        with self._cond:
+            self.failures += 1
+            metrics.THROTTLED_RESPONSES.labels(self.origin, str(status or "error")).inc()
+            if status in THROTTLE_STATUS:
+                self._decrease(0.5)
+            else:
+                self._decrease(0.75)
+            delay = self._backoff(retry_after)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self._cond.notify_all()
+            return delay
+
+    def observe(self, response: requests.Response) -> None:
+        """根据响应状态更新控制器"""
+        if response.status_code in RETRYABLE_STATUS:
+            self.on_failure(response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+        else:
+            self.on_success(response.elapsed.total_seconds())
+
+
+class AdaptiveLimiter:
+    """按源站共享的自适应并发与重试控制，文件列表、大小探测和下载请求都经过这里"""
+
+    def __init__(self):
+        self._origins: Dict[str, OriginLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> OriginLimiter:
+        """获取URL所属源站的控制器"""
+        origin = origin_of(url)
+        with self._lock:
+            limiter = self._origins.get(origin)
+            if limiter is None:
+                limiter = self._origins[origin] = OriginLimiter(origin)
+            return limiter
+
+    @contextmanager
+    def request(self, session: requests.Session, method: str, url: str, **kwargs) -> Iterator[requests.Response]:
+        """
+        在源站的并发名额内发出请求，限流和临时错误按退避重试，名额一直保持到响应读取完毕
+
+        Args:
+            session: requests会话
+            method: HTTP方法
+            url: 请求URL
+            **kwargs: 传给session.request的参数
+
+        Yields:
+            最后一次请求的响应（重试次数耗尽时可能仍为错误状态，由调用方处理）
+        """
+        limiter = self.get(url)
+        for attempt in range(1, settings.ORIGIN_MAX_RETRIES + 1):
+            limiter.acquire()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                limiter.release()
+                delay = limiter.on_failure()
+                if attempt == settings.ORIGIN_MAX_RETRIES:
+                    raise
+                logger.warning(f"{method} {url} failed ({str(e)}), retrying in {delay:.1f}s")
+                continue
+            except BaseException:
+                limiter.release()
+                raise
+            if response.status_code in RETRYABLE_STATUS and attempt < settings.ORIGIN_MAX_RETRIES:
+                limiter.observe(response)
+                response.close()
+                limiter.release()
+                logger.warning(f"{method} {url} returned {response.status_code}, "
+                               f"retrying (attempt {attempt}/{settings.ORIGIN_MAX_RETRIES})")
+                continue
+            limiter.observe(response)
+            try:
+                yield response
+            finally:
+                response.close()
+                limiter.release()
+            return
+
+    def call(self, url: str, fn: Callable[..., Any], *args, hold: bool = True, timed: bool = True, **kwargs) -> Any:
+        """
+        通过源站控制器调用SDK函数，SDK抛出的限流和临时错误按退避重试
+
+        Args:
+            url: 源站地址
+            fn: SDK函数
+            hold: 调用期间是否占用一个并发名额（SDK自行管理多个连接的下载传False）
+            timed: 是否把调用耗时计入延迟统计（耗时主要取决于传输量的文件下载传False）
+
+        Returns:
+            fn的返回值
+        """
+        limiter = self.get(url)
+        for attempt in range(1, settings.ORIGIN_MAX_RETRIES + 1):
+            if hold:
+                limiter.acquire()
+            else:
+                limiter.wait_unblocked()
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                response = _response_of(e)
+                status = response.status_code if response is not None else None
+                if status not in RETRYABLE_STATUS and not (status is None and _is_transient(e)):
+                    raise
+                retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+                delay = limiter.on_failure(status, retry_after)
+                if attempt == settings.ORIGIN_MAX_RETRIES:
+                    raise
+                logger.warning(f"{getattr(fn, '__name__', 'call')} against {limiter.origin} failed "
+                               f"({status or str(e)}), retrying in {delay:.1f}s")
+                continue
+            finally:
+                if hold:
+                    limiter.release()
+            limiter.on_success(time.monotonic() - started if hold and timed else None)
+            return result
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各源站的当前状态"""
+        with self._lock:
+            limiters = list(self._origins.values())
+        return {
+            limiter.origin: {
+                "limit": limiter.workers(),
+                "inFlight": limiter.in_flight,
+                "blockedFor": max(limiter.blocked_until - time.monotonic(), 0.0),
+                "baselineLatency": limiter.baseline,
+                "recentLatency": limiter.recent,
+            }
+            for limiter in limiters
+        }
+
+
+# 全局自适应并发控制实例
+adaptive_limiter = AdaptiveLimiter()
@@ -0,0 +1,125 @@
+import logging
+from typing import Optional, Iterator, Tuple
+from urllib.parse import quote
+import requests
+from ..core.config import settings
+from ..services.origin_limiter import adaptive_limiter
+from ..utils.hub import hub_endpoint, auth_headers
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 列表中的一项：(仓库内路径, 字节数)，大小未知时为None
+RepoEntry = Tuple[str, Optional[int]]
+
+_session = requests.Session()
+
+
+def resolve_revision(source: str, model_id: str, revision: Optional[str] = None, token: Optional[str] = None,
+                     endpoint: Optional[str] = None) -> str:
+    """
+    把分支或标签解析为提交版本，使分页列出的文件和随后下载的内容来自同一次提交
+
+    Args:
+        source: 模型来源
+        model_id: 模型ID
+        revision: 版本（可选）
+        token: 认证令牌（可选）
+        endpoint: 仓库地址（可选）
+
+    Returns:
+        提交版本，无法解析时返回原版本
+    """
+    if source != "huggingface":
+        # ModelScope没有把分支解析为提交的公开接口，保持分支名
+        return revision or "master"
+    revision = revision or "main"
+    url = f"{hub_endpoint(source, endpoint)}/api/models/{model_id}/revision/{quote(revision, safe='')}"
+    # 只请求sha字段，避免仓库信息中附带完整的文件列表
+    with adaptive_limiter.request(_session, "GET", url, params=[("expand", "sha")],
+                                  headers=auth_headers(source, token), timeout=60) as response:
+        response.raise_for_status()
+        return response.json().get("sha") or revision
+
+
+def _iter_huggingface(model_id: str, revision: str, token: Optional[str],
+                      endpoint: Optional[str]) -> Iterator[RepoEntry]:
+    url: Optional[str] = (f"{hub_endpoint('huggingface', endpoint)}/api/models/{model_id}"
+                          f"/tree/{quote(revision, safe='')}")
+    params: Optional[dict] = {"recursive": "true"}
+    pages = 0
+    while url:
+        with adaptive_limiter.request(_session, "GET", url, params=params,
+                                      headers=auth_headers("huggingface", token), timeout=60) as response:
+            response.raise_for_status()
+            page = response.json()
+            # 下一页地址在Link响应头中，已包含全部查询参数
+            url = response.links.get("next", {}).get("url")
+        params = None
+        pages += 1
+        for entry in page:
+            if entry.get("type") == "file":
+                lfs = entry.get("lfs") or {}
+                yield entry["path"], lfs.get("size", entry.get("size"))
+    logger.info(f"Listed {model_id}@{revision} in {pages} pages")
+
+
+def _iter_modelscope(model_id: str, revision: str, token: Optional[str],
+                     endpoint: Optional[str]) -> Iterator[RepoEntry]:
+    url = f"{hub_endpoint('modelscope', endpoint)}/api/v1/models/{model_id}/repo/files"
+    page_size = settings.LISTING_PAGE_SIZE
+    page_number = 1
+    listed = 0
+    first_path: Optional[str] = None
+    while True:
+        params = {"Revision": revision, "Recursive": "true", "PageNumber": page_number, "PageSize": page_size}
+        with adaptive_limiter.request(_session, "GET", url, params=params,
+                                      headers=auth_headers("modelscope", token), timeout=60) as response:
+            response.raise_for_status()
+            data = response.json()
+        if data.get("Code", 200) != 200:
+            raise RuntimeError(data.get("Message") or f"Failed to list files of {model_id}")
+        files = (data.get("Data") or {}).get("Files") or []
+        total = (data.get("Data") or {}).get("TotalCount")
+        if files and page_number > 1 and files[0].get("Path") == first_path:
+            # 服务器忽略了分页参数，每页都返回相同的内容
+            logger.warning(f"Listing of {model_id} ignores PageNumber (page {page_number} repeats page 1), "
+                           f"stopping after {listed} entries")
+            break
+        if page_number == 1 and files:
+            first_path = files[0].get("Path")
+        for entry in files:
+            if entry.get("Type") == "blob" and entry.get("Path"):
+                yield entry["Path"], entry.get("Size")
+        listed += len(files)
+        # 不足一页或已达到服务器报告的总数说明已到末尾
+        if len(files) < page_size or (total is not None and listed >= total):
+            break
+        page_number += 1
+    logger.info(f"Listed {model_id}@{revision} in {page_number} pages")
+
+
+def iter_files(source: str, model_id: str, revision: Optional[str] = None, token: Optional[str] = None,
+               endpoint: Optional[str] = None) -> Iterator[RepoEntry]:
+    """
+    分页列出仓库中的全部文件，按页请求并逐项生成，不在内存中保存完整列表
+
+    Hugging Face使用tree接口并按Link响应头翻页；ModelScope使用PageNumber/PageSize翻页。
+    每页请求都经过源站自适应并发控制，限流时按退避重试。
+
+    Args:
+        source: 模型来源
+        model_id: 模型ID
+        revision: 版本（可选，建议传入resolve_revision解析后的提交版本）
+        token: 认证令牌（可选）
+        endpoint: 仓库地址（可选）
+
+    Yields:
+        (仓库内路径, 字节数) 元组
+    """
+    if source == "huggingface":
+        return _iter_huggingface(model_id, revision or "main", token, endpoint)
+    if source == "modelscope":
+        return _iter_modelscope(model_id, revision or "master", token, endpoint)
+    raise ValueError(f"Unsupported source: {source}")
@@ -0,0 +1,179 @@
+import os
+import gzip
+import json
+import zlib
+import hashlib
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Any, Callable, Iterator
+from .archive_volumes import iter_tar_members, tar_padding, tar_end_blocks
+from ..utils.file_writer import FileWriter
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SEEKABLE_FORMAT = "seekable_gztar"
+SEEKABLE_EXTENSION = ".tar.gz"
+INDEX_SUFFIX = ".index.json"
+READ_CHUNK = 4 * 1024 * 1024
+
+
+def _member_type(tarinfo) -> str:
+    if tarinfo.isdir():
+        return "directory"
+    if tarinfo.issym():
+        return "symlink"
+    return "file" if tarinfo.isreg() else "other"
+
+
+def index_path_for(archive_path: Path) -> Path:
+    """归档对应的成员索引文件路径"""
+    return archive_path.with_name(archive_path.name + INDEX_SUFFIX)
+
+
+def write_seekable_archive(source_folder: Path, archive_path: Path,
+                           on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    写出可随机访问的tar.gz归档：每个tar成员单独压缩为一个gzip成员，并写出成员偏移索引
+
+    整个文件仍是标准的多成员gzip流，可直接用tar解压；借助索引可以只读取和解压单个成员。
+
+    Args:
+        source_folder: 源文件夹
+        archive_path: 归档文件路径（.tar.gz）
+        on_progress: 进度回调，参数为 (已处理字节数, 总字节数)
+
+    Returns:
+        索引字典，同时写入 {archive_path}.index.json
+    """
+    members = list(iter_tar_members(source_folder))
+    total = sum(tarinfo.size for _, tarinfo, _ in members if tarinfo.isreg())
+    processed = 0
+    raw_offset = 0
+    entries = []
+    partial = archive_path.with_name(archive_path.name + ".part")
+
+    with FileWriter(partial) as out:
+        for path, tarinfo, header in members:
+            start = out.tell()
+            digest = hashlib.sha256() if tarinfo.isreg() else None
+            with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6, mtime=0) as member:
+                member.write(header)
+                if tarinfo.isreg():
+                    with open(path, "rb") as f:
+                        remaining = tarinfo.size
+                        while remaining > 0:
+                            chunk = f.read(min(READ_CHUNK, remaining))
+                            if not chunk:
+                                raise IOError(f"File changed while archiving: {path}")
+                            member.write(chunk)
+                            digest.update(chunk)
+                            remaining -= len(chunk)
+                            processed += len(chunk)
+                            if on_progress:
+                                on_progress(processed, total)
+                    member.write(tar_padding(tarinfo.size))
+            entry = {
+                "name": tarinfo.name,
+                "type": _member_type(tarinfo),
+                "size": tarinfo.size if tarinfo.isreg() else 0,
+                "mode": tarinfo.mode,
+                "mtime": tarinfo.mtime,
+                "offset": start,
+                "length": out.tell() - start,
+                "headerSize": len(header),
+                "rawOffset": raw_offset,
+            }
+            if digest is not None:
+                entry["sha256"] = digest.hexdigest()
+            if tarinfo.issym():
+                entry["linkname"] = tarinfo.linkname
+            entries.append(entry)
+            raw_offset += len(header) + entry["size"] + len(tar_padding(entry["size"]))
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6, mtime=0) as member:
+            member.write(tar_end_blocks(raw_offset))
+        archive_size = out.tell()
+    os.replace(partial, archive_path)
+
+    index = {
+        "format": SEEKABLE_FORMAT,
+        "archive": archive_path.name,
+        "source": source_folder.name,
+        "createdAt": time.time(),
+        "archiveSize": archive_size,
+        "members": entries,
+    }
+    with open(index_path_for(archive_path), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def load_index(archive_path: Path) -> Dict[str, Any]:
+    """
+    读取归档的成员索引
+
+    Raises:
+        FileNotFoundError: 归档没有索引（不是可随机访问格式）
+    """
+    with open(index_path_for(archive_path), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_member(index: Dict[str, Any], name: str) -> Optional[Dict[str, Any]]:
+    """按成员名查找索引条目"""
+    name = name.strip("/")
+    return next((m for m in index["members"] if m["name"].strip("/") == name), None)
+
+
+def iter_member_data(archive_path: Path, entry: Dict[str, Any],
+                     expected_sha256: Optional[str] = None) -> Iterator[bytes]:
+    """
+    只读取并解压单个成员，生成其文件内容，开销与成员大小成正比
+
+    Args:
+        archive_path: 归档文件路径
+        entry: 成员索引条目
+        expected_sha256: 期望的sha256（可选）。指定时最后一块数据在校验通过后才生成，
+            校验失败抛出IOError，调用方不会收到看似完整的错误内容
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    digest = hashlib.sha256() if expected_sha256 else None
+    held: Optional[bytes] = None
+    skip = entry["headerSize"]
+    left = entry["size"]
+    with open(archive_path, "rb") as f:
+        f.seek(entry["offset"])
+        remaining = entry["length"]
+        while remaining > 0 and left > 0:
+            compressed = f.read(min(READ_CHUNK, remaining))
+            if not compressed:
+                raise IOError(f"Archive truncated while reading {entry['name']}")
+            remaining -= len(compressed)
+            data = decompressor.decompress(compressed, READ_CHUNK)
+            while True:
+                if skip:
+                    cut = min(skip, len(data))
+                    data = data[cut:]
+                    skip -= cut
+                if data and left:
+                    data = data[:left]
+                    left -= len(data)
+                    if digest is None:
+                        yield data
+                    else:
+                        digest.update(data)
+                        if held is not None:
+                            yield held
+                        held = data
+                if not decompressor.unconsumed_tail or not left:
+                    break
+                data = decompressor.decompress(decompressor.unconsumed_tail, READ_CHUNK)
+    if left:
+        raise IOError(f"Archive truncated while reading {entry['name']}")
+    if digest is not None:
+        if digest.hexdigest() != expected_sha256:
+            raise IOError(f"Checksum mismatch for {entry['name']}")
+        if held is not None:
+            yield held
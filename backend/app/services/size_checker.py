@@ -0,0 +1,202 @@
+import re
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple, Any, List, Iterator
+import requests
+from ..core.config import settings
+from ..services import metrics
+from ..services.origin_limiter import adaptive_limiter
+from ..services.repo_listing import iter_files, resolve_revision
+from ..utils.hub import file_url, auth_headers
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SOURCES = ("huggingface", "modelscope")
+
+# 缓存键：(来源, 模型ID, 文件过滤, 版本, 仓库地址, 令牌摘要)
+SizeKey = Tuple[str, str, str, str, str, str]
+
+
+class SizeChecker:
+    """批量模型大小检查服务，所有批次共享同一个并发额度和结果缓存"""
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[SizeKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[SizeKey, Future] = {}
+        self._lock = threading.Lock()
+        # 仓库请求经过按源站共享的自适应并发控制，连接池按探测线程数设置
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.SIZE_CHECK_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def make_key(source: str, model_id: str, file_filter: Optional[str] = None, revision: Optional[str] = None,
+                 endpoint: Optional[str] = None, token: Optional[str] = None) -> SizeKey:
+        """构造去重和缓存使用的键，令牌只保存摘要"""
+        token_digest = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16] if token else ""
+        return (source, model_id.strip("/"), file_filter or "", revision or "", endpoint or "", token_digest)
+
+    def _probe_size(self, source: str, model_id: str, path: str, revision: str,
+                    token: Optional[str], endpoint: Optional[str]) -> int:
+        """元数据中缺少大小时，通过HEAD请求读取单个文件的大小"""
+        url = file_url(source, model_id, path, revision, endpoint)
+        with adaptive_limiter.request(self.session, "HEAD", url, headers=auth_headers(source, token),
+                                      allow_redirects=True, timeout=30) as response:
+            response.raise_for_status()
+            size = response.headers.get("x-linked-size") or response.headers.get("content-length")
+        return int(size) if size else 0
+
+    def _compute(self, source: str, model_id: str, file_filter: Optional[str], revision: Optional[str],
+                 token: Optional[str], endpoint: Optional[str]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "source": source,
+            "modelId": model_id,
+            "fileFilter": file_filter,
+            "revision": revision,
+            "totalBytes": 0,
+            "sizeGB": 0.0,
+            "matchedFiles": 0,
+            "totalFiles": 0,
+            "error": None,
+            "cached": False,
+        }
+        if source not in SUPPORTED_SOURCES:
+            result["error"] = f"Unsupported source: {source}"
+            return result
+        try:
+            regex = re.compile(file_filter) if file_filter else None
+        except re.error as e:
+            result["error"] = f"Invalid regex pattern: {str(e)}"
+            return result
+
+        try:
+            # 分页列出的文件列表已包含大小，逐页累计，只对缺少大小的文件并发探测
+            resolved = resolve_revision(source, model_id, revision, token, endpoint)
+            total = total_files = matched = 0
+            missing: List[str] = []
+            for path, size in iter_files(source, model_id, resolved, token, endpoint):
+                total_files += 1
+                if regex is not None and not regex.search(path):
+                    continue
+                matched += 1
+                if size is None:
+                    missing.append(path)
+                else:
+                    total += size
+            if missing:
+                with ThreadPoolExecutor(max_workers=min(settings.SIZE_CHECK_CONCURRENCY, len(missing))) as pool:
+                    total += sum(pool.map(
+                        lambda path: self._probe_size(source, model_id, path, resolved, token, endpoint), missing))
+        except Exception as e:
+            message = str(e)
+            if "401" in message:
+                message = "Invalid authentication token" if token else "Authentication required for this model"
+            logger.warning(f"Size check failed for {source}/{model_id}: {message}")
+            result["error"] = message
+            return result
+
+        result.update({
+            "revision": resolved,
+            "totalBytes": total,
+            "sizeGB": total / (1024 ** 3),
+            "matchedFiles": matched,
+            "totalFiles": total_files,
+        })
+        return result
+
+    def check(self, source: str, model_id: str, file_filter: Optional[str] = None, revision: Optional[str] = None,
+              token: Optional[str] = None, endpoint: Optional[str] = None) -> Dict[str, Any]:
+        """
+        检查单个模型（可按文件过滤）的大小，成功结果在SIZE_CHECK_CACHE_TTL内缓存，
+        同一模型的并发检查只向仓库请求一次
+
+        Args:
+            source: 模型来源
+            model_id: 模型ID
+            file_filter: 文件过滤正则表达式（可选）
+            revision: 版本（可选）
+            token: 认证令牌（可选）
+            endpoint: 仓库地址（可选）
+
+        Returns:
+            包含总字节数、匹配文件数和错误信息的结果字典
+        """
+        key = self.make_key(source, model_id, file_filter, revision, endpoint, token)
+        owner = False
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < settings.SIZE_CHECK_CACHE_TTL:
+                self._cache.move_to_end(key)
+                metrics.CACHE_REQUESTS.labels("size_check", "hit").inc()
+                return dict(cached[1], cached=True)
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = Future()
+                owner = True
+        if not owner:
+            # 其他请求正在检查同一模型，等待其结果
+            metrics.CACHE_REQUESTS.labels("size_check", "hit").inc()
+            return dict(future.result(), cached=True)
+
+        metrics.CACHE_REQUESTS.labels("size_check", "miss").inc()
+        try:
+            with metrics.SIZE_CHECK_SECONDS.time(source):
+                result = self._compute(source, model_id, file_filter, revision, token, endpoint)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            # 只缓存成功的结果
+            if result["error"] is None:
+                self._cache[key] = (time.monotonic(), result)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def check_batch(self, entries: List[Dict[str, Any]], token: Optional[str] = None,
+                    hf_mirror: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        并发检查多个模型的大小，重复条目只检查一次，按完成顺序生成结果
+
+        Args:
+            entries: 条目列表，每项包含source、modelId，可选fileFilter、revision、authToken
+            token: 默认认证令牌（条目未指定时使用）
+            hf_mirror: Hugging Face镜像URL（可选）
+
+        Yields:
+            每个不重复条目的结果字典，indices为该条目在请求中出现的所有位置
+        """
+        unique: "OrderedDict[SizeKey, Tuple[List[int], Dict[str, Any]]]" = OrderedDict()
+        for i, entry in enumerate(entries):
+            endpoint = hf_mirror if entry["source"] == "huggingface" else None
+            key = self.make_key(entry["source"], entry["modelId"], entry.get("fileFilter"), entry.get("revision"),
+                                endpoint, entry.get("authToken") or token)
+            unique.setdefault(key, ([], dict(entry, endpoint=endpoint)))[0].append(i)
+        logger.info(f"Checking sizes of {len(unique)} models ({len(entries)} entries)")
+        if not unique:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(settings.SIZE_CHECK_CONCURRENCY, len(unique))) as pool:
+            futures = {
+                pool.submit(self.check, entry["source"], entry["modelId"], entry.get("fileFilter"),
+                            entry.get("revision"), entry.get("authToken") or token, entry["endpoint"]): indices
+                for indices, entry in unique.values()
+            }
+            for future in as_completed(futures):
+                yield dict(future.result(), indices=futures[future])
+
+
+# 全局大小检查器实例
+size_checker = SizeChecker()
@@ -1,8 +1,13 @@
 import time
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Optional, Set
 from pathlib import Path
 import logging
 import uuid
+from . import metrics
+from .tracing import tracer
+from .task_store import MemoryTaskStore, SQLiteTaskStore
+from ..core.config import settings
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,10 +17,27 @@ logger = logging.getLogger(__name__)
 class TaskManager:
     """任务管理器类，用于管理和维护下载任务的状态"""
 
-    def __init__(self):
-        self.tasks: Dict[str, Dict[str, Any]] = {}
+    # 共享存储下进度写入的最小间隔（秒），状态变化总是立即写入
+    PROGRESS_FLUSH_INTERVAL = 0.5
+    # 共享存储下进行中下载的模型ID集合的缓存时间（秒）
+    ACTIVE_CACHE_SECONDS = 1.0
 
-    def create_task(self, source: str, model_id: str, save_path: Optional[str] = None) -> str:
+    def __init__(self, store: Optional[Any] = None):
+        self.store = store or MemoryTaskStore()
+        # 本进程写入过的任务的本地副本及上次写入存储的时间
+        self._local: Dict[str, Dict[str, Any]] = {}
+        self._last_flush: Dict[str, float] = {}
+        # 进行中的下载任务：任务ID -> 模型ID，随任务创建、状态变化和删除增量维护
+        self._active: Dict[str, str] = {}
+        self._active_lock = threading.Lock()
+        # 共享存储中的任务也可能由其他进程创建和结束，此时按短时间缓存扫描结果
+        self._active_cache: Optional[Set[str]] = None
+        self._active_cached_at = 0.0
+        # 本进程已失去作业租约的任务：作业已由其他工作进程接管或即将被接管，本进程应停止执行且不再写入
+        self._revoked: Set[str] = set()
+
+    def create_task(self, source: str, model_id: str, save_path: Optional[str] = None,
+                    origin: Optional[str] = None) -> str:
         """
         创建新的下载任务
         
@@ -23,6 +45,7 @@ class TaskManager:
             source: 模型来源（huggingface或modelscope）
             model_id: 模型ID
             save_path: 保存路径
+            origin: 实际下载的来源主机（用于指标统计）
             
         Returns:
             任务ID
@@ -30,7 +53,7 @@ class TaskManager:
         task_id = str(uuid.uuid4())
         current_time = time.time()
         
-        self.tasks[task_id] = {
+        self.store.put({
             "taskId": task_id,
             "source": source,
             "modelId": model_id,
@@ -40,10 +63,13 @@ class TaskManager:
             "totalSize": 0,
             "speed": 0.0,
             "savePath": save_path,
+            "origin": origin or source,
             "startTime": current_time,
             "lastUpdateTime": current_time,
             "type": "download"
-        }
+        })
+        self._track_download(task_id, model_id, "created")
+        metrics.TASK_EVENTS.labels("download", "created").inc()
         
         logger.info(f"Created task {task_id} for {source}/{model_id}")
         return task_id
@@ -65,10 +91,16 @@ class TaskManager:
         task_id = str(uuid.uuid4())
         current_time = time.time()
         
-        self.tasks[task_id] = {
+        self.store.put({
             "taskId": task_id,
+            "source": "local",
+            "modelId": archive_name or source_folder.name,
             "status": "created",
             "progress": 0.0,
+            "downloadedSize": 0,
+            "totalSize": 0,
+            "speed": 0.0,
+            "savePath": str(target_drive),
             "sourcePath": str(source_folder),
             "targetPath": str(target_drive),
             "archiveName": archive_name,
@@ -76,11 +108,47 @@ class TaskManager:
             "startTime": current_time,
             "lastUpdateTime": current_time,
             "type": "archive"
-        }
+        })
+        metrics.TASK_EVENTS.labels("archive", "created").inc()
         
         logger.info(f"Created archive task {task_id} for {source_folder}")
         return task_id
 
+    def create_restore_task(self, archive_path: Path, target_path: Path) -> str:
+        """
+        创建新的恢复任务
+        
+        Args:
+            archive_path: 归档文件或多卷清单路径
+            target_path: 解压目标路径
+            
+        Returns:
+            任务ID
+        """
+        task_id = str(uuid.uuid4())
+        current_time = time.time()
+        
+        self.store.put({
+            "taskId": task_id,
+            "source": "local",
+            "modelId": archive_path.name,
+            "status": "created",
+            "progress": 0.0,
+            "downloadedSize": 0,
+            "totalSize": 0,
+            "speed": 0.0,
+            "savePath": str(target_path),
+            "sourcePath": str(archive_path),
+            "targetPath": str(target_path),
+            "startTime": current_time,
+            "lastUpdateTime": current_time,
+            "type": "restore"
+        })
+        metrics.TASK_EVENTS.labels("restore", "created").inc()
+        
+        logger.info(f"Created restore task {task_id} for {archive_path}")
+        return task_id
+
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """
         获取任务信息
@@ -91,9 +159,91 @@ class TaskManager:
         Returns:
             任务信息字典，如果没有找到则返回None
         """
-        return self.tasks.get(task_id)
+        task = self.store.get(task_id)
+        if task is not None and task_id in self._revoked:
+            # 对本进程中仍在执行的作业表现为已取消，使其在下一个检查点退出
+            return dict(task, status="cancelled")
+        if task is not None and self.store.shared and task_id in self._local:
+            # 合并本进程尚未写入存储的进度字段，但以存储中的状态为准（可能已被其他进程取消）
+            merged = dict(self._local[task_id])
+            merged["status"] = task.get("status", merged.get("status"))
+            return merged
+        return task
 
-    def update_task(self, task_id: str, downloaded_size: int, total_size: int, status: Optional[str] = None) -> None:
+    def _load_for_update(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if self.store.shared:
+            task = self._local.get(task_id)
+            if task is None:
+                task = self.store.get(task_id)
+                if task is not None:
+                    self._local[task_id] = task
+            return task
+        return self.store.get(task_id)
+
+    def revoke(self, task_id: str) -> None:
+        """
+        撤销本进程对任务的执行权（作业租约丢失时调用）
+
+        此后本进程中对该任务的get_task返回已取消状态，进度和状态更新被忽略，
+        避免覆盖接管该作业的工作进程写入的状态
+
+        Args:
+            task_id: 任务ID
+        """
+        self._revoked.add(task_id)
+        self._local.pop(task_id, None)
+        self._last_flush.pop(task_id, None)
+
+    def clear_revoked(self, task_id: str) -> None:
+        """本进程中被撤销的作业退出后清除撤销标记"""
+        self._revoked.discard(task_id)
+
+    def _write(self, task_id: str, fields: Dict[str, Any], force: bool) -> None:
+        """将变更字段写入存储，共享存储下对纯进度更新进行节流"""
+        if not self.store.shared:
+            self.store.update(task_id, fields)
+            return
+        self._local[task_id].update(fields)
+        now = time.monotonic()
+        if force or now - self._last_flush.get(task_id, 0.0) >= self.PROGRESS_FLUSH_INTERVAL:
+            self.store.update(task_id, fields)
+            self._last_flush[task_id] = now
+            if force and str(fields.get("status", "")).startswith(("completed", "cancelled", "failed")):
+                # 任务结束后不再需要本地副本
+                self._local.pop(task_id, None)
+                self._last_flush.pop(task_id, None)
+
+    def _track_download(self, task_id: str, model_id: str, status: str) -> None:
+        with self._active_lock:
+            if _state_of(status) in ("queued", "active"):
+                self._active[task_id] = model_id
+            else:
+                self._active.pop(task_id, None)
+
+    def active_download_ids(self) -> Set[str]:
+        """
+        有进行中（排队或下载中）下载任务的模型ID
+
+        内存存储下直接返回增量维护的集合；共享存储下扫描全部任务，结果缓存ACTIVE_CACHE_SECONDS秒
+        """
+        if not self.store.shared:
+            with self._active_lock:
+                return set(self._active.values())
+        now = time.monotonic()
+        with self._active_lock:
+            if self._active_cache is not None and now - self._active_cached_at < self.ACTIVE_CACHE_SECONDS:
+                return self._active_cache
+        active = {
+            task.get("modelId") for task in self.store.all()
+            if task.get("type") == "download" and _state_of(task.get("status", "")) in ("queued", "active")
+        }
+        with self._active_lock:
+            self._active_cache = active
+            self._active_cached_at = now
+        return active
+
+    def update_task(self, task_id: str, downloaded_size: int, total_size: int, status: Optional[str] = None,
+                    existing_size: Optional[int] = None) -> None:
         """
         更新任务进度
         
@@ -102,18 +252,26 @@ class TaskManager:
             downloaded_size: 已下载的字节数
             total_size: 总字节数
             status: 状态文本 (可选)
+            existing_size: downloaded_size中本地已有、未经网络传输的字节数（跳过的完整文件、续传前的部分），
+                计入进度但不计入传输量和速度 (可选，默认沿用上次的值)
         """
-        if task_id not in self.tasks:
+        if task_id in self._revoked:
+            return
+        task = self._load_for_update(task_id)
+        if task is None:
             logger.warning(f"Attempted to update unknown task {task_id}")
             return
             
-        task = self.tasks[task_id]
         current_time = time.time()
         
-        # 计算下载速度
+        # 计算下载速度（只按经网络传输的字节计算）
+        previous_existing = task.get("existingSize", 0)
+        existing = previous_existing if existing_size is None else existing_size
+        size_diff = (downloaded_size - existing) - (task["downloadedSize"] - previous_existing)
+        if size_diff > 0 and task["type"] == "download":
+            metrics.BYTES_TRANSFERRED.labels(task["source"], task["origin"]).inc(size_diff)
         time_diff = current_time - task["lastUpdateTime"]
         if time_diff > 0:
-            size_diff = downloaded_size - task["downloadedSize"]
             speed = size_diff / time_diff if size_diff > 0 else 0
         else:
             speed = 0
@@ -137,18 +295,24 @@ class TaskManager:
             est_time_str = None
         
         # 更新任务状态
-        task.update({
+        fields = {
             "downloadedSize": downloaded_size,
             "totalSize": total_size,
             "progress": min(progress, 100.0),  # 确保不超过100%
             "speed": speed,
             "estimatedTimeLeft": est_time_str,
             "lastUpdateTime": current_time
-        })
+        }
+        if existing_size is not None:
+            fields["existingSize"] = existing_size
         
         # 仅当提供了状态时更新它
-        if status is not None:
-            task["status"] = status
+        if status is not None and status != task["status"]:
+            fields["status"] = status
+            metrics.TASK_EVENTS.labels(task["type"], _state_of(status)).inc()
+            if task["type"] == "download":
+                self._track_download(task_id, task["modelId"], status)
+        self._write(task_id, fields, force=status is not None)
             
         logger.debug(f"Updated task {task_id}: {downloaded_size}/{total_size} bytes, {progress:.1f}%, {speed:.2f} B/s")
 
@@ -161,22 +325,26 @@ class TaskManager:
             progress: 进度百分比 (0-100)
             status: 状态文本 (可选)
         """
-        if task_id not in self.tasks:
+        if task_id in self._revoked:
+            return
+        task = self._load_for_update(task_id)
+        if task is None:
             logger.warning(f"Attempted to update unknown archive task {task_id}")
             return
             
-        task = self.tasks[task_id]
         current_time = time.time()
         
         # 更新任务状态
-        task.update({
+        fields = {
             "progress": min(progress, 100.0),  # 确保不超过100%
             "lastUpdateTime": current_time
-        })
+        }
         
         # 仅当提供了状态时更新它
-        if status is not None:
-            task["status"] = status
+        if status is not None and status != task["status"]:
+            fields["status"] = status
+            metrics.TASK_EVENTS.labels(task["type"], _state_of(status)).inc()
+        self._write(task_id, fields, force=status is not None)
             
         logger.debug(f"Updated archive task {task_id}: {progress:.1f}%")
 
@@ -190,12 +358,51 @@ class TaskManager:
         Returns:
             如果任务被删除则返回True，否则返回False
         """
-        if task_id in self.tasks:
-            del self.tasks[task_id]
+        self._local.pop(task_id, None)
+        self._last_flush.pop(task_id, None)
+        with self._active_lock:
+            self._active.pop(task_id, None)
+        if self.store.delete(task_id):
+            tracer.remove(task_id)
             logger.info(f"Removed task {task_id}")
             return True
         return False
 
+    def count_tasks_by_state(self) -> Dict[tuple, float]:
+        """
+        按任务类型和状态统计任务数量
+        
+        Returns:
+            (类型, 状态) 到任务数量的映射
+        """
+        counts: Dict[tuple, float] = {}
+        for task in self.store.all():
+            key = (task.get("type", "download"), _state_of(task.get("status", "")))
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+def _state_of(status: str) -> str:
+    """将任务状态文本归类为 queued/active/completed/cancelled/failed"""
+    if status == "created":
+        return "queued"
+    if status.startswith("failed"):
+        return "failed"
+    if status in ("completed", "cancelled"):
+        return status
+    return "active"
+
+
+def _create_store() -> Any:
+    """根据配置创建任务存储"""
+    if settings.TASK_BACKEND == "sqlite":
+        logger.info(f"Using shared SQLite task store at {settings.TASK_DB_PATH}")
+        return SQLiteTaskStore(settings.TASK_DB_PATH)
+    if settings.TASK_BACKEND != "memory":
+        logger.warning(f"Unknown TASK_BACKEND '{settings.TASK_BACKEND}', falling back to memory")
+    return MemoryTaskStore()
+
 
 # 全局任务管理器实例
-task_manager = TaskManager() 
\ No newline at end of file
+task_manager = TaskManager(_create_store())
+metrics.TASKS.callback = task_manager.count_tasks_by_state
@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class MemoryTaskStore:
+    """进程内任务存储，仅适用于单进程部署"""
+
+    # 是否在多个进程间共享
+    shared = False
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+
+    def put(self, task: Dict[str, Any]) -> None:
+        self.tasks[task["taskId"]] = task
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self.tasks.get(task_id)
+
+    def update(self, task_id: str, fields: Dict[str, Any]) -> bool:
+        task = self.tasks.get(task_id)
+        if task is None:
+            return False
+        task.update(fields)
+        return True
+
+    def delete(self, task_id: str) -> bool:
+        return self.tasks.pop(task_id, None) is not None
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self.tasks.values())
+
+
+class SQLiteTaskStore:
+    """
+    基于SQLite的共享任务存储，供同一主机上的多个工作进程使用
+
+    除任务状态外，还保存待执行的作业。工作进程通过租约认领作业并定期续租（心跳），
+    租约过期的作业（例如工作进程崩溃）会被其他工作进程重新认领。
+    """
+
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            created REAL NOT NULL,
+            job_kind TEXT,
+            job_params TEXT,
+            job_state TEXT,
+            owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_job ON tasks (job_state, lease_expires);
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, task: Dict[str, Any]) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO tasks (task_id, data, created) VALUES (?, ?, ?)",
+            (task["taskId"], json.dumps(task), task.get("startTime", time.time()))
+        )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, task_id: str, fields: Dict[str, Any]) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return False
+            task = json.loads(row[0])
+            task.update(fields)
+            conn.execute("UPDATE tasks SET data = ? WHERE task_id = ?", (json.dumps(task), task_id))
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, task_id: str) -> bool:
+        cursor = self._connect().execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    def all(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT data FROM tasks ORDER BY created").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def enqueue_job(self, task_id: str, kind: str, params: Dict[str, Any]) -> None:
+        """
+        为任务登记一个待执行的作业
+
+        Args:
+            task_id: 任务ID
+            kind: 作业类型
+            params: 作业参数（需可JSON序列化）
+        """
+        self._connect().execute(
+            "UPDATE tasks SET job_kind = ?, job_params = ?, job_state = 'queued', owner = NULL, "
+            "lease_expires = NULL, attempts = 0 WHERE task_id = ?",
+            (kind, json.dumps(params), task_id)
+        )
+
+    def claim_job(self, owner: str, lease_seconds: float) -> Optional[Tuple[str, str, Dict[str, Any], int]]:
+        """
+        认领一个排队中或租约已过期的作业
+
+        Args:
+            owner: 工作进程标识
+            lease_seconds: 租约时长（秒）
+
+        Returns:
+            (任务ID, 作业类型, 作业参数, 已尝试次数) 元组，没有可认领的作业时返回None
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT task_id, job_kind, job_params, attempts FROM tasks "
+                "WHERE job_state = 'queued' OR (job_state = 'running' AND lease_expires < ?) "
+                "ORDER BY created LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            task_id, kind, params, attempts = row
+            conn.execute(
+                "UPDATE tasks SET job_state = 'running', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE task_id = ?",
+                (owner, now + lease_seconds, task_id)
+            )
+            conn.execute("COMMIT")
+            return task_id, kind, json.loads(params or "{}"), attempts + 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def renew_lease(self, task_id: str, owner: str, lease_seconds: float) -> bool:
+        """
+        续租（心跳）
+
+        Returns:
+            租约仍归该工作进程所有时返回True
+        """
+        cursor = self._connect().execute(
+            "UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND owner = ? AND job_state = 'running'",
+            (time.time() + lease_seconds, task_id, owner)
+        )
+        return cursor.rowcount > 0
+
+    def finish_job(self, task_id: str, owner: str, state: str = "done") -> None:
+        """结束作业并清除参数（参数中可能包含认证令牌）"""
+        self._connect().execute(
+            "UPDATE tasks SET job_state = ?, job_params = NULL, lease_expires = NULL "
+            "WHERE task_id = ? AND owner = ?",
+            (state, task_id, owner)
+        )
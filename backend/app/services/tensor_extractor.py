@@ -0,0 +1,388 @@
+import os
+import re
+import json
+import struct
+import bisect
+import hashlib
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Any, List, Tuple, Iterable, Callable
+import requests
+from ..core.config import settings
+from ..services.task_manager import task_manager
+from ..services.tracing import tracer
+from ..services.header_inspector import header_inspector
+from ..services.origin_limiter import adaptive_limiter
+from ..services.local_inventory import local_inventory
+from ..utils.hub import file_url, auth_headers
+from ..utils.file_writer import FileWriter
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 张量模式下不下载的文件：权重文件由张量重新组装，原索引会被重写
+SKIPPED_SUFFIXES = (".safetensors", ".gguf", ".bin", ".pt", ".pth", ".ckpt", ".h5", ".msgpack", ".ot", ".onnx")
+INDEX_FILE = "model.safetensors.index.json"
+CHUNK_SIZE = 1024 * 1024
+RANGE_RETRIES = 3
+# 续传日志：记录.part文件中已持久化的区间，重启后从该位置继续
+JOURNAL_SUFFIX = ".journal"
+
+
+class ExtractionCancelled(Exception):
+    """任务在提取过程中被取消"""
+
+
+def coalesce_ranges(tensors: List[Dict[str, Any]], max_gap: int) -> List[Tuple[int, int, List[Dict[str, Any]]]]:
+    """
+    将同一文件中的张量合并为尽量少的字节区间，间隔不超过max_gap的相邻张量合并到一个请求中
+
+    Args:
+        tensors: 张量信息列表（需位于同一文件）
+        max_gap: 允许合并的最大间隔字节数
+
+    Returns:
+        (起始偏移, 结束偏移, 区间内的张量) 列表，结束偏移不包含在内
+    """
+    ranges: List[Tuple[int, int, List[Dict[str, Any]]]] = []
+    for tensor in sorted(tensors, key=lambda t: t["offset"]):
+        start, end = tensor["offset"], tensor["offset"] + tensor["length"]
+        if ranges and start - ranges[-1][1] <= max_gap:
+            last_start, last_end, members = ranges[-1]
+            members.append(tensor)
+            ranges[-1] = (last_start, max(last_end, end), members)
+        else:
+            ranges.append((start, end, [tensor]))
+    return ranges
+
+
+def build_safetensors_header(tensors: List[Dict[str, Any]]) -> bytes:
+    """
+    为按顺序连续存放的张量构造safetensors头部（含8字节长度前缀，按8字节对齐）
+
+    Args:
+        tensors: 按写入顺序排列的张量信息列表
+
+    Returns:
+        头部字节
+    """
+    header: Dict[str, Any] = {"__metadata__": {"format": "pt"}}
+    position = 0
+    for tensor in tensors:
+        header[tensor["name"]] = {
+            "dtype": tensor["dtype"],
+            "shape": tensor["shape"],
+            "data_offsets": [position, position + tensor["length"]],
+        }
+        position += tensor["length"]
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 8)
+    return struct.pack("<Q", len(encoded)) + encoded
+
+
+def copy_members(chunks: Iterable[bytes], start: int, end: int, members: List[Dict[str, Any]],
+                 out, on_bytes: Callable[[int], None]) -> None:
+    """
+    从起始于start的字节流中只写出属于members的字节，跳过张量之间的间隔
+
+    Args:
+        chunks: 数据块迭代器
+        start: 数据流第一个字节在源文件中的偏移
+        end: 需要读取到的偏移（不包含）
+        members: 按偏移排序的张量
+        out: 输出文件对象
+        on_bytes: 每读取一块数据后的回调，参数为字节数
+    """
+    position = start
+    index = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        chunk_start = position
+        position += len(chunk)
+        view = memoryview(chunk)
+        while index < len(members):
+            member_start = members[index]["offset"]
+            member_end = member_start + members[index]["length"]
+            low, high = max(member_start, chunk_start), min(member_end, position)
+            if low < high:
+                out.write(view[low - chunk_start:high - chunk_start])
+            if member_end <= position:
+                index += 1
+            else:
+                break
+        on_bytes(len(chunk))
+        if position >= end:
+            break
+    if index < len(members):
+        raise IOError(f"Stream ended at byte {position} before reaching {end}")
+
+
+def _load_journal(journal_path: Path, partial: Path, fingerprint: str, range_ends: List[int]) -> int:
+    """
+    读取续传日志，返回可以跳过的已完成区间数
+
+    日志与本次请求的张量集合或版本不一致，或.part文件短于记录的偏移时从头开始。
+    """
+    try:
+        with open(journal_path, encoding="utf-8") as f:
+            journal = json.load(f)
+        completed = int(journal["completedRanges"])
+        if (journal.get("fingerprint") != fingerprint or not 0 < completed <= len(range_ends)
+                or journal.get("offset") != range_ends[completed - 1]
+                or partial.stat().st_size < range_ends[completed - 1]):
+            return 0
+        return completed
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+
+
+def _save_journal(journal_path: Path, journal: Dict[str, Any]) -> None:
+    """原子地写出续传日志"""
+    temporary = journal_path.with_name(journal_path.name + ".tmp")
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(journal, f)
+    os.replace(temporary, journal_path)
+
+
+class TensorExtractor:
+    """张量级下载服务，只通过Range请求获取匹配的张量并组装为本地safetensors文件"""
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.TENSOR_FETCH_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _check_cancelled(task_id: str) -> None:
+        task = task_manager.get_task(task_id)
+        if task is not None and task.get("status") == "cancelled":
+            raise ExtractionCancelled()
+
+    def _fetch_range(self, task_id: str, url: str, headers: Dict[str, str], start: int, end: int,
+                     members: List[Dict[str, Any]], out, on_bytes: Callable[[int], None]) -> None:
+        """读取一个合并后的区间并写出其中的张量，失败时从区间起点重试"""
+        resume_at = out.tell()
+        for attempt in range(1, RANGE_RETRIES + 1):
+            self._check_cancelled(task_id)
+            received = 0
+
+            def count(nbytes: int) -> None:
+                nonlocal received
+                received += nbytes
+                on_bytes(nbytes)
+
+            try:
+                request_headers = dict(headers)
+                request_headers["Range"] = f"bytes={start}-{end - 1}"
+                with adaptive_limiter.request(self.session, "GET", url, headers=request_headers, stream=True,
+                                              timeout=60) as response:
+                    response.raise_for_status()
+                    stream_start = start
+                    if response.status_code != 206:
+                        logger.warning(f"Server ignored Range request for {url}, reading from the beginning")
+                        stream_start = 0
+                    copy_members(response.iter_content(chunk_size=CHUNK_SIZE), stream_start, end, members, out, count)
+                return
+            except (requests.RequestException, IOError) as e:
+                # 回退本次区间已计入的进度和已写出的数据
+                on_bytes(-received)
+                out.truncate(resume_at)
+                if attempt == RANGE_RETRIES:
+                    raise
+                logger.warning(f"Range {start}-{end} of {url} failed (attempt {attempt}): {str(e)}")
+                time.sleep(attempt)
+
+    def _extract_file(self, task_id: str, source: str, model_id: str, revision: str, path: str,
+                      tensors: List[Dict[str, Any]], save_path: Path, token: Optional[str],
+                      endpoint: Optional[str], on_bytes: Callable[[int], None]) -> int:
+        """
+        获取一个源权重文件中的匹配张量并写出同名的safetensors文件
+
+        Returns:
+            写出的文件字节数
+        """
+        url = file_url(source, model_id, path, revision, endpoint)
+        headers = auth_headers(source, token)
+        ordered = sorted(tensors, key=lambda t: t["offset"])
+        target = save_path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".part")
+        journal_path = partial.with_name(partial.name + JOURNAL_SUFFIX)
+
+        header = build_safetensors_header(ordered)
+        ranges = coalesce_ranges(ordered, settings.TENSOR_COALESCE_GAP)
+        # 每个区间写完后输出文件的长度，持久化点按此换算为已完成的区间数
+        range_ends = []
+        position = len(header)
+        for _, _, members in ranges:
+            position += sum(m["length"] for m in members)
+            range_ends.append(position)
+        fingerprint = hashlib.sha256(revision.encode("utf-8") + header).hexdigest()
+        done = _load_journal(journal_path, partial, fingerprint, range_ends)
+
+        def on_sync(synced: int) -> None:
+            completed = bisect.bisect_right(range_ends, synced)
+            if completed:
+                _save_journal(journal_path, {
+                    "fingerprint": fingerprint,
+                    "completedRanges": completed,
+                    "offset": range_ends[completed - 1],
+                })
+
+        with tracer.span(task_id, "tensor_fetch", file=path, tensors=len(ordered)) as span:
+            offset = range_ends[done - 1] if done else 0
+            with FileWriter(partial, offset=offset, on_sync=on_sync) as out:
+                if done:
+                    resumed = sum(end - start for start, end, _ in ranges[:done])
+                    logger.info(f"Resuming {path} after {done}/{len(ranges)} ranges ({offset} bytes)")
+                    on_bytes(resumed)
+                    span.set_attribute("resumed_bytes", resumed)
+                else:
+                    out.write(header)
+                for start, end, members in ranges[done:]:
+                    self._fetch_range(task_id, url, headers, start, end, members, out, on_bytes)
+                    span.add_bytes(end - start)
+                    out.checkpoint()
+                written = out.tell()
+            os.replace(partial, target)
+            journal_path.unlink(missing_ok=True)
+        return written
+
+    def _fetch_whole_file(self, task_id: str, source: str, model_id: str, revision: str, path: str,
+                          save_path: Path, token: Optional[str], endpoint: Optional[str],
+                          on_bytes: Callable[[int], None]) -> None:
+        """下载配置、分词器等非权重文件"""
+        target = save_path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        url = file_url(source, model_id, path, revision, endpoint)
+        with tracer.span(task_id, "file_fetch", file=path) as span:
+            with adaptive_limiter.request(self.session, "GET", url, headers=auth_headers(source, token),
+                                          stream=True, timeout=60) as response:
+                response.raise_for_status()
+                with FileWriter(target) as out:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        out.write(chunk)
+                        on_bytes(len(chunk))
+                        span.add_bytes(len(chunk))
+
+    def extract(self, task_id: str, source: str, model_id: str, tensor_filter: str,
+                save_path: Optional[str] = None, token: Optional[str] = None, hf_mirror: Optional[str] = None,
+                file_filter: Optional[str] = None, revision: Optional[str] = None) -> Optional[Path]:
+        """
+        只下载匹配张量的字节，组装为有效的safetensors文件并重写索引
+
+        Args:
+            task_id: 任务ID
+            source: 模型来源
+            model_id: 模型ID
+            tensor_filter: 张量名正则表达式
+            save_path: 保存路径（可选）
+            token: 认证令牌（可选）
+            hf_mirror: Hugging Face镜像URL（可选）
+            file_filter: 权重文件过滤正则表达式（可选）
+            revision: 版本（可选）
+
+        Returns:
+            保存目录，失败或取消时返回None
+        """
+        if not save_path:
+            save_path = os.path.join(settings.DEFAULT_DOWNLOAD_PATH, model_id.split("/")[-1])
+        save_path = Path(save_path)
+        os.makedirs(save_path, exist_ok=True)
+        endpoint = hf_mirror if source == "huggingface" else None
+
+        task_manager.update_task(task_id, 0, 100, "downloading")
+        try:
+            with tracer.span(task_id, "header_index", pattern=tensor_filter) as span:
+                index = header_inspector.inspect(source, model_id, token, revision, endpoint, file_filter)
+                regex = re.compile(tensor_filter)
+                selected = [t for t in index["tensors"] if regex.search(t["name"])]
+                span.set_attribute("matched", len(selected))
+
+            unsupported = sorted({t["file"] for t in selected if not t["file"].endswith(".safetensors")})
+            if unsupported:
+                logger.warning(f"Tensor extraction only supports safetensors, skipping: {unsupported}")
+                selected = [t for t in selected if t["file"].endswith(".safetensors")]
+            if not selected:
+                task_manager.update_task(task_id, 0, 0, f"failed: No tensors matched the filter {tensor_filter}")
+                return None
+
+            by_file: Dict[str, List[Dict[str, Any]]] = {}
+            for tensor in selected:
+                by_file.setdefault(tensor["file"], []).append(tensor)
+
+            with tracer.span(task_id, "listing") as span:
+                _, files = header_inspector.list_files(source, model_id, index["revision"], token, endpoint)
+                extra_files = [(path, size or 0) for path, size in files
+                               if not path.endswith(SKIPPED_SUFFIXES) and not path.endswith(".index.json")]
+                span.set_attribute("files", len(extra_files))
+
+            # 总量为实际请求的字节数（包含合并区间中的间隔）
+            total_size = sum(size for _, size in extra_files) + sum(
+                end - start
+                for tensors in by_file.values()
+                for start, end, _ in coalesce_ranges(tensors, settings.TENSOR_COALESCE_GAP)
+            )
+            logger.info(f"Extracting {len(selected)} tensors from {len(by_file)} files of {model_id}, "
+                        f"{total_size} bytes to transfer")
+
+            lock = threading.Lock()
+            progress = {"bytes": 0, "reported": 0.0}
+
+            def on_bytes(nbytes: int) -> None:
+                with lock:
+                    progress["bytes"] += nbytes
+                    now = time.monotonic()
+                    if now - progress["reported"] < 0.5:
+                        return
+                    progress["reported"] = now
+                    downloaded = progress["bytes"]
+                task_manager.update_task(task_id, downloaded, max(total_size, downloaded))
+
+            with tracer.span(task_id, "transfer", files=len(by_file) + len(extra_files)) as span:
+                with ThreadPoolExecutor(max_workers=settings.TENSOR_FETCH_CONCURRENCY) as pool:
+                    futures = [
+                        pool.submit(self._extract_file, task_id, source, model_id, index["revision"], path,
+                                    tensors, save_path, token, endpoint, on_bytes)
+                        for path, tensors in by_file.items()
+                    ]
+                    futures += [
+                        pool.submit(self._fetch_whole_file, task_id, source, model_id, index["revision"], path,
+                                    save_path, token, endpoint, on_bytes)
+                        for path, _ in extra_files
+                    ]
+                    for future in futures:
+                        future.result()
+                span.add_bytes(progress["bytes"])
+
+            # 重写索引，只包含提取出的张量
+            weight_map = {t["name"]: t["file"] for t in selected}
+            with open(save_path / INDEX_FILE, "w", encoding="utf-8") as f:
+                json.dump({
+                    "metadata": {"total_size": sum(t["length"] for t in selected)},
+                    "weight_map": dict(sorted(weight_map.items())),
+                }, f, indent=2)
+
+            task_manager.update_task(task_id, progress["bytes"], max(total_size, progress["bytes"]), "completed")
+            local_inventory.record_download(save_path, source, model_id, index["revision"],
+                                            tensor_filter=tensor_filter)
+            logger.info(f"Tensor extraction completed for {model_id}: {len(selected)} tensors")
+            return save_path
+
+        except ExtractionCancelled:
+            logger.info(f"Tensor extraction cancelled for task {task_id}")
+            return None
+        except Exception as e:
+            logger.error(f"Error extracting tensors from {model_id}: {str(e)}")
+            task_manager.update_task(task_id, 0, 0, f"failed: {str(e)}")
+            return None
+
+
+# 全局张量提取器实例
+tensor_extractor = TensorExtractor()
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import logging
+import itertools
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Iterator
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 每个任务最多保留的span数量，避免超大仓库的逐文件span占用过多内存
+MAX_SPANS_PER_TASK = 5000
+# 最多保留时间线的任务数，超出时按最近最少使用的顺序淘汰已结束任务的时间线
+MAX_TRACED_TASKS = 200
+
+
+class Span:
+    """一个阶段或文件操作的计时区间"""
+
+    __slots__ = ("span_id", "parent_id", "task_id", "name", "file", "start", "end",
+                 "bytes", "error", "attributes", "thread_id")
+
+    def __init__(self, span_id: int, parent_id: Optional[int], task_id: str, name: str,
+                 file: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.task_id = task_id
+        self.name = name
+        self.file = file
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.bytes = 0
+        self.error: Optional[str] = None
+        self.attributes = dict(attributes or {})
+        self.thread_id = threading.get_ident()
+
+    def add_bytes(self, nbytes: int) -> None:
+        """累加该区间处理的字节数"""
+        self.bytes += nbytes
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """设置附加属性"""
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.time()
+        return {
+            "spanId": self.span_id,
+            "parentId": self.parent_id,
+            "name": self.name,
+            "file": self.file,
+            "startTime": self.start,
+            "endTime": self.end,
+            "durationMs": round((end - self.start) * 1000, 3),
+            "bytes": self.bytes,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """任务生命周期追踪器，按任务记录各阶段和各文件的span"""
+
+    def __init__(self, max_spans_per_task: int = MAX_SPANS_PER_TASK, max_tasks: int = MAX_TRACED_TASKS):
+        self.max_spans_per_task = max_spans_per_task
+        self.max_tasks = max_tasks
+        # 按最近使用的顺序排列，最久未使用的在前
+        self._timelines: Dict[str, List[Span]] = {}
+        self._dropped: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, task_id: str, name: str, file: Optional[str] = None,
+             parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        记录一个span，异常会被记录到span后继续抛出
+
+        Args:
+            task_id: 任务ID
+            name: 阶段名称（如 listing、filter、transfer、archive）
+            file: 关联的文件（可选）
+            parent: 父span（可选，默认为当前线程中最近打开的同任务span）
+            **attributes: 附加属性
+
+        Yields:
+            Span对象，可用于累加字节数或设置属性
+        """
+        stack = self._stack()
+        if parent is None:
+            parent = next((s for s in reversed(stack) if s.task_id == task_id), None)
+        span = Span(next(self._ids), parent.span_id if parent else None, task_id, name, file, attributes)
+        self._record(span)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            span.end = time.time()
+            stack.remove(span)
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            timeline = self._timelines.get(span.task_id)
+            if timeline is None:
+                timeline = self._timelines[span.task_id] = []
+                self._evict()
+            if len(timeline) >= self.max_spans_per_task:
+                self._dropped[span.task_id] = self._dropped.get(span.task_id, 0) + 1
+                return
+            timeline.append(span)
+
+    def _evict(self) -> None:
+        """超出任务数上限时从最久未使用的开始淘汰所有span均已结束的时间线（调用方持有锁）"""
+        excess = len(self._timelines) - self.max_tasks
+        if excess <= 0:
+            return
+        for task_id in list(self._timelines):
+            if excess <= 0:
+                break
+            if all(span.end is not None for span in self._timelines[task_id]):
+                del self._timelines[task_id]
+                self._dropped.pop(task_id, None)
+                excess -= 1
+
+    def _touch(self, task_id: str) -> List[Span]:
+        """取出任务的span并标记为最近使用（调用方持有锁）"""
+        timeline = self._timelines.pop(task_id, None)
+        if timeline is None:
+            return []
+        self._timelines[task_id] = timeline
+        return list(timeline)
+
+    def get_timeline(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务的时间线
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            包含所有span的字典，如果没有记录则返回None
+        """
+        with self._lock:
+            spans = self._touch(task_id)
+            dropped = self._dropped.get(task_id, 0)
+        if not spans:
+            return None
+        return {
+            "taskId": task_id,
+            "spans": [span.to_dict() for span in spans],
+            "droppedSpans": dropped,
+        }
+
+    def export_trace(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        以Chrome Trace Event格式导出任务时间线（可在chrome://tracing或Perfetto中打开）
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            Trace Event格式的字典，如果没有记录则返回None
+        """
+        with self._lock:
+            spans = self._touch(task_id)
+        if not spans:
+            return None
+        events = []
+        for span in spans:
+            end = span.end if span.end is not None else time.time()
+            args = dict(span.attributes)
+            args.update({"spanId": span.span_id, "parentId": span.parent_id, "bytes": span.bytes})
+            if span.file:
+                args["file"] = span.file
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": f"{span.name}:{span.file}" if span.file else span.name,
+                "cat": span.name,
+                "ph": "X",
+                "ts": int(span.start * 1_000_000),
+                "dur": int((end - span.start) * 1_000_000),
+                "pid": os.getpid(),
+                "tid": span.thread_id,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"taskId": task_id}}
+
+    def remove(self, task_id: str) -> None:
+        """删除任务的时间线"""
+        with self._lock:
+            self._timelines.pop(task_id, None)
+            self._dropped.pop(task_id, None)
+
+
+# 全局追踪器实例
+tracer = Tracer()
@@ -0,0 +1,260 @@
+import os
+import mmap
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+import threading
+import logging
+from typing import Optional, Callable, List
+from ..core.config import settings
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 写入模式：buffered（经过页缓存）、fadvise（同步后通知内核丢弃已写入的页）、direct（O_DIRECT绕过页缓存）
+WRITE_MODES = ("buffered", "fadvise", "direct")
+# O_DIRECT要求的偏移、长度和内存对齐
+DIRECT_ALIGNMENT = 4096
+
+HAS_FADVISE = hasattr(os, "posix_fadvise")
+HAS_DIRECT = hasattr(os, "O_DIRECT") and fcntl is not None
+# macOS没有fdatasync
+_datasync = getattr(os, "fdatasync", os.fsync)
+
+
+class _BufferPool:
+    """可复用的页对齐写缓冲区池，避免每个文件重新分配大块内存"""
+
+    def __init__(self):
+        self._free: List[mmap.mmap] = []
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int) -> mmap.mmap:
+        with self._lock:
+            for i, buffer in enumerate(self._free):
+                if len(buffer) == size:
+                    return self._free.pop(i)
+        # 匿名mmap按页对齐，满足O_DIRECT的内存对齐要求
+        return mmap.mmap(-1, size)
+
+    def release(self, buffer: mmap.mmap) -> None:
+        with self._lock:
+            if len(self._free) < settings.WRITE_BUFFER_POOL_SIZE:
+                self._free.append(buffer)
+                return
+        buffer.close()
+
+
+buffer_pool = _BufferPool()
+
+
+def drop_page_cache(path: str) -> None:
+    """
+    将已写完的文件刷盘并通知内核丢弃其页缓存（用于SDK写入的文件）
+
+    Args:
+        path: 文件路径
+    """
+    if not HAS_FADVISE:
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        _datasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError as e:
+        logger.debug(f"Failed to drop page cache for {path}: {str(e)}")
+    finally:
+        os.close(fd)
+
+
+class FileWriter:
+    """
+    下载、归档和恢复共用的文件写入器
+
+    数据先复制到可复用的大缓冲区，缓冲区满时一次性写出；每写入sync_bytes字节执行一次
+    fdatasync作为持久化点，并回调on_sync（用于更新续传日志）。fadvise模式在持久化点之后
+    丢弃已写入的页缓存，direct模式使用O_DIRECT整块写入，避免大文件挤占同机其他服务的页缓存。
+    """
+
+    def __init__(self, path: str, mode: Optional[str] = None, buffer_size: Optional[int] = None,
+                 sync_bytes: Optional[int] = None, offset: int = 0,
+                 on_sync: Optional[Callable[[int], None]] = None):
+        """
+        Args:
+            path: 文件路径
+            mode: 写入模式（默认使用WRITE_MODE配置）
+            buffer_size: 缓冲区大小（字节，默认使用WRITE_BUFFER_SIZE配置）
+            sync_bytes: 持久化点间隔（字节，0表示只在关闭时同步）
+            offset: 从该偏移继续写入已有文件（续传），之后的内容会被截断
+            on_sync: 每个持久化点之后的回调，参数为已持久化的字节数
+        """
+        self.path = str(path)
+        self.mode = mode or settings.WRITE_MODE
+        if self.mode not in WRITE_MODES:
+            raise ValueError(f"Unknown write mode: {self.mode}")
+        if (self.mode == "fadvise" and not HAS_FADVISE) or (self.mode == "direct" and not HAS_DIRECT):
+            self.mode = "buffered"
+        size = buffer_size or settings.WRITE_BUFFER_SIZE
+        self.buffer_size = max(size - size % DIRECT_ALIGNMENT, DIRECT_ALIGNMENT)
+        self.sync_bytes = settings.WRITE_SYNC_BYTES if sync_bytes is None else sync_bytes
+        self.on_sync = on_sync
+
+        self.fd = self._open(offset > 0)
+        self.buffer = buffer_pool.acquire(self.buffer_size)
+        self.fill = 0
+        # 已写出到文件（不含缓冲区）的字节数
+        self.flushed = 0
+        self.synced = 0
+        self.closed = False
+        self._reset_to(offset)
+
+    def _open(self, keep: bool) -> int:
+        flags = os.O_WRONLY | os.O_CREAT | (0 if keep else os.O_TRUNC)
+        if self.mode == "direct":
+            try:
+                return os.open(self.path, flags | os.O_DIRECT, 0o644)
+            except OSError as e:
+                # 部分文件系统（如tmpfs）不支持O_DIRECT
+                logger.warning(f"O_DIRECT not supported for {self.path} ({str(e)}), falling back to fadvise")
+                self.mode = "fadvise" if HAS_FADVISE else "buffered"
+        return os.open(self.path, flags, 0o644)
+
+    def _set_direct(self, enabled: bool) -> None:
+        """切换O_DIRECT标志（写入不对齐的尾部时需要关闭）"""
+        flags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+        flags = flags | os.O_DIRECT if enabled else flags & ~os.O_DIRECT
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, flags)
+
+    def _reset_to(self, offset: int) -> None:
+        """把写入位置移动到offset并丢弃之后的内容；direct模式下把未对齐的尾部读回缓冲区"""
+        aligned = offset - offset % DIRECT_ALIGNMENT if self.mode == "direct" else offset
+        tail = b""
+        if aligned < offset:
+            with open(self.path, "rb") as f:
+                f.seek(aligned)
+                tail = f.read(offset - aligned)
+            if len(tail) != offset - aligned:
+                raise IOError(f"Cannot resume {self.path} at {offset}: file is shorter")
+        os.ftruncate(self.fd, aligned)
+        os.lseek(self.fd, aligned, os.SEEK_SET)
+        self.flushed = aligned
+        self.synced = min(self.synced, aligned)
+        self.buffer[:len(tail)] = tail
+        self.fill = len(tail)
+
+    def _write_out(self, length: int) -> None:
+        view = memoryview(self.buffer)[:length]
+        written = 0
+        while written < length:
+            written += os.write(self.fd, view[written:])
+        view.release()
+        self.flushed += length
+
+    def _flush_buffer(self, final: bool = False) -> None:
+        """
+        写出缓冲区。direct模式下非最终写出只写对齐部分，不对齐的尾部留在缓冲区开头，
+        只有关闭文件时才临时关闭O_DIRECT写出不对齐的末尾
+        """
+        if self.fill == 0:
+            return
+        if self.mode != "direct":
+            self._write_out(self.fill)
+            self.fill = 0
+            return
+        aligned = self.fill - self.fill % DIRECT_ALIGNMENT
+        if aligned:
+            self._write_out(aligned)
+        tail = self.fill - aligned
+        if tail and final:
+            self.buffer.move(0, aligned, tail)
+            self._set_direct(False)
+            try:
+                self._write_out(tail)
+            finally:
+                self._set_direct(True)
+            tail = 0
+        elif tail:
+            self.buffer.move(0, aligned, tail)
+        self.fill = tail
+
+    def write(self, data) -> int:
+        """写入数据，返回写入的字节数"""
+        view = memoryview(data).cast("B")
+        total = len(view)
+        position = 0
+        while position < total:
+            count = min(self.buffer_size - self.fill, total - position)
+            self.buffer[self.fill:self.fill + count] = view[position:position + count]
+            self.fill += count
+            position += count
+            if self.fill == self.buffer_size:
+                self._flush_buffer()
+                if self.sync_bytes and self.flushed - self.synced >= self.sync_bytes:
+                    self._sync()
+        return total
+
+    def tell(self) -> int:
+        return self.flushed + self.fill
+
+    def truncate(self, offset: int) -> None:
+        """回退到offset（例如重试一个失败的区间）"""
+        if offset >= self.flushed:
+            self.fill = offset - self.flushed
+        else:
+            self._reset_to(offset)
+
+    def _sync(self) -> None:
+        _datasync(self.fd)
+        if self.mode == "fadvise":
+            os.posix_fadvise(self.fd, self.synced, self.flushed - self.synced, os.POSIX_FADV_DONTNEED)
+        self.synced = self.flushed
+        if self.on_sync:
+            self.on_sync(self.synced)
+
+    def checkpoint(self) -> None:
+        """在一个逻辑单元（如一个Range区间）结束时调用，达到持久化间隔时刷盘"""
+        if self.sync_bytes and self.tell() - self.synced >= self.sync_bytes:
+            self._flush_buffer()
+            self._sync()
+
+    def close(self) -> None:
+        """写出剩余数据并关闭文件；非buffered模式或已经过持久化点的大文件先同步，小文件不额外fsync"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._flush_buffer(final=True)
+            if self.synced or self.mode != "buffered":
+                self._sync()
+        finally:
+            os.close(self.fd)
+            buffer_pool.release(self.buffer)
+
+    def abort(self) -> None:
+        """放弃写入并关闭文件（不同步）"""
+        if self.closed:
+            return
+        self.closed = True
+        os.close(self.fd)
+        buffer_pool.release(self.buffer)
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        # 缓冲区只在写满或关闭时写出，以保持大块对齐的写入
+        pass
+
+    def __enter__(self) -> "FileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,62 @@
+from typing import Dict, Optional
+from urllib.parse import quote
+from ..core.config import settings
+
+
+def hub_endpoint(source: str, endpoint: Optional[str] = None) -> str:
+    """
+    仓库地址（未指定时使用配置中的默认地址）
+
+    Args:
+        source: 模型来源
+        endpoint: 仓库地址（可选）
+
+    Returns:
+        仓库基础URL
+    """
+    if source == "modelscope":
+        return (endpoint or settings.MODELSCOPE_ENDPOINT).rstrip("/")
+    return (endpoint or settings.HF_ENDPOINT).rstrip("/")
+
+
+def file_url(source: str, model_id: str, path: str, revision: Optional[str] = None,
+             endpoint: Optional[str] = None) -> str:
+    """
+    构造仓库中单个文件的下载地址
+
+    Args:
+        source: 模型来源（huggingface或modelscope）
+        model_id: 模型ID
+        path: 仓库内的文件路径
+        revision: 版本（分支、标签或提交）
+        endpoint: 仓库地址（可选，默认使用配置）
+
+    Returns:
+        文件下载URL
+    """
+    if source == "huggingface":
+        base = hub_endpoint(source, endpoint)
+        return f"{base}/{model_id}/resolve/{quote(revision or 'main', safe='')}/{quote(path)}"
+    if source == "modelscope":
+        base = hub_endpoint(source, endpoint)
+        return (f"{base}/api/v1/models/{model_id}/repo"
+                f"?Revision={quote(revision or 'master', safe='')}&FilePath={quote(path, safe='')}")
+    raise ValueError(f"Unsupported source: {source}")
+
+
+def auth_headers(source: str, token: Optional[str] = None) -> Dict[str, str]:
+    """
+    构造认证请求头
+
+    Args:
+        source: 模型来源
+        token: 认证令牌（可选，默认使用配置中的令牌）
+
+    Returns:
+        请求头字典
+    """
+    if source == "huggingface":
+        token = token or settings.HUGGINGFACE_TOKEN
+    elif source == "modelscope":
+        token = token or settings.MODELSCOPE_TOKEN
+    return {"Authorization": f"Bearer {token}"} if token else {}
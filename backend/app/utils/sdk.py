@@ -0,0 +1,94 @@
+import importlib
+import importlib.util
+import logging
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_load_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _module_installed(name: str) -> bool:
+    """只查找顶层包的模块规格，不执行导入"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def huggingface_hub_available() -> bool:
+    """huggingface_hub是否已安装（不导入SDK）"""
+    return _module_installed("huggingface_hub")
+
+
+def modelscope_available() -> bool:
+    """modelscope是否已安装（不导入SDK）"""
+    return _module_installed("modelscope")
+
+
+@lru_cache(maxsize=None)
+def _load_huggingface_hub() -> SimpleNamespace:
+    with _load_lock:
+        hub = importlib.import_module("huggingface_hub")
+        utils = importlib.import_module("huggingface_hub.utils")
+        # snapshot_download内部的thread_map在tqdm没有全局锁时临时创建并在结束时删除它，
+        # 并发下载时会相互删除对方的锁；预先创建锁可避免该竞争
+        importlib.import_module("tqdm").tqdm.get_lock()
+    return SimpleNamespace(
+        snapshot_download=hub.snapshot_download,
+        hf_hub_download=hub.hf_hub_download,
+        HfApi=hub.HfApi,
+        hf_hub_url=hub.hf_hub_url,
+        # 新版本的huggingface_hub已移除HfFolder
+        HfFolder=getattr(utils, "HfFolder", None),
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_modelscope() -> SimpleNamespace:
+    with _load_lock:
+        snapshot = importlib.import_module("modelscope.hub.snapshot_download")
+        api = importlib.import_module("modelscope.hub.api")
+    return SimpleNamespace(
+        snapshot_download=snapshot.snapshot_download,
+        HubApi=api.HubApi,
+    )
+
+
+def load_huggingface_hub() -> SimpleNamespace:
+    """
+    首次使用时导入huggingface_hub，之后返回缓存的结果
+
+    Returns:
+        包含snapshot_download、hf_hub_download、HfApi、hf_hub_url和HfFolder的命名空间
+
+    Raises:
+        ImportError: SDK未安装或导入失败
+    """
+    try:
+        return _load_huggingface_hub()
+    except ImportError as e:
+        logger.error(f"Failed to import huggingface_hub: {str(e)}")
+        raise
+
+
+def load_modelscope() -> SimpleNamespace:
+    """
+    首次使用时导入modelscope，之后返回缓存的结果
+
+    Returns:
+        包含snapshot_download和HubApi的命名空间
+
+    Raises:
+        ImportError: SDK未安装或导入失败
+    """
+    try:
+        return _load_modelscope()
+    except ImportError as e:
+        logger.error(f"Failed to import modelscope: {str(e)}")
+        raise
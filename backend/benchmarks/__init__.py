@@ -0,0 +1 @@
+# 基准测试包初始化文件
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+比较两次基准测试结果
+
+用法:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+吞吐量下降或延迟、CPU、内存上升超过阈值（百分比）时以非零状态退出。
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# 指标路径及其方向：True表示越大越好
+METRICS = (
+    (("bytesPerSec",), True),
+    (("latencyMs", "p50"), False),
+    (("latencyMs", "p99"), False),
+    (("startLatencyMs", "p99"), False),
+    (("progressLatencyMs", "p50"), False),
+    (("progressLatencyMs", "p99"), False),
+    (("cpuSecondsPerGB",), False),
+    (("memory", "rssHighWaterBytes"), False),
+)
+
+
+def _lookup(data: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data if isinstance(data, (int, float)) else None
+
+
+def compare(baseline: Dict[str, Any],
+            candidate: Dict[str, Any]) -> Iterator[Tuple[str, str, float, float, float, float]]:
+    """
+    逐阶段逐指标比较，产生 (阶段, 指标, 基线值, 候选值, 变化百分比, 退化百分比)
+
+    退化百分比按指标方向换算，正值表示变差，由调用方与阈值比较
+    """
+    for phase, base_result in baseline.get("phases", {}).items():
+        cand_result = candidate.get("phases", {}).get(phase)
+        if cand_result is None:
+            continue
+        for path, higher_is_better in METRICS:
+            base = _lookup(base_result, path)
+            cand = _lookup(cand_result, path)
+            if base is None or cand is None or base == 0:
+                continue
+            change = (cand - base) / base * 100.0
+            worse = -change if higher_is_better else change
+            yield phase, ".".join(path), base, cand, change, worse
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", type=str, help="Baseline results JSON")
+    parser.add_argument("candidate", type=str, help="Candidate results JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = 0
+    print(f"{'phase':<28} {'metric':<26} {'baseline':>14} {'candidate':>14} {'change':>9}")
+    for phase, metric, base, cand, change, worse in compare(baseline, candidate):
+        flag = ""
+        if worse > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{phase:<28} {metric:<26} {base:>14.3f} {cand:>14.3f} {change:>+8.1f}%{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
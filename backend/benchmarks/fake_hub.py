@@ -0,0 +1,433 @@
+"""
+本地模拟模型仓库服务
+
+同时模拟Hugging Face和ModelScope的HTTP API，按配置生成合成仓库（文件数量、大小），
+并支持注入延迟、带宽限制和错误，用于在不访问真实仓库的情况下对下载服务进行基准测试。
+
+权重文件为合法的safetensors格式（头部 + 填充数据），内容由文件名确定性生成，不占用磁盘。
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 填充数据的基础块大小
+PATTERN_SIZE = 64 * 1024
+# 每个响应写出的块大小
+CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class FakeFile:
+    """合成文件：头部字节 + 按模式重复的填充数据"""
+    path: str
+    size: int
+    head: bytes = b""
+    pattern: bytes = b""
+
+    @property
+    def sha256(self) -> str:
+        # 合成文件不计算真实哈希，使用稳定的伪哈希作为etag
+        return hashlib.sha256(f"{self.path}:{self.size}".encode()).hexdigest()
+
+    def read(self, start: int, end: int) -> bytes:
+        """读取[start, end)区间的字节"""
+        parts = []
+        if start < len(self.head):
+            parts.append(self.head[start:min(end, len(self.head))])
+            start = len(self.head)
+        while start < end:
+            offset = start % PATTERN_SIZE
+            n = min(end - start, PATTERN_SIZE - offset)
+            parts.append(self.pattern[offset:offset + n])
+            start += n
+        return b"".join(parts)
+
+
+@dataclass
+class FakeRepo:
+    """合成仓库"""
+    repo_id: str
+    files: Dict[str, FakeFile] = field(default_factory=dict)
+    sha: str = ""
+
+    @property
+    def total_size(self) -> int:
+        return sum(f.size for f in self.files.values())
+
+
+def _build_safetensors(path: str, size: int, shard_index: int, tensors_per_shard: int) -> FakeFile:
+    """生成指定总大小的safetensors文件，头部描述若干F16张量"""
+    data_budget = max(size - 4096, tensors_per_shard * 2)
+    per_tensor = (data_budget // tensors_per_shard) // 2 * 2
+    header: Dict[str, dict] = {"__metadata__": {"format": "pt"}}
+    offset = 0
+    for i in range(tensors_per_shard):
+        layer = shard_index * tensors_per_shard + i
+        header[f"model.layers.{layer}.mlp.weight"] = {
+            "dtype": "F16",
+            "shape": [per_tensor // 2],
+            "data_offsets": [offset, offset + per_tensor],
+        }
+        offset += per_tensor
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    # 头部以空格填充，使整个文件恰好为指定大小
+    pad = size - 8 - len(header_bytes) - offset
+    if pad < 0:
+        raise ValueError(f"File size {size} too small for {tensors_per_shard} tensors")
+    header_bytes += b" " * pad
+    head = struct.pack("<Q", len(header_bytes)) + header_bytes
+    return FakeFile(path=path, size=size, head=head, pattern=_pattern_for(path))
+
+
+def _pattern_for(path: str) -> bytes:
+    seed = hashlib.sha256(path.encode()).digest()
+    return (seed * (PATTERN_SIZE // len(seed) + 1))[:PATTERN_SIZE]
+
+
+def build_repo(repo_id: str, file_count: int, file_size: int, tensors_per_shard: int = 4) -> FakeRepo:
+    """
+    构建合成仓库
+
+    Args:
+        repo_id: 仓库ID（org/name）
+        file_count: 权重分片数量
+        file_size: 每个分片的字节数
+        tensors_per_shard: 每个分片中的张量数量
+
+    Returns:
+        合成仓库
+    """
+    repo = FakeRepo(repo_id=repo_id, sha=hashlib.sha1(repo_id.encode()).hexdigest())
+    config = json.dumps({"model_type": "fake", "num_hidden_layers": file_count * tensors_per_shard}).encode()
+    repo.files["config.json"] = FakeFile(path="config.json", size=len(config), head=config)
+    weight_map = {}
+    for i in range(file_count):
+        name = f"model-{i + 1:05d}-of-{file_count:05d}.safetensors"
+        repo.files[name] = _build_safetensors(name, file_size, i, tensors_per_shard)
+        for j in range(tensors_per_shard):
+            weight_map[f"model.layers.{i * tensors_per_shard + j}.mlp.weight"] = name
+    index = json.dumps({"metadata": {"total_size": file_count * file_size}, "weight_map": weight_map}).encode()
+    repo.files["model.safetensors.index.json"] = FakeFile(
+        path="model.safetensors.index.json", size=len(index), head=index)
+    return repo
+
+
+@dataclass
+class FaultConfig:
+    """故障注入配置"""
+    latency_ms: float = 0.0          # 每个请求的附加延迟
+    bandwidth_bps: float = 0.0       # 每个连接的带宽上限（0表示不限制）
+    error_rate: float = 0.0          # 注入错误的概率
+    error_status: int = 500          # 注入错误的HTTP状态码
+    retry_after: Optional[int] = None  # 429错误时的Retry-After秒数
+
+
+class FakeHubStats:
+    """服务端统计：请求数和发送字节数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.bytes_sent = 0
+        self.errors_injected = 0
+
+    def record(self, kind: str, nbytes: int = 0) -> None:
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.bytes_sent += nbytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "bytesSent": self.bytes_sent,
+                "errorsInjected": self.errors_injected,
+            }
+
+
+class FakeHubHandler(BaseHTTPRequestHandler):
+    """请求处理器，路由到HF或ModelScope风格的接口"""
+
+    protocol_version = "HTTP/1.1"
+    server: "FakeHubServer"
+
+    HF_INFO = re.compile(r"^/api/models/(?P<repo>[^/]+/[^/]+)(?:/revision/(?P<rev>[^/]+))?$")
+    HF_TREE = re.compile(r"^/api/models/(?P<repo>[^/]+/[^/]+)/tree/(?P<rev>[^/]+)(?:/(?P<path>.*))?$")
+    HF_RESOLVE = re.compile(r"^/(?P<repo>[^/]+/[^/]+)/resolve/(?P<rev>[^/]+)/(?P<path>.+)$")
+    MS_FILES = re.compile(r"^/api/v1/models/(?P<repo>[^/]+/[^/]+)/repo/files$")
+    MS_FILE = re.compile(r"^/api/v1/models/(?P<repo>[^/]+/[^/]+)/repo$")
+    MS_REVISIONS = re.compile(r"^/api/v1/models/(?P<repo>[^/]+/[^/]+)/revisions$")
+    MS_INFO = re.compile(r"^/api/v1/models/(?P<repo>[^/]+/[^/]+)$")
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("fake-hub: " + format, *args)
+
+    def do_HEAD(self) -> None:
+        self._dispatch(head_only=True)
+
+    def do_GET(self) -> None:
+        self._dispatch(head_only=False)
+
+    def _dispatch(self, head_only: bool) -> None:
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        faults = self.server.faults
+
+        if faults.latency_ms:
+            time.sleep(faults.latency_ms / 1000.0)
+        if faults.error_rate and random.random() < faults.error_rate:
+            self.server.stats.errors_injected += 1
+            headers = {}
+            if faults.error_status == 429 and faults.retry_after is not None:
+                headers["Retry-After"] = str(faults.retry_after)
+            self._send_json({"error": "injected"}, status=faults.error_status, extra_headers=headers)
+            return
+
+        for pattern, handler in (
+            (self.HF_TREE, self._hf_tree),
+            (self.HF_INFO, self._hf_info),
+            (self.MS_FILES, self._ms_files),
+            (self.MS_FILE, self._ms_file),
+            (self.MS_REVISIONS, self._ms_revisions),
+            (self.MS_INFO, self._ms_info),
+            (self.HF_RESOLVE, self._hf_resolve),
+        ):
+            match = pattern.match(path)
+            if match:
+                repo = self.server.repos.get(match.group("repo"))
+                if repo is None:
+                    self._send_json({"error": "Repository not found"}, status=404)
+                    return
+                handler(repo, match, query, head_only)
+                return
+        self._send_json({"error": "Not found"}, status=404)
+
+    # ---- Hugging Face ----
+
+    def _hf_info(self, repo: FakeRepo, match, query, head_only) -> None:
+        self.server.stats.record("hf_info")
+        self._send_json({
+            "id": repo.repo_id,
+            "modelId": repo.repo_id,
+            "sha": repo.sha,
+            "private": False,
+            "usedStorage": repo.total_size,
+            "siblings": [{"rfilename": f.path, "size": f.size} for f in repo.files.values()],
+        })
+
+    def _hf_tree(self, repo: FakeRepo, match, query, head_only) -> None:
+        self.server.stats.record("hf_tree")
+        entries = []
+        for f in repo.files.values():
+            entry = {"type": "file", "oid": f.sha256[:40], "size": f.size, "path": f.path}
+            if f.path.endswith(".safetensors"):
+                entry["lfs"] = {"oid": f.sha256, "size": f.size, "pointerSize": 134}
+            entries.append(entry)
+        page_size = self.server.page_size
+        cursor = int(query.get("cursor", 0) or 0)
+        page = entries[cursor:cursor + page_size]
+        headers = {}
+        if cursor + page_size < len(entries):
+            next_url = f"http://{self.headers.get('Host')}{urlparse(self.path).path}?recursive=true&cursor={cursor + page_size}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        self._send_json(page, extra_headers=headers)
+
+    def _hf_resolve(self, repo: FakeRepo, match, query, head_only) -> None:
+        fake = repo.files.get(match.group("path"))
+        if fake is None:
+            self._send_json({"error": "Entry not found"}, status=404)
+            return
+        headers = {
+            "X-Repo-Commit": repo.sha,
+            "ETag": f'"{fake.sha256}"',
+            "Accept-Ranges": "bytes",
+        }
+        if fake.path.endswith(".safetensors"):
+            headers["X-Linked-Size"] = str(fake.size)
+            headers["X-Linked-Etag"] = f'"{fake.sha256}"'
+        self._send_file(fake, head_only, "hf_resolve", headers)
+
+    # ---- ModelScope ----
+
+    def _ms_files(self, repo: FakeRepo, match, query, head_only) -> None:
+        self.server.stats.record("ms_files")
+        files = [
+            {"Name": f.path.split("/")[-1], "Path": f.path, "Type": "blob", "Size": f.size,
+             "Sha256": f.sha256, "Revision": repo.sha}
+            for f in repo.files.values()
+        ]
+        total = len(files)
+        page_size = int(query.get("PageSize", 0) or 0)
+        if page_size:
+            page_number = max(int(query.get("PageNumber", 1) or 1), 1)
+            files = files[(page_number - 1) * page_size:page_number * page_size]
+        self._send_json({"Code": 200, "Success": True, "Data": {"Files": files, "TotalCount": total}})
+
+    def _ms_file(self, repo: FakeRepo, match, query, head_only) -> None:
+        fake = repo.files.get(query.get("FilePath", ""))
+        if fake is None:
+            self._send_json({"Code": 404, "Success": False, "Message": "file not found"}, status=404)
+            return
+        self._send_file(fake, head_only, "ms_file", {"ETag": f'"{fake.sha256}"', "Accept-Ranges": "bytes"})
+
+    def _ms_revisions(self, repo: FakeRepo, match, query, head_only) -> None:
+        self.server.stats.record("ms_revisions")
+        self._send_json({"Code": 200, "Success": True, "Data": {"RevisionMap": {
+            "Branches": [{"Revision": "master", "CreatedAt": 0}], "Tags": []}}})
+
+    def _ms_info(self, repo: FakeRepo, match, query, head_only) -> None:
+        self.server.stats.record("ms_info")
+        self._send_json({"Code": 200, "Success": True, "Data": {
+            "Path": repo.repo_id.split("/")[0], "Name": repo.repo_id.split("/")[1], "Revision": "master"}})
+
+    # ---- 通用响应 ----
+
+    def _send_json(self, payload, status: int = 200, extra_headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _parse_range(self, size: int) -> Optional[Tuple[int, int]]:
+        header = self.headers.get("Range")
+        if not header or not header.startswith("bytes="):
+            return None
+        start_s, _, end_s = header[len("bytes="):].split(",")[0].partition("-")
+        if not start_s:
+            start = max(size - int(end_s), 0)
+            end = size
+        else:
+            start = int(start_s)
+            end = min(int(end_s) + 1, size) if end_s else size
+        return start, end
+
+    def _send_file(self, fake: FakeFile, head_only: bool, kind: str, headers: Dict[str, str]) -> None:
+        byte_range = self._parse_range(fake.size)
+        if byte_range and byte_range[0] >= fake.size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{fake.size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = byte_range or (0, fake.size)
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{fake.size}")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if head_only:
+            self.server.stats.record(kind + "_head")
+            return
+
+        bandwidth = self.server.faults.bandwidth_bps
+        began = time.monotonic()
+        sent = 0
+        try:
+            while start < end:
+                chunk = fake.read(start, min(start + CHUNK_SIZE, end))
+                self.wfile.write(chunk)
+                start += len(chunk)
+                sent += len(chunk)
+                if bandwidth:
+                    # 按带宽上限计算应耗时，超前时休眠
+                    ahead = sent / bandwidth - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.server.stats.record(kind, sent)
+
+
+class FakeHubServer(ThreadingHTTPServer):
+    """模拟仓库HTTP服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], repos: List[FakeRepo],
+                 faults: Optional[FaultConfig] = None, page_size: int = 1000):
+        super().__init__(address, FakeHubHandler)
+        self.repos = {repo.repo_id: repo for repo in repos}
+        self.faults = faults or FaultConfig()
+        self.page_size = page_size
+        self.stats = FakeHubStats()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeHubServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Fake hub serving {len(self.repos)} repos at {self.endpoint}")
+        return self
+
+    def stop(self) -> None:
+        """停止服务"""
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+
+def parse_size(value: str) -> int:
+    """解析带单位的大小字符串，例如 64MB、1.5GB"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)i?B?\s*", value, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {value}")
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    return int(float(match.group(1)) * units[match.group(2).upper()])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake Hugging Face / ModelScope hub")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8900, help="Port to bind to")
+    parser.add_argument("--repos", type=int, default=2, help="Number of synthetic repos")
+    parser.add_argument("--files", type=int, default=4, help="Weight shards per repo")
+    parser.add_argument("--file-size", type=parse_size, default="64MB", help="Size of each shard")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per request")
+    parser.add_argument("--bandwidth", type=parse_size, default="0", help="Per-connection bandwidth cap (bytes/s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected error")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+    parser.add_argument("--retry-after", type=int, default=None, help="Retry-After seconds for injected 429s")
+    parser.add_argument("--page-size", type=int, default=1000, help="Tree listing page size")
+    args = parser.parse_args()
+
+    repos = [build_repo(f"bench/model-{i}", args.files, args.file_size) for i in range(args.repos)]
+    faults = FaultConfig(args.latency_ms, args.bandwidth, args.error_rate, args.error_status, args.retry_after)
+    server = FakeHubServer((args.host, args.port), repos, faults, args.page_size)
+    logger.info(f"Serving {', '.join(r.repo_id for r in repos)} at {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+下载服务基准测试
+
+启动本地模拟仓库（fake_hub）和一个指向它的后端进程，在并发下驱动
+/check-size、/download/start、进度查询和归档接口，输出机器可读的JSON结果：
+吞吐量（字节/秒）、API延迟p50/p99、每GB CPU时间和内存峰值。
+
+用法（在backend目录下）:
+    python -m benchmarks.run_benchmark --repos 4 --files 4 --file-size 64MB --output result.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .fake_hub import FakeHubServer, FaultConfig, build_repo, parse_size
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TERMINAL_STATUSES = ("completed", "cancelled", "failed")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """延迟统计（毫秒）"""
+    ms = [v * 1000.0 for v in latencies]
+    return {
+        "count": len(ms),
+        "p50": round(_percentile(ms, 50), 3),
+        "p99": round(_percentile(ms, 99), 3),
+        "mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "max": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+class ProcessSampler:
+    """通过/proc读取后端进程的CPU时间和内存峰值（仅Linux）"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def cpu_seconds(self) -> float:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            # utime和stime分别位于第14、15个字段（去掉pid和comm后为索引11、12）
+            return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        except (OSError, IndexError, ValueError):
+            return 0.0
+
+    def memory(self) -> Dict[str, int]:
+        result = {"rssBytes": 0, "rssHighWaterBytes": 0}
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        result["rssBytes"] = int(line.split()[1]) * 1024
+                    elif line.startswith("VmHWM:"):
+                        result["rssHighWaterBytes"] = int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return result
+
+
+class BenchmarkRunner:
+    """基准测试执行器"""
+
+    def __init__(self, api_base: str, sampler: ProcessSampler, concurrency: int, poll_interval: float):
+        self.api_base = api_base
+        self.sampler = sampler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(concurrency * 2, 10))
+        self.session.mount("http://", adapter)
+
+    def _call(self, method: str, path: str, **kwargs) -> Tuple[float, Optional[requests.Response], Optional[str]]:
+        began = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.api_base}{path}", timeout=600, **kwargs)
+            elapsed = time.perf_counter() - began
+            if response.status_code >= 400:
+                return elapsed, response, f"HTTP {response.status_code}: {response.text[:200]}"
+            return elapsed, response, None
+        except requests.RequestException as e:
+            return time.perf_counter() - began, None, str(e)
+
+    def _measure(self, name: str, work: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """执行一个阶段并附加CPU、耗时和吞吐量统计"""
+        logger.info(f"Running phase: {name}")
+        cpu_before = self.sampler.cpu_seconds()
+        began = time.perf_counter()
+        result = work()
+        seconds = time.perf_counter() - began
+        cpu = self.sampler.cpu_seconds() - cpu_before
+        nbytes = result.get("bytes", 0)
+        gb = nbytes / (1024 ** 3)
+        result.update({
+            "seconds": round(seconds, 3),
+            "bytesPerSec": round(nbytes / seconds, 1) if seconds > 0 else 0.0,
+            "cpuSeconds": round(cpu, 3),
+            "cpuSecondsPerGB": round(cpu / gb, 3) if gb > 0 else None,
+            "memory": self.sampler.memory(),
+        })
+        logger.info(f"Phase {name}: {json.dumps(result)}")
+        return result
+
+    def check_size(self, jobs: List[Dict[str, Any]], rounds: int) -> Dict[str, Any]:
+        """并发调用/check-size"""
+        def work():
+            payloads = [job for _ in range(rounds) for job in jobs]
+            with ThreadPoolExecutor(self.concurrency) as pool:
+                results = list(pool.map(lambda p: self._call("POST", "/check-size", json=p), payloads))
+            errors = [err for _, _, err in results if err]
+            errors += [resp.json().get("message") for _, resp, err in results
+                       if not err and resp.json().get("message", "").startswith("Error")]
+            return {"requests": len(results), "errors": len(errors), "errorSamples": errors[:5],
+                    "latencyMs": _latency_summary([lat for lat, _, _ in results])}
+        return self._measure("check_size", work)
+
+    def _wait_tasks(self, task_ids: List[str], poll_latencies: List[float]) -> Dict[str, Dict[str, Any]]:
+        """轮询进度接口直到所有任务结束"""
+        final: Dict[str, Dict[str, Any]] = {}
+        pending = set(task_ids)
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            while pending:
+                polled = list(pool.map(lambda t: (t, self._call("GET", f"/download/progress/{t}")), list(pending)))
+                for task_id, (latency, response, error) in polled:
+                    poll_latencies.append(latency)
+                    if error:
+                        continue
+                    status = response.json()
+                    if str(status.get("status", "")).startswith(TERMINAL_STATUSES):
+                        final[task_id] = status
+                        pending.discard(task_id)
+                if pending:
+                    time.sleep(self.poll_interval)
+        return final
+
+    def download(self, jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """并发启动下载并轮询进度"""
+        def work():
+            with ThreadPoolExecutor(self.concurrency) as pool:
+                started = list(pool.map(lambda p: self._call("POST", "/download/start", json=p), jobs))
+            task_ids = [resp.json()["taskId"] for _, resp, err in started if not err]
+            poll_latencies: List[float] = []
+            final = self._wait_tasks(task_ids, poll_latencies)
+            failed = {t: s.get("status") for t, s in final.items() if s.get("status") != "completed"}
+            nbytes = sum(_folder_size(Path(job["savePath"])) for job in jobs)
+            return {"tasks": len(jobs), "startErrors": sum(1 for _, _, e in started if e),
+                    "failed": len(failed), "failureSamples": list(failed.values())[:5], "bytes": nbytes,
+                    "startLatencyMs": _latency_summary([lat for lat, _, _ in started]),
+                    "progressLatencyMs": _latency_summary(poll_latencies)}
+        return self._measure("download", work)
+
+    def archive(self, folders: List[Path], target: Path, archive_format: str) -> Dict[str, Any]:
+        """并发归档已下载的模型目录"""
+        def work():
+            payloads = [{"sourceFolderPath": str(folder), "targetDrivePath": str(target),
+                         "archiveName": folder.name, "archiveFormat": archive_format}
+                        for folder in folders]
+            with ThreadPoolExecutor(self.concurrency) as pool:
+                started = list(pool.map(lambda p: self._call("POST", "/archive", json=p), payloads))
+            task_ids = [resp.json()["taskId"] for _, resp, err in started if not err]
+            poll_latencies: List[float] = []
+            final = self._wait_tasks(task_ids, poll_latencies)
+            failed = {t: s.get("status") for t, s in final.items() if s.get("status") != "completed"}
+            return {"tasks": len(payloads), "startErrors": sum(1 for _, _, e in started if e),
+                    "failed": len(failed), "failureSamples": list(failed.values())[:5],
+                    "bytes": sum(_folder_size(f) for f in folders),
+                    "archiveBytes": _folder_size(target),
+                    "startLatencyMs": _latency_summary([lat for lat, _, _ in started]),
+                    "progressLatencyMs": _latency_summary(poll_latencies)}
+        return self._measure("archive", work)
+
+
+def _folder_size(folder: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_backend(port: int, env: Dict[str, str], workdir: Path) -> subprocess.Popen:
+    """启动指向模拟仓库的后端进程并等待其就绪"""
+    log_file = open(workdir / "backend.log", "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited early, see {workdir / 'backend.log'}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Backend did not become ready in time")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the downloader API against a local fake hub")
+    parser.add_argument("--repos", type=int, default=2, help="Number of synthetic repos")
+    parser.add_argument("--files", type=int, default=4, help="Weight shards per repo")
+    parser.add_argument("--file-size", type=parse_size, default="32MB", help="Size of each shard")
+    parser.add_argument("--sources", type=str, default="huggingface", help="Comma separated sources to drive")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent client requests")
+    parser.add_argument("--size-rounds", type=int, default=5, help="Repetitions of the size check per repo")
+    parser.add_argument("--file-filter", type=str, default=None, help="fileFilter sent with downloads")
+    parser.add_argument("--archive-format", type=str, default="tar", help="Archive format for the archive phase")
+    parser.add_argument("--skip-archive", action="store_true", help="Skip the archive phase")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fake hub latency per request")
+    parser.add_argument("--bandwidth", type=parse_size, default="0", help="Fake hub per-connection bandwidth cap")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake hub injected error probability")
+    parser.add_argument("--error-status", type=int, default=500, help="Fake hub injected error status")
+    parser.add_argument("--retry-after", type=int, default=None, help="Retry-After for injected 429s")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="Progress polling interval (seconds)")
+    parser.add_argument("--workdir", type=str, default=None, help="Working directory (default: temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="llm-packer-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    download_root = workdir / "models"
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+
+    repos = [build_repo(f"bench/model-{i}", args.files, args.file_size) for i in range(args.repos)]
+    faults = FaultConfig(args.latency_ms, args.bandwidth, args.error_rate, args.error_status, args.retry_after)
+    hub = FakeHubServer(("127.0.0.1", _free_port()), repos, faults).start()
+
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "HF_ENDPOINT": hub.endpoint,
+        "MODELSCOPE_ENDPOINT": hub.endpoint,
+        "MODELSCOPE_DOMAIN": hub.endpoint.split("://", 1)[1],
+        "MODELSCOPE_URL_SCHEME": "http://",
+        "DEFAULT_DOWNLOAD_PATH": str(download_root),
+        "HF_HOME": str(workdir / "hf_home"),
+        "MODELSCOPE_CACHE": str(workdir / "ms_cache"),
+        "HF_HUB_DISABLE_TELEMETRY": "1",
+    })
+    backend = start_backend(port, env, workdir)
+    sampler = ProcessSampler(backend.pid)
+    runner = BenchmarkRunner(f"http://127.0.0.1:{port}/api", sampler, args.concurrency, args.poll_interval)
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.time(),
+            "gitRevision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("workdir", "output", "keep")},
+        "phases": {},
+    }
+    try:
+        startup_memory = sampler.memory()
+        results["startup"] = {"memory": startup_memory, "cpuSeconds": sampler.cpu_seconds()}
+        for source in sources:
+            size_jobs = [{"source": source, "modelId": repo.repo_id} for repo in repos]
+            results["phases"][f"{source}.check_size"] = runner.check_size(size_jobs, args.size_rounds)
+
+            download_jobs = [{"source": source, "modelId": repo.repo_id,
+                              "savePath": str(download_root / source / repo.repo_id.split("/")[-1]),
+                              "fileFilter": args.file_filter}
+                             for repo in repos]
+            results["phases"][f"{source}.download"] = runner.download(download_jobs)
+
+            if not args.skip_archive:
+                folders = [Path(job["savePath"]) for job in download_jobs]
+                results["phases"][f"{source}.archive"] = runner.archive(
+                    folders, workdir / "archives" / source, args.archive_format)
+        results["hub"] = hub.stats.snapshot()
+        results["process"] = sampler.memory()
+    finally:
+        backend.terminate()
+        try:
+            backend.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            backend.kill()
+        hub.stop()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        logger.info(f"Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+文件写入基准测试
+
+按下载时的写入方式（1MB左右的数据块）分别用普通open()和FileWriter的各写入模式
+写出同样大小的文件，输出机器可读的JSON结果：吞吐量（字节/秒）和写入前后页缓存
+（/proc/meminfo中的Cached）的增量，用于比较大文件写入对同机其他服务页缓存的影响。
+
+用法（在backend目录下）:
+    python -m benchmarks.write_benchmark --size 2GB --dir /data/tmp --modes buffered,fadvise,direct --output write.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .fake_hub import parse_size
+from app.utils.file_writer import FileWriter, WRITE_MODES, drop_page_cache
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _page_cache_bytes() -> Optional[int]:
+    """当前页缓存大小（仅Linux）"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("Cached:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _write_file(path: Path, mode: str, size: int, chunk: bytes, buffer_size: Optional[int],
+                sync_bytes: Optional[int]) -> Dict[str, Any]:
+    cache_before = _page_cache_bytes()
+    started = time.perf_counter()
+    if mode == "open":
+        # 对照组：与改造前相同的open()写入，最后fsync以便与其他模式公平比较
+        with open(path, "wb") as f:
+            written = 0
+            while written < size:
+                written += f.write(chunk[:size - written])
+            f.flush()
+            os.fsync(f.fileno())
+        effective_mode = mode
+    else:
+        with FileWriter(path, mode=mode, buffer_size=buffer_size, sync_bytes=sync_bytes) as f:
+            written = 0
+            while written < size:
+                written += f.write(chunk[:size - written])
+            effective_mode = f.mode
+    elapsed = time.perf_counter() - started
+    cache_after = _page_cache_bytes()
+    return {
+        "mode": mode,
+        "effectiveMode": effective_mode,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "bytesPerSecond": round(size / elapsed, 1) if elapsed > 0 else 0.0,
+        "pageCacheDelta": cache_after - cache_before if cache_before is not None and cache_after is not None else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark file write modes used by downloads and archives")
+    parser.add_argument("--size", type=parse_size, default="1GB", help="Bytes written per mode")
+    parser.add_argument("--chunk-size", type=parse_size, default="1MB", help="Size of each write call")
+    parser.add_argument("--buffer-size", type=parse_size, default=None, help="FileWriter buffer size")
+    parser.add_argument("--sync-bytes", type=parse_size, default=None, help="Bytes between durable checkpoints")
+    parser.add_argument("--modes", type=str, default="open," + ",".join(WRITE_MODES),
+                        help="Comma separated modes (open is the plain open() baseline)")
+    parser.add_argument("--dir", type=str, default=None, help="Directory to write into (default: temp dir)")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for mode in modes:
+        if mode != "open" and mode not in WRITE_MODES:
+            parser.error(f"Unknown mode: {mode}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="write-bench-", dir=args.dir))
+    chunk = os.urandom(args.chunk_size)
+    results: Dict[str, Any] = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "directory": str(workdir.parent),
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("dir", "output")},
+        "modes": [],
+    }
+    try:
+        for mode in modes:
+            path = workdir / f"{mode}.bin"
+            logger.info(f"Writing {args.size} bytes with mode {mode}")
+            results["modes"].append(
+                _write_file(path, mode, args.size, chunk, args.buffer_size, args.sync_bytes))
+            # 删除前丢弃页缓存，避免影响下一个模式的测量
+            drop_page_cache(str(path))
+            path.unlink()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        logger.info(f"Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
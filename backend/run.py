@@ -8,6 +8,7 @@ if __name__ == "__main__":
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Host to bind the server to')
     parser.add_argument('--port', type=int, default=8000, help='Port to bind the server to')
     parser.add_argument('--reload', action='store_true', help='Auto-reload on code changes')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
     parser.add_argument('--env-file', type=str, default='.env', help='Path to .env file')
     
     args = parser.parse_args()
@@ -16,6 +17,13 @@ if __name__ == "__main__":
     if not os.path.exists(args.env_file):
         print(f"Warning: .env file not found at {args.env_file}, using default settings")
         
+    # 多工作进程时任务状态必须存放在共享存储中
+    if args.workers > 1:
+        if args.reload:
+            parser.error('--reload cannot be used together with --workers')
+        os.environ['TASK_BACKEND'] = 'sqlite'
+        print(f"Running {args.workers} workers with shared SQLite task state")
+        
     # 启动服务器
     print(f"Starting server at http://{args.host}:{args.port}")
     print("API documentation will be available at /api/docs")
@@ -25,5 +33,6 @@ if __name__ == "__main__":
         host=args.host,
         port=args.port,
         reload=args.reload,
+        workers=args.workers,
         log_level="info"
     ) 
\ No newline at end of file
@@ -0,0 +1,214 @@
+import os
+import json
+import shutil
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from app.services.task_manager import task_manager
+from app.services.archive_restorer import archive_restorer
+from app.services.archive_volumes import write_split_archive, MANIFEST_SUFFIX
+from app.services.seekable_archive import write_seekable_archive
+
+
+def _make_model(root: Path) -> Path:
+    """构造一个包含多个大小不一文件的模型目录"""
+    model = root / "org" / "model"
+    (model / "sub").mkdir(parents=True)
+    (model / "config.json").write_bytes(b'{"hidden_size": 8}')
+    (model / "model-00001.safetensors").write_bytes(os.urandom(300_000))
+    (model / "model-00002.safetensors").write_bytes(os.urandom(180_000))
+    (model / "sub" / "tokenizer.json").write_bytes(b"x" * 70_000)
+    (model / "empty.txt").write_bytes(b"")
+    return model
+
+
+def _files(folder: Path) -> dict:
+    return {str(p.relative_to(folder)): p.read_bytes() for p in sorted(folder.rglob("*")) if p.is_file()}
+
+
+def _restore(archive: Path, target: Path, **kwargs) -> dict:
+    task_id = task_manager.create_restore_task(archive, target)
+    archive_restorer.restore(task_id, archive, target, **kwargs)
+    return task_manager.get_task(task_id)
+
+
+@pytest.fixture
+def model(tmp_path):
+    return _make_model(tmp_path / "src")
+
+
+@pytest.mark.parametrize("archive_format", ["tar", "gztar", "bztar", "xztar"])
+def test_split_round_trip(tmp_path, model, archive_format):
+    targets = [tmp_path / "d1", tmp_path / "d2"]
+    manifest = write_split_archive(model, targets, "model", archive_format, 100_000)
+    assert len(manifest["volumes"]) > 2
+
+    task = _restore(targets[0] / f"model{MANIFEST_SUFFIX}", tmp_path / "out")
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+    # 临时解压目录已清理
+    assert not list(targets[0].glob(".restore-*"))
+
+
+@pytest.mark.parametrize("corrupt", ["first", "last"])
+def test_split_corrupted_volume_fails(tmp_path, model, corrupt):
+    target = tmp_path / "d1"
+    manifest = write_split_archive(model, [target], "model", "tar", 100_000)
+    volume = manifest["volumes"][0 if corrupt == "first" else -1]
+    path = target / volume["file"]
+    data = bytearray(path.read_bytes())
+    # 修改最后一个字节：对最后一个分卷而言位于tar结束标记之后，解压本身不会发现
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    task = _restore(target / f"model{MANIFEST_SUFFIX}", tmp_path / "out")
+
+    assert task["status"].startswith("failed")
+    assert "Checksum mismatch" in task["status"]
+    if corrupt == "first":
+        assert not (tmp_path / "out" / "model" / "config.json").exists()
+
+
+def test_split_corrupted_volume_restores_without_verify(tmp_path, model):
+    target = tmp_path / "d1"
+    manifest = write_split_archive(model, [target], "model", "tar", 100_000)
+    path = target / manifest["volumes"][-1]["file"]
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    task = _restore(target / f"model{MANIFEST_SUFFIX}", tmp_path / "out", verify=False)
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+
+
+def test_seekable_round_trip(tmp_path, model):
+    archive = tmp_path / "model.tar.gz"
+    write_seekable_archive(model, archive)
+
+    task = _restore(archive, tmp_path / "out")
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+
+
+def test_seekable_member_filter(tmp_path, model):
+    archive = tmp_path / "model.tar.gz"
+    write_seekable_archive(model, archive)
+
+    task = _restore(archive, tmp_path / "out", member_filter=r"\.json$")
+
+    assert task["status"] == "completed"
+    assert set(_files(tmp_path / "out" / "model")) == {"config.json", "sub/tokenizer.json"}
+
+
+def test_seekable_corrupted_member_fails(tmp_path, model):
+    archive = tmp_path / "model.tar.gz"
+    index = write_seekable_archive(model, archive)
+    index_path = Path(str(archive) + ".index.json")
+    for member in index["members"]:
+        if member["name"].endswith("config.json"):
+            member["sha256"] = "0" * 64
+    index_path.write_text(json.dumps(index), encoding="utf-8")
+
+    task = _restore(archive, tmp_path / "out")
+
+    assert task["status"].startswith("failed")
+    assert not (tmp_path / "out" / "model" / "config.json").exists()
+
+
+def test_seekable_without_index_round_trip(tmp_path, model):
+    # 丢失索引的可随机访问归档是多成员gzip流，按普通tar.gz顺序解压
+    archive = tmp_path / "model.tar.gz"
+    write_seekable_archive(model, archive)
+    os.remove(str(archive) + ".index.json")
+
+    task = _restore(archive, tmp_path / "out")
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+
+
+def test_concatenated_volumes_round_trip(tmp_path, model):
+    target = tmp_path / "d1"
+    manifest = write_split_archive(model, [target], "model", "gztar", 100_000)
+    archive = tmp_path / "model.tar.gz"
+    with open(archive, "wb") as out:
+        for volume in manifest["volumes"]:
+            with open(target / volume["file"], "rb") as f:
+                shutil.copyfileobj(f, out)
+
+    task = _restore(archive, tmp_path / "out")
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+
+
+def test_zip_round_trip(tmp_path, model):
+    archive = Path(shutil.make_archive(str(tmp_path / "model"), "zip", model.parent, model.name))
+
+    task = _restore(archive, tmp_path / "out")
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+
+
+@pytest.mark.parametrize("archive_format", ["tar", "gztar", "bztar", "xztar"])
+def test_plain_tar_round_trip(tmp_path, model, archive_format):
+    archive = Path(shutil.make_archive(str(tmp_path / "model"), archive_format, model.parent, model.name))
+
+    task = _restore(archive, tmp_path / "out")
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+
+
+def test_unsafe_member_path_fails(tmp_path):
+    archive = tmp_path / "evil.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("../escape.txt", b"boom")
+
+    task = _restore(archive, tmp_path / "out")
+
+    assert task["status"].startswith("failed")
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_split_spool_is_bounded(tmp_path, model, monkeypatch):
+    from app.core.config import settings
+    from app.services import archive_restorer as restorer_module
+
+    monkeypatch.setattr(settings, "RESTORE_CONCURRENCY", 2)
+    target = tmp_path / "d1"
+    manifest = write_split_archive(model, [target], "model", "gztar", 40_000)
+    assert len(manifest["volumes"]) > 8
+
+    spools = []
+    real_mkdtemp = restorer_module.tempfile.mkdtemp
+
+    def mkdtemp(**kwargs):
+        spools.append(Path(real_mkdtemp(**kwargs)))
+        return str(spools[-1])
+
+    peak = [0]
+    real_set = restorer_module._Progress.set
+
+    def sample(self, done):
+        peak[0] = max(peak[0], len(list(spools[0].iterdir())))
+        real_set(self, done)
+
+    monkeypatch.setattr(restorer_module.tempfile, "mkdtemp", mkdtemp)
+    monkeypatch.setattr(restorer_module._Progress, "set", sample)
+
+    task = _restore(target / f"model{MANIFEST_SUFFIX}", tmp_path / "out")
+
+    assert task["status"] == "completed"
+    assert _files(tmp_path / "out" / "model") == _files(model)
+    # 包括正在读取的分卷在内最多RESTORE_CONCURRENCY个临时文件
+    assert 0 < peak[0] <= 2
+    assert not spools[0].exists()
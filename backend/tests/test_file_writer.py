@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from app.utils.file_writer import DIRECT_ALIGNMENT, FileWriter, drop_page_cache
+
+MODES = ["buffered", "fadvise", "direct"]
+
+
+def _write_chunks(writer, data, step=3001):
+    for i in range(0, len(data), step):
+        writer.write(data[i:i + step])
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_round_trip_with_sync_points(tmp_path, mode):
+    data = os.urandom(5 * DIRECT_ALIGNMENT * 4 + 123)
+    path = tmp_path / "out.bin"
+    synced = []
+    with FileWriter(path, mode=mode, buffer_size=2 * DIRECT_ALIGNMENT, sync_bytes=3 * DIRECT_ALIGNMENT,
+                    on_sync=synced.append) as writer:
+        _write_chunks(writer, data)
+        assert writer.tell() == len(data)
+
+    assert path.read_bytes() == data
+    assert synced == sorted(synced)
+    assert synced[-1] == len(data)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_resume_at_unaligned_offset(tmp_path, mode):
+    data = os.urandom(6 * DIRECT_ALIGNMENT + 777)
+    resume_at = 2 * DIRECT_ALIGNMENT + 1234
+    path = tmp_path / "out.bin.part"
+    with FileWriter(path, mode=mode, buffer_size=2 * DIRECT_ALIGNMENT) as writer:
+        # 写入超过续传点的内容，模拟最后一个持久化点之后未确认的数据
+        _write_chunks(writer, data[:resume_at + 5000])
+
+    with FileWriter(path, mode=mode, buffer_size=2 * DIRECT_ALIGNMENT, offset=resume_at) as writer:
+        assert writer.tell() == resume_at
+        _write_chunks(writer, data[resume_at:], step=1999)
+
+    assert path.read_bytes() == data
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_truncate_rewinds_a_failed_range(tmp_path, mode):
+    data = os.urandom(4 * DIRECT_ALIGNMENT + 10)
+    path = tmp_path / "out.bin"
+    with FileWriter(path, mode=mode, buffer_size=DIRECT_ALIGNMENT) as writer:
+        writer.write(data[:1000])
+        writer.write(os.urandom(3 * DIRECT_ALIGNMENT))
+        writer.truncate(1000)
+        writer.write(data[1000:])
+
+    assert path.read_bytes() == data
+
+
+def test_resume_past_end_of_file_is_rejected(tmp_path):
+    with FileWriter(tmp_path / "probe.bin", mode="direct") as probe:
+        if probe.mode != "direct":
+            pytest.skip("O_DIRECT not supported on this filesystem")
+    path = tmp_path / "short.bin"
+    path.write_bytes(b"x" * 100)
+    with pytest.raises(IOError):
+        FileWriter(path, mode="direct", offset=DIRECT_ALIGNMENT + 10)
+
+
+def test_drop_page_cache_keeps_content(tmp_path):
+    path = tmp_path / "sdk.bin"
+    path.write_bytes(b"abc" * 1000)
+    drop_page_cache(str(path))
+    drop_page_cache(str(tmp_path / "missing.bin"))
+
+    assert path.read_bytes() == b"abc" * 1000
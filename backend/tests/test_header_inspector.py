@@ -0,0 +1,111 @@
+import json
+import struct
+
+import pytest
+
+from app.services.header_inspector import INITIAL_READ, layer_of, parse_gguf_header, parse_safetensors_header
+
+
+class BytesFile:
+    """按区间读取内存中的文件，记录每次读取"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.reads = []
+
+    def read(self, start, length):
+        self.reads.append((start, length))
+        return self.data[start:start + length]
+
+
+def _safetensors(tensors, metadata=None):
+    header = {"__metadata__": metadata or {}}
+    payload = bytearray()
+    for name, dtype, shape, nbytes in tensors:
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [len(payload), len(payload) + nbytes]}
+        payload.extend(b"\0" * nbytes)
+    raw = json.dumps(header).encode()
+    return struct.pack("<Q", len(raw)) + raw + bytes(payload)
+
+
+def _gguf_string(value):
+    raw = value.encode()
+    return struct.pack("<Q", len(raw)) + raw
+
+
+def _gguf(tensors, alignment=32):
+    out = bytearray(b"GGUF" + struct.pack("<IQQ", 3, len(tensors), 3))
+    out += _gguf_string("general.name") + struct.pack("<I", 8) + _gguf_string("tiny")
+    out += _gguf_string("tokenizer.ggml.tokens") + struct.pack("<IIQ", 9, 8, 2)
+    out += _gguf_string("a") + _gguf_string("b")
+    out += _gguf_string("general.alignment") + struct.pack("<II", 4, alignment)
+    offset = 0
+    for name, shape, ggml_type, nbytes in tensors:
+        out += _gguf_string(name) + struct.pack("<I", len(shape))
+        out += b"".join(struct.pack("<Q", dim) for dim in shape)
+        out += struct.pack("<IQ", ggml_type, offset)
+        offset += (nbytes + alignment - 1) // alignment * alignment
+    data_start = (len(out) + alignment - 1) // alignment * alignment
+    out += b"\0" * (data_start - len(out) + offset)
+    return bytes(out), data_start
+
+
+def test_safetensors_offsets_are_absolute():
+    data = _safetensors([("model.layers.0.mlp.weight", "BF16", [4, 8], 64),
+                         ("lm_head.weight", "F32", [2, 3], 24)])
+    tensors = parse_safetensors_header(BytesFile(data), "model.safetensors")
+
+    header_end = 8 + struct.unpack("<Q", data[:8])[0]
+    by_name = {t["name"]: t for t in tensors}
+    assert set(by_name) == {"model.layers.0.mlp.weight", "lm_head.weight"}
+    assert by_name["model.layers.0.mlp.weight"]["offset"] == header_end
+    assert by_name["lm_head.weight"]["offset"] == header_end + 64
+    assert by_name["lm_head.weight"]["length"] == 24
+    assert by_name["lm_head.weight"]["parameters"] == 6
+
+
+def test_large_safetensors_header_is_read_in_two_requests():
+    metadata = {"padding": "x" * (INITIAL_READ * 2)}
+    data = _safetensors([("w", "F16", [3], 6)], metadata)
+    remote = BytesFile(data)
+    (tensor,) = parse_safetensors_header(remote, "big.safetensors")
+
+    assert len(remote.reads) == 2
+    assert tensor["offset"] == len(data) - 6
+
+
+def test_truncated_safetensors_is_rejected():
+    with pytest.raises(ValueError):
+        parse_safetensors_header(BytesFile(b"\x01\x02"), "bad.safetensors")
+
+
+def test_gguf_tensors_skip_metadata_and_respect_alignment():
+    data, data_start = _gguf([("blk.0.attn_q.weight", [64, 2], 2, 72),
+                              ("output_norm.weight", [64], 0, 256)], alignment=64)
+    tensors = parse_gguf_header(BytesFile(data), "model.gguf", len(data))
+
+    q, norm = tensors
+    assert q["dtype"] == "Q4_0"
+    assert q["shape"] == [2, 64]
+    assert q["offset"] == data_start
+    assert q["length"] == 72
+    assert norm["dtype"] == "F32"
+    assert norm["offset"] == data_start + 128
+    assert norm["length"] == 256
+    assert layer_of(q["name"]) == "layers.0"
+
+
+def test_gguf_header_grows_past_initial_read():
+    names = [f"blk.{i}.ffn_up.weight" + "_" * 200 for i in range(INITIAL_READ // 200)]
+    data, data_start = _gguf([(name, [32], 0, 128) for name in names])
+    remote = BytesFile(data)
+    tensors = parse_gguf_header(remote, "model.gguf", len(data))
+
+    assert len(tensors) == len(names)
+    assert len(remote.reads) > 1
+    assert tensors[-1]["offset"] == data_start + 128 * (len(names) - 1)
+
+
+def test_non_gguf_file_is_rejected():
+    with pytest.raises(ValueError):
+        parse_gguf_header(BytesFile(b"NOPE" + b"\0" * 64), "model.gguf")
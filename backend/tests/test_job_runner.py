@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import job_runner as runner_module
+from app.services.job_runner import JobRunner
+from app.services.task_manager import task_manager
+from app.services.task_store import SQLiteTaskStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SQLiteTaskStore(str(tmp_path / "tasks.db"))
+    monkeypatch.setattr(task_manager, "store", store)
+    # 进行中任务的本地状态不带出测试
+    monkeypatch.setattr(task_manager, "_active", {})
+    monkeypatch.setattr(task_manager, "_local", {})
+    monkeypatch.setattr(settings, "TASK_HEARTBEAT_SECONDS", 0.01)
+    return store
+
+
+def _job_state(store, task_id):
+    return store._connect().execute(
+        "SELECT job_state, owner FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+
+
+def test_lost_lease_stops_job_without_finishing(store, monkeypatch):
+    task_id = task_manager.create_task("huggingface", "org/job")
+    runner = JobRunner()
+    store.enqueue_job(task_id, "huggingface", {})
+    claimed = store.claim_job(runner.owner, 60)
+    assert claimed[0] == task_id
+
+    # 其他工作进程在租约过期后接管了作业
+    stopped = threading.Event()
+    taken = threading.Event()
+
+    def renew(*args):
+        store._connect().execute("UPDATE tasks SET owner = 'other' WHERE task_id = ?", (task_id,))
+        taken.set()
+        return False
+
+    def handler(task_id, **params):
+        task_manager.update_task(task_id, 0, 100, "downloading")
+        taken.wait(5)
+        for _ in range(500):
+            if task_manager.get_task(task_id)["status"] == "cancelled":
+                stopped.set()
+                break
+            time.sleep(0.01)
+        task_manager.update_task(task_id, 0, 0, "failed: interrupted")
+
+    monkeypatch.setattr(store, "renew_lease", renew)
+    monkeypatch.setitem(runner_module.JOB_HANDLERS, "huggingface", handler)
+    runner._run_with_heartbeat(task_id, "huggingface", {})
+
+    assert stopped.is_set()
+    # 失去租约后的写入不覆盖接管者的状态，作业也不会被本进程结束
+    assert store.get(task_id)["status"] == "downloading"
+    assert _job_state(store, task_id) == ("running", "other")
+    assert task_id not in task_manager._revoked
+
+
+def test_finished_job_releases_lease(store, monkeypatch):
+    task_id = task_manager.create_task("huggingface", "org/job")
+    runner = JobRunner()
+    store.enqueue_job(task_id, "huggingface", {})
+    store.claim_job(runner.owner, 60)
+
+    def handler(task_id, **params):
+        task_manager.update_task(task_id, 10, 10, "completed")
+
+    monkeypatch.setitem(runner_module.JOB_HANDLERS, "huggingface", handler)
+    runner._run_with_heartbeat(task_id, "huggingface", {})
+
+    assert store.get(task_id)["status"] == "completed"
+    assert _job_state(store, task_id) == ("done", runner.owner)
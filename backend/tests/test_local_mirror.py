@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from app.services.local_inventory import local_inventory, MARKER_PATH
+from app.services.local_mirror import local_mirror
+from app.services.task_manager import task_manager
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    """把全局清单指向临时下载根目录"""
+    monkeypatch.setattr(local_inventory, "root", tmp_path)
+    monkeypatch.setattr(local_inventory, "_entries", {})
+    monkeypatch.setattr(local_inventory, "_by_id", {})
+    monkeypatch.setattr(local_inventory, "scanned_at", 0.0)
+    return tmp_path
+
+
+def _model(root, key, files):
+    folder = root / key
+    folder.mkdir(parents=True)
+    for name, data in files.items():
+        (folder / name).write_bytes(data)
+    return folder
+
+
+def test_complete_download_is_served(root):
+    folder = _model(root, "model", {"config.json": b"{}", "w.safetensors": b"x" * 100})
+    local_inventory.record_download(folder, "huggingface", "org/model", "abc")
+
+    repo = local_mirror.find("org/model")
+
+    assert repo is not None
+    assert sorted(repo.files) == ["config.json", "w.safetensors"]
+    assert local_mirror.find("org/model", "abc") is repo
+    assert local_mirror.find("org/model", "other") is None
+    assert local_inventory.lookup("org/model")["status"] == "complete"
+
+
+@pytest.mark.parametrize("filters", [{"file_filter": r"\.json$"}, {"tensor_filter": r"layers\.1\."}])
+def test_filtered_download_is_refused(root, filters):
+    folder = _model(root, "model", {"config.json": b"{}", "w.safetensors": b"sliced"})
+    local_inventory.record_download(folder, "huggingface", "org/model", "abc", **filters)
+
+    assert local_mirror.find("org/model") is None
+    assert local_mirror.resolve_file("org/model", "main", "w.safetensors") is None
+    assert local_inventory.lookup("org/model")["status"] == "partial"
+
+
+def test_legacy_marker_with_filter_is_refused(root):
+    # 早期版本把张量过滤条件也写在fileFilter中
+    folder = _model(root, "model", {"w.safetensors": b"sliced"})
+    (folder / MARKER_PATH).parent.mkdir(parents=True)
+    (folder / MARKER_PATH).write_text(json.dumps({"source": "huggingface", "modelId": "org/model",
+                                                  "fileFilter": "layers"}), encoding="utf-8")
+
+    assert local_mirror.find("org/model") is None
+
+
+def test_untracked_folder_requires_exact_path(root):
+    _model(root, "name", {"w.bin": b"a"})
+    _model(root, "orgB/name", {"w.bin": b"b"})
+
+    assert local_mirror.find("orgA/name") is None
+    repo = local_mirror.find("orgB/name")
+    assert repo is not None and repo.folder == (root / "orgB" / "name")
+    assert local_inventory.lookup("name")["status"] == "untracked"
+
+
+def test_partial_files_and_active_downloads_are_refused(root):
+    folder = _model(root, "model", {"w.bin": b"a"})
+    local_inventory.record_download(folder, "huggingface", "org/model")
+    task_id = task_manager.create_task("huggingface", "org/model")
+    try:
+        assert local_mirror.find("org/model") is None
+    finally:
+        task_manager.update_task(task_id, 0, 0, "cancelled")
+    assert local_mirror.find("org/model") is not None
+
+    (folder / "w2.bin.part").write_bytes(b"x")
+    assert local_mirror.find("org/model") is None
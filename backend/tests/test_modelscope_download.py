@@ -0,0 +1,63 @@
+import pytest
+
+from app.core.config import settings
+from app.services import metrics
+from app.services.model_downloader import model_downloader
+from app.services.task_manager import task_manager
+from benchmarks.fake_hub import FakeHubHandler, FakeHubServer, FaultConfig, build_repo
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    repo = build_repo("org/resume", 3, 256 * 1024, 1)
+    server = FakeHubServer(("127.0.0.1", 0), [repo], FaultConfig()).start()
+    monkeypatch.setattr(settings, "MODELSCOPE_ENDPOINT", server.endpoint)
+    yield repo, server
+    server.shutdown()
+
+
+def _content(fake):
+    return fake.read(0, fake.size)
+
+
+def _transferred():
+    return metrics.BYTES_TRANSFERRED.labels("modelscope", "modelscope").value
+
+
+def test_resume_counts_only_transferred_bytes(hub, tmp_path):
+    repo, server = hub
+    shards = sorted(p for p in repo.files if p.endswith(".safetensors"))
+    complete, partial = repo.files[shards[0]], repo.files[shards[1]]
+    (tmp_path / complete.path).write_bytes(_content(complete))
+    (tmp_path / (partial.path + ".part")).write_bytes(_content(partial)[:100_000])
+    before = _transferred()
+
+    task_id = task_manager.create_task("modelscope", "org/resume", str(tmp_path))
+    model_downloader.download_modelscope_model(task_id, "org/resume", str(tmp_path), None)
+
+    task = task_manager.get_task(task_id)
+    assert task["status"] == "completed"
+    assert task["downloadedSize"] == repo.total_size
+    assert task["existingSize"] == complete.size + 100_000
+    assert _transferred() - before == repo.total_size - task["existingSize"]
+    assert server.stats.snapshot()["bytesSent"] == repo.total_size - task["existingSize"]
+    for fake in repo.files.values():
+        assert (tmp_path / fake.path).read_bytes() == _content(fake)
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_ignored_range_restarts_without_double_counting(hub, tmp_path, monkeypatch):
+    repo, server = hub
+    monkeypatch.setattr(FakeHubHandler, "_parse_range", lambda self, size: None)
+    fake = repo.files[sorted(p for p in repo.files if p.endswith(".safetensors"))[0]]
+    (tmp_path / (fake.path + ".part")).write_bytes(b"\0" * 50_000)
+    counted = {True: 0, False: 0}
+
+    def on_bytes(nbytes, existing=False):
+        counted[existing] += nbytes
+
+    model_downloader._fetch_modelscope_file("task", "org/resume", "master", fake.path, fake.size, tmp_path,
+                                            None, on_bytes)
+
+    assert counted == {True: 0, False: fake.size}
+    assert (tmp_path / fake.path).read_bytes() == _content(fake)
@@ -0,0 +1,85 @@
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from app.core.config import settings
+from app.services import origin_limiter as limiter_module
+from app.services.origin_limiter import AdaptiveLimiter, OriginLimiter, parse_retry_after
+from benchmarks.fake_hub import FakeHubServer, FaultConfig, build_repo
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "ORIGIN_INITIAL_CONCURRENCY", 8)
+    monkeypatch.setattr(settings, "ORIGIN_MIN_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "ORIGIN_MAX_CONCURRENCY", 16)
+
+
+def test_success_grows_limit_by_one_per_window():
+    limiter = OriginLimiter("test-growth")
+    for _ in range(8):
+        limiter.on_success()
+    assert limiter.workers() == 8
+    limiter.on_success()
+    assert limiter.workers() == 9
+
+
+def test_throttle_halves_limit_once_per_wave(monkeypatch):
+    limiter = OriginLimiter("test-throttle")
+    limiter.on_failure(429, retry_after=0)
+    limiter.on_failure(429, retry_after=0)
+    assert limiter.workers() == 4
+
+    monkeypatch.setattr(limiter_module, "DECREASE_INTERVAL", 0)
+    limiter.on_failure(500, retry_after=0)
+    assert limiter.workers() == 3
+    for _ in range(10):
+        limiter.on_failure(429, retry_after=0)
+    assert limiter.workers() == settings.ORIGIN_MIN_CONCURRENCY
+
+
+def test_latency_rise_decreases_limit():
+    limiter = OriginLimiter("test-latency")
+    limiter.on_success(0.01)
+    for _ in range(10):
+        limiter.on_success(0.5)
+    assert limiter.workers() < 8
+
+
+def test_retry_after_blocks_new_requests():
+    limiter = OriginLimiter("test-block")
+    assert limiter.on_failure(429, retry_after=0.3) == pytest.approx(0.3)
+
+    started = time.monotonic()
+    worker = threading.Thread(target=limiter.acquire)
+    worker.start()
+    worker.join(5)
+    assert time.monotonic() - started >= 0.25
+    assert limiter.in_flight == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 50 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+
+
+def test_request_retries_throttled_responses(monkeypatch):
+    monkeypatch.setattr(settings, "ORIGIN_MAX_RETRIES", 3)
+    server = FakeHubServer(("127.0.0.1", 0), [build_repo("org/limited", 1, 4096, 1)],
+                           FaultConfig(error_rate=1.0, error_status=429, retry_after=0)).start()
+    try:
+        limiter = AdaptiveLimiter()
+        url = f"{server.endpoint}/api/models/org/limited"
+        with limiter.request(requests.Session(), "GET", url, timeout=10) as response:
+            assert response.status_code == 429
+        assert server.stats.snapshot()["errorsInjected"] == 3
+        origin = limiter.get(url)
+        assert origin.workers() == 4
+        assert origin.in_flight == 0
+    finally:
+        server.shutdown()
@@ -0,0 +1,93 @@
+import math
+
+import pytest
+
+from app.core.config import settings
+from app.services.repo_listing import iter_files, resolve_revision
+from benchmarks.fake_hub import FakeHubHandler, FakeHubServer, FaultConfig, build_repo
+
+
+@pytest.fixture
+def repo():
+    return build_repo("org/paged", 5, 8 * 1024, 1)
+
+
+@pytest.fixture
+def serve(repo):
+    servers = []
+
+    def start(page_size=2):
+        server = FakeHubServer(("127.0.0.1", 0), [repo], FaultConfig(), page_size=page_size).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _expected(repo):
+    return sorted((f.path, f.size) for f in repo.files.values())
+
+
+def test_huggingface_follows_link_pages(repo, serve):
+    server = serve(page_size=2)
+    revision = resolve_revision("huggingface", "org/paged", endpoint=server.endpoint)
+    entries = list(iter_files("huggingface", "org/paged", revision, endpoint=server.endpoint))
+
+    assert revision == repo.sha
+    assert sorted(entries) == _expected(repo)
+    assert server.stats.snapshot()["requests"]["hf_tree"] == math.ceil(len(repo.files) / 2)
+
+
+def test_huggingface_listing_is_lazy(repo, serve):
+    server = serve(page_size=2)
+    entries = iter_files("huggingface", "org/paged", endpoint=server.endpoint)
+    next(entries)
+
+    assert server.stats.snapshot()["requests"]["hf_tree"] == 1
+
+
+@pytest.mark.parametrize("page_size", [2, 3, 100])
+def test_modelscope_stops_at_total_count(repo, serve, monkeypatch, page_size):
+    server = serve()
+    monkeypatch.setattr(settings, "LISTING_PAGE_SIZE", page_size)
+    entries = list(iter_files("modelscope", "org/paged", endpoint=server.endpoint))
+
+    assert sorted(entries) == _expected(repo)
+    assert server.stats.snapshot()["requests"]["ms_files"] == math.ceil(len(repo.files) / page_size)
+
+
+def test_modelscope_without_total_count_stops_on_short_page(repo, serve, monkeypatch):
+    original = FakeHubHandler._ms_files
+
+    def without_total(self, repo, match, query, head_only):
+        send = self._send_json
+        self._send_json = lambda payload, **kwargs: send(
+            {**payload, "Data": {"Files": payload["Data"]["Files"]}}, **kwargs)
+        original(self, repo, match, query, head_only)
+
+    monkeypatch.setattr(FakeHubHandler, "_ms_files", without_total)
+    server = serve()
+    page_size = len(repo.files)
+    monkeypatch.setattr(settings, "LISTING_PAGE_SIZE", page_size)
+    entries = list(iter_files("modelscope", "org/paged", endpoint=server.endpoint))
+
+    assert sorted(entries) == _expected(repo)
+    # 最后一页恰好满页时再请求一次空页
+    assert server.stats.snapshot()["requests"]["ms_files"] == 2
+
+
+def test_modelscope_stops_when_paging_is_ignored(repo, serve, monkeypatch):
+    def first_page_only(self, repo, match, query, head_only):
+        self.server.stats.record("ms_files")
+        files = [{"Path": f.path, "Type": "blob", "Size": f.size} for f in repo.files.values()]
+        self._send_json({"Code": 200, "Data": {"Files": files[:int(query["PageSize"])]}})
+
+    monkeypatch.setattr(FakeHubHandler, "_ms_files", first_page_only)
+    server = serve()
+    monkeypatch.setattr(settings, "LISTING_PAGE_SIZE", 2)
+    entries = list(iter_files("modelscope", "org/paged", endpoint=server.endpoint))
+
+    assert len(entries) == 2
+    assert server.stats.snapshot()["requests"]["ms_files"] == 2
@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from app.services import seekable_archive
+
+
+@pytest.fixture
+def archive(tmp_path):
+    model = tmp_path / "src" / "model"
+    model.mkdir(parents=True)
+    (model / "weights.bin").write_bytes(os.urandom(9 * 1024 * 1024))
+    (model / "模型.json").write_bytes(b'{"a": 1}')
+    (model / "empty.txt").write_bytes(b"")
+    path = tmp_path / "model.tar.gz"
+    seekable_archive.write_seekable_archive(model, path)
+    return path, model
+
+
+@pytest.mark.parametrize("name", ["weights.bin", "模型.json", "empty.txt"])
+def test_member_data_verified(archive, name):
+    path, model = archive
+    entry = seekable_archive.find_member(seekable_archive.load_index(path), f"model/{name}")
+
+    data = b"".join(seekable_archive.iter_member_data(path, entry, entry["sha256"]))
+
+    assert data == (model / name).read_bytes()
+
+
+def test_member_checksum_mismatch_withholds_last_chunk(archive):
+    path, model = archive
+    entry = seekable_archive.find_member(seekable_archive.load_index(path), "model/weights.bin")
+    received = []
+
+    with pytest.raises(IOError, match="Checksum mismatch"):
+        for chunk in seekable_archive.iter_member_data(path, entry, "0" * 64):
+            received.append(chunk)
+
+    assert sum(len(c) for c in received) < entry["size"]
@@ -0,0 +1,80 @@
+import pytest
+
+from app.core.config import settings
+from app.services.size_checker import SizeChecker
+from benchmarks.fake_hub import FakeHubServer, FaultConfig, build_repo
+
+
+@pytest.fixture
+def hub():
+    repo = build_repo("org/sized", 3, 32 * 1024, 1)
+    server = FakeHubServer(("127.0.0.1", 0), [repo], FaultConfig(), page_size=2).start()
+    yield repo, server
+    server.shutdown()
+
+
+def _requests(server):
+    return sum(server.stats.snapshot()["requests"].values())
+
+
+def test_batch_checks_each_model_once(hub):
+    repo, server = hub
+    checker = SizeChecker()
+    entries = [
+        {"source": "huggingface", "modelId": "org/sized"},
+        {"source": "huggingface", "modelId": "org/sized/"},
+        {"source": "huggingface", "modelId": "org/sized", "fileFilter": r"\.json$"},
+        {"source": "huggingface", "modelId": "org/sized"},
+        {"source": "other", "modelId": "org/sized"},
+    ]
+    results = {tuple(r["indices"]): r for r in checker.check_batch(entries, hf_mirror=server.endpoint)}
+
+    assert sorted(results) == [(0, 1, 3), (2,), (4,)]
+    full = results[(0, 1, 3)]
+    assert full["error"] is None
+    assert full["totalBytes"] == repo.total_size
+    assert full["totalFiles"] == full["matchedFiles"] == len(repo.files)
+    assert full["revision"] == repo.sha
+    filtered = results[(2,)]
+    json_files = [f for f in repo.files.values() if f.path.endswith(".json")]
+    assert filtered["matchedFiles"] == len(json_files)
+    assert filtered["totalBytes"] == sum(f.size for f in json_files)
+    assert results[(4,)]["error"] == "Unsupported source: other"
+
+
+def test_successful_results_are_cached_until_ttl(hub, monkeypatch):
+    repo, server = hub
+    checker = SizeChecker()
+    first = checker.check("huggingface", "org/sized", endpoint=server.endpoint)
+    before = _requests(server)
+    second = checker.check("huggingface", "org/sized", endpoint=server.endpoint)
+
+    assert not first["cached"] and second["cached"]
+    assert second["totalBytes"] == first["totalBytes"]
+    assert _requests(server) == before
+
+    monkeypatch.setattr(settings, "SIZE_CHECK_CACHE_TTL", 0)
+    third = checker.check("huggingface", "org/sized", endpoint=server.endpoint)
+    assert not third["cached"]
+    assert _requests(server) > before
+
+
+def test_errors_are_not_cached(hub):
+    repo, server = hub
+    checker = SizeChecker()
+    first = checker.check("huggingface", "org/missing", endpoint=server.endpoint)
+    second = checker.check("huggingface", "org/missing", endpoint=server.endpoint)
+
+    assert first["error"] and second["error"]
+    assert not second["cached"]
+    assert checker.make_key("huggingface", "org/missing", endpoint=server.endpoint) not in checker._cache
+
+
+def test_modelscope_listing_is_paged_over_http(hub, monkeypatch):
+    repo, server = hub
+    monkeypatch.setattr(settings, "MODELSCOPE_ENDPOINT", server.endpoint)
+    result = SizeChecker().check("modelscope", "org/sized")
+
+    assert result["error"] is None
+    assert result["totalBytes"] == repo.total_size
+    assert result["totalFiles"] == len(repo.files)
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from app.services.task_store import SQLiteTaskStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteTaskStore(str(tmp_path / "tasks.db"))
+
+
+def _put(store, task_id, created):
+    store.put({"taskId": task_id, "status": "created", "startTime": created})
+
+
+def test_jobs_are_claimed_once_in_creation_order(store):
+    _put(store, "b", 2.0)
+    _put(store, "a", 1.0)
+    store.enqueue_job("a", "huggingface", {"model_id": "org/a"})
+    store.enqueue_job("b", "modelscope", {"model_id": "org/b"})
+
+    assert store.claim_job("w1", 60) == ("a", "huggingface", {"model_id": "org/a"}, 1)
+    assert store.claim_job("w2", 60) == ("b", "modelscope", {"model_id": "org/b"}, 1)
+    assert store.claim_job("w3", 60) is None
+
+
+def test_renewal_is_limited_to_the_owner(store):
+    _put(store, "a", 1.0)
+    store.enqueue_job("a", "archive", {})
+    store.claim_job("w1", 60)
+
+    assert store.renew_lease("a", "w1", 60)
+    assert not store.renew_lease("a", "w2", 60)
+
+
+def test_expired_lease_is_reclaimed(store):
+    _put(store, "a", 1.0)
+    store.enqueue_job("a", "restore", {"archive_path": "/x"})
+    store.claim_job("w1", 0.01)
+    time.sleep(0.05)
+
+    assert store.claim_job("w2", 60) == ("a", "restore", {"archive_path": "/x"}, 2)
+    # 原工作进程已不再持有租约，续租和结束作业都不生效
+    assert not store.renew_lease("a", "w1", 60)
+    store.finish_job("a", "w1", "failed")
+    assert store.renew_lease("a", "w2", 60)
+
+
+def test_finished_job_is_not_reclaimed_and_params_are_cleared(store):
+    _put(store, "a", 1.0)
+    store.enqueue_job("a", "huggingface", {"token": "secret"})
+    store.claim_job("w1", 0.01)
+    store.finish_job("a", "w1", "done")
+    time.sleep(0.05)
+
+    assert store.claim_job("w2", 60) is None
+    row = store._connect().execute("SELECT job_state, job_params FROM tasks WHERE task_id = 'a'").fetchone()
+    assert row == ("done", None)
@@ -0,0 +1,87 @@
+import io
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services.header_inspector import parse_safetensors_header
+from app.services.task_manager import task_manager
+from app.services.tensor_extractor import INDEX_FILE, coalesce_ranges, copy_members, tensor_extractor
+from benchmarks.fake_hub import FakeHubServer, FaultConfig, build_repo
+
+
+class BytesFile:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self, start, length):
+        return self.data[start:start + length]
+
+
+def _tensor(name, offset, length):
+    return {"name": name, "offset": offset, "length": length}
+
+
+def test_ranges_merge_only_within_gap():
+    tensors = [_tensor("c", 300, 50), _tensor("a", 0, 100), _tensor("b", 110, 40)]
+    ranges = coalesce_ranges(tensors, max_gap=10)
+
+    assert [(start, end) for start, end, _ in ranges] == [(0, 150), (300, 350)]
+    assert [t["name"] for t in ranges[0][2]] == ["a", "b"]
+    assert coalesce_ranges(tensors, max_gap=200)[0][:2] == (0, 350)
+
+
+def test_copy_members_skips_gaps_across_chunks():
+    source = bytes(range(256)) * 2
+    members = [_tensor("a", 10, 20), _tensor("b", 40, 30)]
+    chunks = [source[5:17], source[17:50], source[50:100]]
+    out = io.BytesIO()
+    seen = []
+    copy_members(iter(chunks), 5, 70, members, out, seen.append)
+
+    assert out.getvalue() == source[10:30] + source[40:70]
+    assert sum(seen) == 95
+
+
+def test_copy_members_detects_short_stream():
+    with pytest.raises(IOError):
+        copy_members(iter([b"\0" * 10]), 0, 100, [_tensor("a", 0, 100)], io.BytesIO(), lambda n: None)
+
+
+@pytest.fixture
+def hub():
+    repo = build_repo("org/tensors", 2, 64 * 1024, 4)
+    server = FakeHubServer(("127.0.0.1", 0), [repo], FaultConfig()).start()
+    yield repo, server
+    server.shutdown()
+
+
+def test_extracted_shards_hold_source_tensor_bytes(hub, tmp_path, monkeypatch):
+    repo, server = hub
+    # 合并间隔小于张量长度，每个分片需要多个区间
+    monkeypatch.setattr(settings, "TENSOR_COALESCE_GAP", 0)
+    task_id = task_manager.create_task("huggingface", "org/tensors", str(tmp_path))
+    save_path = tensor_extractor.extract(task_id, "huggingface", "org/tensors", r"layers\.(1|2|5)\.",
+                                         str(tmp_path), hf_mirror=server.endpoint)
+
+    assert save_path == tmp_path
+    assert task_manager.get_task(task_id)["status"] == "completed"
+    index = json.loads((tmp_path / INDEX_FILE).read_text())
+    assert sorted(index["weight_map"]) == [f"model.layers.{i}.mlp.weight" for i in (1, 2, 5)]
+
+    extracted_bytes = 0
+    for path in sorted(set(index["weight_map"].values())):
+        fake = repo.files[path]
+        source = BytesFile(fake.read(0, fake.size))
+        expected = {t["name"]: t for t in parse_safetensors_header(source, path)}
+        data = (tmp_path / path).read_bytes()
+        extracted = parse_safetensors_header(BytesFile(data), path)
+        assert {t["name"] for t in extracted} == {n for n, f in index["weight_map"].items() if f == path}
+        for tensor in extracted:
+            original = expected[tensor["name"]]
+            assert tensor["shape"] == original["shape"]
+            assert data[tensor["offset"]:tensor["offset"] + tensor["length"]] == source.read(
+                original["offset"], original["length"])
+            extracted_bytes += tensor["length"]
+        assert not (tmp_path / (path + ".part")).exists()
+    assert index["metadata"]["total_size"] == extracted_bytes
@@ -0,0 +1,29 @@
+from app.services.tracing import Tracer
+
+
+def _finish(tracer, task_id):
+    with tracer.span(task_id, "transfer") as span:
+        span.add_bytes(1)
+
+
+def test_finished_timelines_are_evicted_least_recently_used_first():
+    tracer = Tracer(max_tasks=2)
+    _finish(tracer, "a")
+    _finish(tracer, "b")
+    # 读取a使其成为最近使用的时间线
+    assert tracer.get_timeline("a") is not None
+    _finish(tracer, "c")
+
+    assert tracer.get_timeline("b") is None
+    assert tracer.get_timeline("a") is not None
+    assert tracer.get_timeline("c") is not None
+
+
+def test_running_timelines_are_kept():
+    tracer = Tracer(max_tasks=1)
+    with tracer.span("running", "transfer"):
+        _finish(tracer, "done")
+        assert tracer.get_timeline("running") is not None
+        _finish(tracer, "next")
+        assert tracer.get_timeline("done") is None
+        assert tracer.get_timeline("running") is not None
@@ -18,5 +18,8 @@ export const api = {
   getTaskStatus: (id) => request(`/download/progress/${id}`),
   cancelTask: (id) => request(`/download/cancel/${id}`, { method: 'POST' }),
   archiveModel: (data) => request('/archive', { method: 'POST', body: JSON.stringify(data) }),
+  getInventory: () => request('/inventory'),
+  lookupInventory: (modelId, source) =>
+    request(`/inventory/lookup?modelId=${encodeURIComponent(modelId)}&source=${encodeURIComponent(source)}`),
   healthCheck: () => request('/health'),
 };
@@ -1,4 +1,4 @@
-import React, { useContext, useState } from 'react';
+import React, { useContext, useEffect, useState } from 'react';
 import {
   Archive,
   FolderOpen,
@@ -9,6 +9,7 @@ import {
   CheckCircle
 } from 'lucide-react';
 import { TaskContext } from '../TaskContext';
+import { api } from '../api';
 import CustomSelect from '../components/CustomSelect';
 
 export default function ArchivePage() {
@@ -20,6 +21,22 @@ export default function ArchivePage() {
     archiveFormat: 'zip'
   });
   const [error, setError] = useState('');
+  const [localModels, setLocalModels] = useState([]);
+
+  useEffect(() => {
+    api.getInventory()
+      .then((data) => setLocalModels(data.models))
+      .catch(() => setLocalModels([]));
+  }, []);
+
+  const handleSelectLocal = (e) => {
+    const model = localModels.find((m) => m.path === e.target.value);
+    setForm({
+      ...form,
+      sourceFolderPath: e.target.value,
+      archiveName: form.archiveName || (model ? model.name : '')
+    });
+  };
 
   const handleChange = (e) => {
     const { name, value } = e.target;
@@ -47,6 +64,24 @@ export default function ArchivePage() {
       </div>
 
       <div className="form-section">
+        {localModels.length > 0 && (
+          <div className="form-group">
+            <label>
+              Local Model
+              <CustomSelect
+                name="sourceFolderPath"
+                value={form.sourceFolderPath}
+                onChange={handleSelectLocal}
+                placeholder="Select a downloaded model"
+                options={localModels.map((m) => ({
+                  value: m.path,
+                  label: `${m.repoId} (${(m.totalSize / 1024 ** 3).toFixed(2)} GB, ${m.status})`
+                }))}
+              />
+            </label>
+          </div>
+        )}
+
         <div className="form-row">
           <div className="form-group">
             <label>
@@ -108,7 +143,8 @@ export default function ArchivePage() {
                   { value: 'tar', label: '📄 TAR (Uncompressed)' },
                   { value: 'gztar', label: '🗜️ TAR.GZ (Good Compression)' },
                   { value: 'bztar', label: '🗜️ TAR.BZ2 (Better Compression)' },
-                  { value: 'xztar', label: '🗜️ TAR.XZ (Best Compression)' }
+                  { value: 'xztar', label: '🗜️ TAR.XZ (Best Compression)' },
+                  { value: 'seekable_gztar', label: '🔍 TAR.GZ (Seekable, Single-File Restore)' }
                 ]}
               />
             </label>
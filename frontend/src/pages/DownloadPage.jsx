@@ -33,6 +33,7 @@ export default function DownloadPage() {
   });
   const [checking, setChecking] = useState(false);
   const [sizeInfo, setSizeInfo] = useState(null);
+  const [localCopy, setLocalCopy] = useState(null);
   const [error, setError] = useState('');
 
   const handleChange = (e) => {
@@ -47,6 +48,8 @@ export default function DownloadPage() {
     try {
       const data = await api.checkModelSize({ source: form.source, modelId: form.modelId, authToken: form.authToken });
       setSizeInfo(data);
+      // Warn when the model already exists locally to avoid downloading it again
+      setLocalCopy(await api.lookupInventory(form.modelId, form.source).catch(() => null));
     } catch (e) {
       setError('Failed to check size');
     } finally {
@@ -217,6 +220,15 @@ export default function DownloadPage() {
                 <span>{parseFloat(sizeInfo.sizeGB).toFixed(2)} GB</span>
               </div>
             )}
+
+            {localCopy && (
+              <div className="size-info-compact">
+                <FolderOpen />
+                <span>
+                  Already downloaded ({localCopy.status}, {(localCopy.totalSize / 1024 ** 3).toFixed(2)} GB) at {localCopy.path}
+                </span>
+              </div>
+            )}
           </div>
 
           <div className="archive-section">
@@ -288,7 +300,8 @@ export default function DownloadPage() {
                         { value: 'tar', label: '📄 TAR' },
                         { value: 'gztar', label: '🗜️ TAR.GZ (Compressed)' },
                         { value: 'bztar', label: '🗜️ TAR.BZ2 (High Compression)' },
-                        { value: 'xztar', label: '🗜️ TAR.XZ (Best Compression)' }
+                        { value: 'xztar', label: '🗜️ TAR.XZ (Best Compression)' },
+                        { value: 'seekable_gztar', label: '🔍 TAR.GZ (Seekable, Single-File Restore)' }
                       ]}
                     />
                   </label>